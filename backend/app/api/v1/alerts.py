@@ -1,28 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException, Request # <-- ADD Request
+from fastapi import APIRouter, Depends, HTTPException, Query, Request # <-- ADD Request
 from sqlalchemy.orm import Session
 
 from app.models.database import get_db
 from app.services.firebase_auth import get_current_user
 from app.models.preference import UserPreference
-from app.services import nasa_eonet
-from app.helpers import haversine_distance
-
-from app.services import usgs
+from app.services import eonet_store, quake_store, risk_memo
 from app import processing
 
-# --- NEW IMPORT ---
-from app.services import open_meteo
-# -------------------
-
 router = APIRouter()
 
 @router.get("/nearby-events")
 async def get_nearby_events(
     db: Session = Depends(get_db),
     user: dict = Depends(get_current_user),
-    radius_km: int = 500
+    radius_km: int = 500,
+    category: list[str] | None = Query(None, description="EONET category ids, e.g. wildfires")
 ):
-    # ... (existing function, no changes) ...
+    """
+    Open NASA EONET events near the user's home, nearest first, served
+    from the in-memory event index.
+    """
     user_uid = user.get("uid")
     prefs = db.query(UserPreference).filter(UserPreference.user_uid == user_uid).first()
     if not prefs or not prefs.home_latitude:
@@ -30,24 +27,14 @@ async def get_nearby_events(
     user_lat = prefs.home_latitude
     user_lon = prefs.home_longitude
     try:
-        all_events_data = await nasa_eonet.fetch_open_events()
-        all_events = all_events_data.get("events", [])
+        events = await eonet_store.store.snapshot()
     except Exception as e:
         raise HTTPException(status_code=503, detail=f"Failed to fetch NASA EONET data: {e}")
-    nearby_events = []
-    for event in all_events:
-        try:
-            geom = event.get("geometry", [])[0]
-            if geom.get("type") == "Point":
-                event_lon, event_lat = geom.get("coordinates")
-            else:
-                event_lon, event_lat = geom.get("coordinates")[0][0]
-            distance = haversine_distance(user_lat, user_lon, event_lat, event_lon)
-            if distance <= radius_km:
-                event['distance_km'] = round(distance, 2)
-                nearby_events.append(event)
-        except Exception as e:
-            print(f"Skipping event {event.get('id')}: could not parse coordinates. Error: {e}")
+
+    nearby_events = [
+        eonet_store.as_dict(event, position, distance)
+        for event, position, distance in events.within(user_lat, user_lon, radius_km, category)
+    ]
     return {
         "user_location": {"latitude": user_lat, "longitude": user_lon},
         "search_radius_km": radius_km,
@@ -55,12 +42,49 @@ async def get_nearby_events(
         "events": nearby_events
     }
 
+@router.get("/events-in-area")
+async def get_events_in_area(
+    min_lat: float = Query(..., ge=-90, le=90),
+    min_lon: float = Query(..., ge=-180, le=180),
+    max_lat: float = Query(..., ge=-90, le=90),
+    max_lon: float = Query(..., ge=-180, le=180),
+    category: list[str] | None = Query(None, description="EONET category ids, e.g. wildfires"),
+    user: dict = Depends(get_current_user)
+):
+    """
+    Open NASA EONET events inside a bounding box (e.g. the visible map).
+    A box with min_lon > max_lon crosses the antimeridian.
+    """
+    if min_lat > max_lat:
+        raise HTTPException(status_code=400, detail="min_lat must not be greater than max_lat.")
+    try:
+        events = await eonet_store.store.snapshot()
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Failed to fetch NASA EONET data: {e}")
+
+    found = [
+        eonet_store.as_dict(event, position)
+        for event, position in events.in_bbox(min_lat, min_lon, max_lat, max_lon, category)
+    ]
+    return {
+        "bbox": [min_lon, min_lat, max_lon, max_lat],
+        "event_count": len(found),
+        "events": found
+    }
+
 @router.get("/nearby-earthquake")
 async def get_nearby_earthquake(
     db: Session = Depends(get_db),
-    user: dict = Depends(get_current_user)
+    user: dict = Depends(get_current_user),
+    k: int = Query(1, ge=1, le=100, description="How many of the nearest quakes to return"),
+    radius_km: float | None = Query(None, gt=0, description="Only quakes within this distance"),
+    min_mag: float | None = Query(None, description="Only quakes of at least this magnitude")
 ):
-    # ... (existing function, no changes) ...
+    """
+    Nearest earthquakes (USGS M2.5+, last 24h) to the user's home, served
+    from the in-memory quake index. The closest quake's fields stay at the
+    top level as before; all matches are listed under 'earthquakes'.
+    """
     user_uid = user.get("uid")
     prefs = db.query(UserPreference).filter(UserPreference.user_uid == user_uid).first()
     if not prefs or not prefs.home_latitude:
@@ -68,13 +92,20 @@ async def get_nearby_earthquake(
     user_lat = prefs.home_latitude
     user_lon = prefs.home_longitude
     try:
-        quake_data = await usgs.get_significant_earthquakes()
+        quakes = await quake_store.store.snapshot()
     except Exception as e:
         raise HTTPException(status_code=503, detail=f"Failed to fetch USGS data: {e}")
-    closest_quake = processing.find_closest_quake(user_lat, user_lon, quake_data)
-    if not closest_quake:
-        return { "message": "No significant earthquakes found in the last 24 hours." }
-    return closest_quake
+
+    matches = quakes.nearest(user_lat, user_lon, k=k, radius_km=radius_km, min_mag=min_mag)
+    if not matches:
+        return {
+            "message": "No significant earthquakes found in the last 24 hours.",
+            "count": 0,
+            "earthquakes": []
+        }
+
+    earthquakes = [quake_store.as_dict(quake, distance) for quake, distance in matches]
+    return {**earthquakes[0], "count": len(earthquakes), "earthquakes": earthquakes}
 
 # --- NEW "PROACTIVE ALERT" ENDPOINT ---
 
@@ -100,28 +131,13 @@ async def run_proactive_alert_check(
     print(f"Running proactive alert check for user {user.get('email')}...")
 
     try:
-        # 2. Fetch all raw data in parallel
-        flood_model_data = await open_meteo.get_flood_data(user_lat, user_lon)
-        fire_model_data = await open_meteo.get_raw_weather_data(user_lat, user_lon)
-        rivers_data = request.app.state.rivers_data
-        
-        # 3. Run all processing models
-        flood_risk = processing.calculate_flood_risk(
-            user_lat=user_lat,
-            user_lon=user_lon,
-            precipitation_forecast_7d=flood_model_data.precipitation_forecast_7d,
-            soil_moisture_current=flood_model_data.soil_moisture_current,
-            rivers_data=rivers_data
-        )
-        
-        fire_risk = processing.calculate_fwi(
-            temp_c=fire_model_data.temp_max,
-            humidity_rh=fire_model_data.humidity_min,
-            wind_kmh=fire_model_data.wind_max,
-            rain_mm=fire_model_data.precipitation
-        )
-        
-        uv_index = flood_model_data.uv_index_tomorrow
+        # 2-3. Risk bundle for the user's cell (shared with the other risk endpoints)
+        risks = await risk_memo.get_bundle(user_lat, user_lon)
+        rivers_data = request.app.state.river_index
+
+        flood_risk = risk_memo.flood_risk(risks, user_lat, user_lon, rivers_data)
+        fire_risk = risks.fire
+        uv_index = risks.flood.uv_index_tomorrow
 
         # 4. Generate alert messages
         alerts = processing.generate_proactive_alerts(
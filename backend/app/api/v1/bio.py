@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, Query
 from app.services.firebase_auth import get_current_user
-from app.services import open_meteo, bio
+from app.services import risk_memo
 
 # --- THIS LINE WAS MISSING OR OVERWRITTEN ---
 router = APIRouter() 
@@ -14,14 +14,6 @@ async def get_bio_status(
     """
     Analyzes environmental factors to predict disease outbreaks.
     """
-    # 1. Get Context (Weather & Flood Data)
-    weather = await open_meteo.get_raw_weather_data(lat, lon)
-    flood = await open_meteo.get_flood_data(lat, lon)
-    
-    # 2. Run Bio Logic
-    # We use 'precipitation_forecast_7d' as a proxy for ground wetness
-    risk = await bio.analyze_biological_risk(
-        temp=weather.temp_max,
-        rain_7day=flood.precipitation_forecast_7d
-    )
-    return risk
\ No newline at end of file
+    # Bio logic runs once per weather refresh for the cell (see risk_memo)
+    risks = await risk_memo.get_bundle(lat, lon)
+    return risks.bio
\ No newline at end of file
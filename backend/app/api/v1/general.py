@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends
 from typing import Dict
 from app.services.firebase_auth import get_current_user
+from app.services import metrics
 
 router = APIRouter()
 
@@ -12,6 +13,17 @@ async def get_health():
     return {"status": "ok", "message": "EARTH Backend is running!"}
 
 
+@router.get("/metrics")
+async def get_metrics(
+    user: dict = Depends(get_current_user)
+):
+    """
+    Upstream fetch, coalescing and cache counters. Requires a valid
+    Firebase auth token, like the data endpoints.
+    """
+    return metrics.snapshot()
+
+
 @router.get("/protected-data", response_model=Dict[str, str])
 async def get_protected_data(
     user: dict = Depends(get_current_user)
@@ -2,7 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException, Query
 from app.services.firebase_auth import get_current_user
 
 # Import all our services and models
-from app.services import open_meteo
+from app.services import risk_memo
 from app.services import google_maps
 from app import processing
 
@@ -21,19 +21,15 @@ async def get_local_intelligence_summary(
     print(f"User {user.get('email')} requesting local intelligence for ({lat}, {lon})")
     
     try:
-        # 1. Get Raw Weather Data
-        weather_data = await open_meteo.get_raw_weather_data(lat, lon)
+        # 1. Get Raw Weather Data (and the risks derived from it)
+        risks = await risk_memo.get_bundle(lat, lon)
+        weather_data = risks.weather
         
         # 2. Get Air Quality Data
         aqi_data = await google_maps.get_air_quality(lat, lon)
         
-        # 3. Calculate Fire Risk
-        fire_risk = processing.calculate_fwi(
-            temp_c=weather_data.temp_max,
-            humidity_rh=weather_data.humidity_min,
-            wind_kmh=weather_data.wind_max,
-            rain_mm=weather_data.precipitation
-        )
+        # 3. Fire Risk (memoized per data refresh)
+        fire_risk = risks.fire
         
         # 4. Calculate Final Safety Score
         aqi_value = aqi_data.aqi if aqi_data else None
@@ -51,7 +47,8 @@ async def get_local_intelligence_summary(
                 "aqi": aqi_value,
                 "display_name": aqi_data.display_name if aqi_data else "N/A"
             },
-            "fire_risk": round(fire_risk)
+            "fire_risk": round(fire_risk),
+            "grid_cell": weather_data.grid_cell
         }
         
     except Exception as e:
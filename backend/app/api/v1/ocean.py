@@ -31,7 +31,7 @@ async def get_marine_status(
         return {
             "status": "active",
             "message": "Marine data retrieved successfully.",
-            "data": marine_data
+            "data": marine_data.dict()
         }
 
     except HTTPException as e:
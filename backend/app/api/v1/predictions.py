@@ -1,9 +1,29 @@
+import json
+from typing import Literal
+
 from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from app.models.database import SessionLocal
 from app.services.firebase_auth import get_current_user
-from app.services import open_meteo, earth_engine
+from app.services import ai_predictor, open_meteo, earth_engine
 
 router = APIRouter()
 
+# Upper bound on locations per batch trend request
+MAX_TREND_LOCATIONS = 1000
+
+
+class TrendLocation(BaseModel):
+    latitude: float
+    longitude: float
+
+
+class TrendBatchRequest(BaseModel):
+    locations: list[TrendLocation] = Field(..., min_length=1, max_length=MAX_TREND_LOCATIONS)
+    hazard: Literal["flood", "fire"] = "flood"
+    days: int | None = Field(None, ge=1)  # Only fit the most recent days
+
 @router.get("/flood-trend")
 async def get_flood_risk_trend(
     lat: float = Query(None),
@@ -45,4 +65,26 @@ async def get_flood_risk_trend(
             "message": message,
             "air_quality": air_quality # Send to frontend
         }
-    }
\ No newline at end of file
+    }
+
+@router.post("/trends")
+def get_trends_batch(request: TrendBatchRequest, user: dict = Depends(get_current_user)):
+    """
+    Risk trends for many saved locations at once. All their history comes
+    back in one range query and is fitted in vectorized batches; results
+    stream as NDJSON, one line per location, as each batch is done.
+    """
+    locations = [(loc.latitude, loc.longitude) for loc in request.locations]
+
+    def lines():
+        # Own session: the stream outlives the request's dependencies
+        db = SessionLocal()
+        try:
+            for (lat, lon), prediction in ai_predictor.predict_trends_many(
+                db, locations, target=request.hazard, days=request.days
+            ):
+                yield json.dumps({"latitude": lat, "longitude": lon, **prediction.model_dump()}) + "\n"
+        finally:
+            db.close()
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
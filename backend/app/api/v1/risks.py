@@ -1,10 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, Request # <-- ADD Request
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response # <-- ADD Request
 from sqlalchemy.orm import Session # <-- ADD Session
 from app.services.firebase_auth import get_current_user
 
 # --- UPDATED IMPORTS ---
-from app.services import open_meteo
-from app import processing
+from app.services import risk_memo, tiles
 from app.models.database import get_db # <-- ADD get_db
 from app.models.preference import UserPreference # <-- ADD UserPreference
 # -----------------------
@@ -24,16 +23,10 @@ async def get_fire_weather_risk(
     print(f"User {user.get('email')} requesting fire risk for ({lat}, {lon})")
     
     try:
-        # 1. Fetch the raw weather data
-        weather_data = await open_meteo.get_raw_weather_data(lat, lon)
-        
-        # 2. Run data through our local processing model
-        fwi_score = processing.calculate_fwi(
-            temp_c=weather_data.temp_max,
-            humidity_rh=weather_data.humidity_min,
-            wind_kmh=weather_data.wind_max,
-            rain_mm=weather_data.precipitation
-        )
+        # 1-2. Weather snapshot and its FWI, computed once per data refresh
+        risks = await risk_memo.get_bundle(lat, lon)
+        weather_data = risks.weather
+        fwi_score = risks.fire
         
         # 3. Return the calculated score
         return {
@@ -42,6 +35,7 @@ async def get_fire_weather_risk(
                 "latitude": lat,
                 "longitude": lon
             },
+            "grid_cell": weather_data.grid_cell,
             "raw_data": weather_data.dict() # Send raw data for debugging
         }
         
@@ -77,27 +71,19 @@ async def get_flood_risk(
     print(f"User {user.get('email')} requesting flood risk for ({user_lat}, {user_lon})")
 
     try:
-        # 2. Get flood-related weather data
-        flood_data = await open_meteo.get_flood_data(user_lat, user_lon)
-        
-        # 3. Get river data from app state
-        rivers_data = request.app.state.rivers_data
+        # 2. Get river data from app state
+        rivers_data = request.app.state.river_index
         if not rivers_data:
             raise HTTPException(status_code=500, detail="River data not loaded on server.")
-        
-        # 4. Run data through our processing model
-        flood_score = processing.calculate_flood_risk(
-            user_lat=user_lat,
-            user_lon=user_lon,
-            precipitation_forecast_7d=flood_data.precipitation_forecast_7d,
-            soil_moisture_current=flood_data.soil_moisture_current,
-            rivers_data=rivers_data
-        )
+
+        # 3-4. Flood inputs and score, memoized per data refresh
+        flood_score, flood_data = await risk_memo.get_flood(user_lat, user_lon, rivers_data)
 
         # 5. Return the score
         return {
             "flood_score": flood_score,
             "location": { "latitude": user_lat, "longitude": user_lon },
+            "grid_cell": flood_data.grid_cell,
             "debug_data": flood_data.dict()
         }
 
@@ -105,4 +91,51 @@ async def get_flood_risk(
         raise e
     except Exception as e:
         print(f"Error in flood-risk endpoint: {e}")
-        raise HTTPException(status_code=500, detail=f"Failed to generate flood risk: {e}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Failed to generate flood risk: {e}")
+
+# --- RISK HEATMAP TILES ---
+
+@router.get("/tiles/{hazard}/{z}/{x}/{y}")
+async def get_risk_tile(
+    request: Request,
+    hazard: str,
+    z: int,
+    x: int,
+    y: int,
+    size: int = Query(tiles.DEFAULT_SIZE, ge=16, le=512, description="Tile width/height in pixels"),
+    format: str = Query("png", description="'png' (coloured heatmap) or 'bin' (raw uint8 scores, 255 = no data)"),
+    user: dict = Depends(get_current_user)
+):
+    """
+    Fire (FWI) or flood risk over one web-map tile (z/x/y, Web Mercator),
+    scored for every pixel in a single vectorized pass. Tiles are cached
+    per data epoch, so panning back over an area is served from memory.
+    """
+    if hazard not in tiles.HAZARDS:
+        raise HTTPException(status_code=404, detail=f"Unknown hazard '{hazard}'. Use one of: {', '.join(tiles.HAZARDS)}.")
+    if format not in tiles.FORMATS:
+        raise HTTPException(status_code=400, detail="format must be 'png' or 'bin'.")
+    if not tiles.tile_is_valid(z, x, y):
+        raise HTTPException(status_code=400, detail="Invalid tile coordinates.")
+
+    try:
+        content, epoch, complete = await tiles.get_tile(
+            hazard, z, x, y, size=size, fmt=format,
+            rivers_data=request.app.state.river_index if hazard == "flood" else None
+        )
+    except Exception as e:
+        print(f"Error in risk tile endpoint: {e}")
+        raise HTTPException(status_code=500, detail="Failed to render risk tile.")
+
+    # Browsers keep a tile only until its epoch ends; a tile with gaps from
+    # an upstream outage isn't kept at all
+    cache_control = f"private, max-age={tiles.epoch_seconds_left()}" if complete else "no-store"
+    return Response(
+        content=content,
+        media_type="image/png" if format == "png" else "application/octet-stream",
+        headers={
+            "Cache-Control": cache_control,
+            "X-Data-Epoch": str(epoch),
+            "X-Tile-Size": str(size),
+        }
+    )
@@ -25,7 +25,7 @@ async def get_soil_conditions(
             runoff_risk = "High"
 
         return {
-            "data": soil_data,
+            "data": soil_data.dict(),
             "analysis": {
                 "runoff_potential": runoff_risk,
                 "implication": f"Ground is {soil_data.saturation_status.lower()}. Flood risk is {runoff_risk} if rain occurs."
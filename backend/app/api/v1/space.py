@@ -1,4 +1,3 @@
-import httpx
 import os
 from datetime import datetime, timedelta
 from fastapi import APIRouter, Depends, Query # Added Query import just in case
@@ -8,6 +7,7 @@ from app.services import astronomy # <-- NEW
 
 # Standard imports needed if not already present in your file structure
 from app.services.firebase_auth import get_current_user
+from app.services import http_client
 
 router = APIRouter() # Ensure router is defined
 
@@ -51,16 +51,15 @@ async def get_space_status(
     kp_index = 1.0
     if API_KEY:
         try:
-            async with httpx.AsyncClient() as client:
-                end_date = datetime.utcnow().strftime("%Y-%m-%d")
-                start_date = (datetime.utcnow() - timedelta(days=3)).strftime("%Y-%m-%d")
-                gst_resp = await client.get(f"{NASA_BASE_URL}/GST", params={"startDate": start_date, "endDate": end_date, "api_key": API_KEY})
-                if gst_resp.status_code == 200:
-                    data = gst_resp.json()
-                    for storm in data:
-                        for obs in storm.get("allKpIndex", []):
-                            k = obs.get("kpIndex", 0)
-                            if k > kp_index: kp_index = k
+            end_date = datetime.utcnow().strftime("%Y-%m-%d")
+            start_date = (datetime.utcnow() - timedelta(days=3)).strftime("%Y-%m-%d")
+            gst_resp = await http_client.get(f"{NASA_BASE_URL}/GST", params={"startDate": start_date, "endDate": end_date, "api_key": API_KEY})
+            if gst_resp.status_code == 200:
+                data = gst_resp.json()
+                for storm in data:
+                    for obs in storm.get("allKpIndex", []):
+                        k = obs.get("kpIndex", 0)
+                        if k > kp_index: kp_index = k
         except Exception: pass
 
     # Tech Impact Logic
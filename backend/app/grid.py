@@ -0,0 +1,87 @@
+import math
+import os
+from typing import NamedTuple
+
+import numpy as np
+
+# Grid resolution (degrees) per data type. Open-Meteo models are ~0.1° (≈11 km)
+# or coarser, so snapping finer than that never changes the upstream answer.
+# Weather, flood and forecast all project one forecast "snapshot", so they
+# share a resolution. Override per type with e.g. GRID_RES_SNAPSHOT=0.1
+DEFAULT_RESOLUTIONS = {
+    "snapshot": 0.05,
+    "air": 0.1,
+    "marine": 0.1,
+    "history": 0.1,
+    # GBIF searches a ±0.05° box around the cell centre; a finer cell keeps
+    # that box close to the one around the caller's own point
+    "biodiversity": 0.02,
+}
+
+RESOLUTIONS = {
+    kind: float(os.getenv(f"GRID_RES_{kind.upper()}", res))
+    for kind, res in DEFAULT_RESOLUTIONS.items()
+}
+
+
+class GridCell(NamedTuple):
+    """The canonical centre of a grid cell plus the resolution it was snapped to."""
+    latitude: float
+    longitude: float
+    resolution: float
+
+    def as_dict(self) -> dict:
+        return {
+            "latitude": self.latitude,
+            "longitude": self.longitude,
+            "resolution_deg": self.resolution
+        }
+
+
+def resolution_for(kind: str) -> float:
+    return RESOLUTIONS.get(kind, RESOLUTIONS["snapshot"])
+
+
+def snap(lat: float, lon: float, kind: str = "snapshot") -> GridCell:
+    """
+    Canonicalizes a coordinate to the centre of its grid cell, so every
+    point inside the cell shares one upstream fetch and one cache entry.
+    """
+    res = resolution_for(kind)
+
+    # Wrap longitude into [-180, 180) and clamp latitude to the poles
+    lon = ((lon + 180.0) % 360.0) - 180.0
+    lat = max(-90.0, min(90.0, lat))
+
+    row = min(math.floor((lat + 90.0) / res), math.ceil(180.0 / res) - 1)
+    col = math.floor((lon + 180.0) / res)
+
+    # Round away float noise so the key is stable (e.g. 36.85 not 36.850000000000001)
+    cell_lat = round(-90.0 + (row + 0.5) * res, 6)
+    cell_lon = round(-180.0 + (col + 0.5) * res, 6)
+    return GridCell(cell_lat, cell_lon, res)
+
+
+def cell_key(kind: str, cell: GridCell) -> str:
+    return f"{kind}_{cell.resolution}_{cell.latitude}_{cell.longitude}"
+
+
+def cell_ids(lats, lons, kind: str = "history") -> np.ndarray:
+    """
+    Integer id of the grid cell around each point: row * columns + column,
+    counted from (-90, -180), with the same wrapping and clamping as snap().
+    Ids are only comparable at one resolution; changing GRID_RES_<KIND>
+    means recomputing stored ids (migrate_history_cells.py --recompute).
+    """
+    res = resolution_for(kind)
+    lats = np.clip(np.asarray(lats, dtype=np.float64), -90.0, 90.0)
+    lons = ((np.asarray(lons, dtype=np.float64) + 180.0) % 360.0) - 180.0
+
+    rows = np.minimum(np.floor((lats + 90.0) / res), math.ceil(180.0 / res) - 1).astype(np.int64)
+    cols = np.floor((lons + 180.0) / res).astype(np.int64)
+    return rows * math.ceil(360.0 / res) + cols
+
+
+def cell_id(lat: float, lon: float, kind: str = "history") -> int:
+    """Scalar cell_ids()."""
+    return int(cell_ids(lat, lon, kind))
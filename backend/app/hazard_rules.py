@@ -0,0 +1,239 @@
+import operator
+from dataclasses import dataclass, field
+
+import numpy as np
+
+# --- Declarative hazard thresholds ---
+# Every threshold ladder the risk models use lives in RULES below, one Rule
+# per hazard. compile_rule() turns a Rule into a NumPy evaluator that scores
+# any number of locations (or forecast hours) in one pass; the scalar
+# functions in processing, bio, infrastructure and space are thin wrappers
+# over the same evaluators. Missing values (None/NaN) never cross a threshold.
+
+OPS = {">": operator.gt, ">=": operator.ge, "<": operator.lt, "<=": operator.le}
+
+
+def all_of(*conditions) -> tuple:
+    """A compound threshold: every (variable, op, threshold) must hold."""
+    return tuple(conditions)
+
+
+@dataclass(frozen=True)
+class Rule:
+    """
+    One hazard's threshold ladder, most severe level first. Each entry of
+    `thresholds` is a number (compared against `variable` with `op`) or an
+    all_of(...) condition. The first level that matches wins; nothing
+    matching gives the default, which is the extra last entry of
+    `severity`, `message`, `value` and every `fields` column.
+    """
+    hazard: str
+    variable: str
+    thresholds: tuple
+    severity: tuple
+    message: tuple = ()
+    op: str = ">"
+    value: tuple = ()
+    fields: dict = field(default_factory=dict)
+
+
+class Evaluator:
+    """A compiled Rule. evaluate() takes {variable: array-like} and broadcasts."""
+
+    def __init__(self, rule: Rule):
+        n = len(rule.thresholds)
+        columns = {"severity": rule.severity, "message": rule.message or (None,) * (n + 1),
+                   "value": rule.value or (0.0,) * (n + 1), **rule.fields}
+        for name, column in columns.items():
+            if len(column) != n + 1:
+                raise ValueError(f"{rule.hazard}.{name}: expected {n + 1} entries (levels + default), got {len(column)}")
+
+        self.rule = rule
+        self.n = n
+        self.columns = {
+            name: np.array(column, dtype=np.float64 if name == "value" else object)
+            for name, column in columns.items()
+        }
+        self.variables = sorted({rule.variable} | {
+            variable for t in rule.thresholds if isinstance(t, tuple) for variable, _, _ in t
+        })
+
+        # Plain numeric ladders ordered most-severe-first compile to a single
+        # binary search; anything else goes through np.select
+        numeric = all(not isinstance(t, tuple) for t in rule.thresholds)
+        steps = np.diff(np.array(rule.thresholds, dtype=np.float64)) if numeric else None
+        descending = rule.op in (">", ">=")
+        self.sorted = numeric and bool(np.all(steps < 0) if descending else np.all(steps > 0))
+        if self.sorted:
+            t = np.array(rule.thresholds, dtype=np.float64)
+            self._edges = t[::-1] if descending else t
+
+    def levels(self, inputs: dict) -> np.ndarray:
+        """Index of the matching level per element; self.n where none matches."""
+        if self.sorted:
+            return self._search(np.asarray(inputs[self.rule.variable], dtype=np.float64))
+
+        values = {name: np.asarray(inputs[name], dtype=np.float64) for name in self.variables}
+        values = dict(zip(values, np.broadcast_arrays(*values.values())))
+        conditions = [self._condition(t, values) for t in self.rule.thresholds]
+        return np.select(conditions, np.arange(self.n), default=self.n) if conditions \
+            else np.full(values[self.rule.variable].shape, self.n)
+
+    def evaluate(self, inputs: dict) -> dict:
+        """
+        {"level", "triggered", "severity", "message", "value", *fields}, each
+        an array shaped like the (broadcast) inputs.
+        """
+        level = self.levels(inputs)
+        # asarray keeps 0-d results arrays (indexing with a 0-d level gives a bare element)
+        result = {name: np.asarray(column[level], dtype=column.dtype) for name, column in self.columns.items()}
+        result["level"] = level
+        result["triggered"] = level < self.n
+        return result
+
+    def _search(self, v: np.ndarray) -> np.ndarray:
+        op = self.rule.op
+        if op in (">", ">="):
+            crossed = np.searchsorted(self._edges, v, side="left" if op == ">" else "right")
+            level = np.where(crossed > 0, self.n - crossed, self.n)
+        else:
+            level = np.searchsorted(self._edges, v, side="right" if op == "<" else "left")
+        return np.where(np.isnan(v), self.n, level)
+
+    def _condition(self, threshold, values: dict) -> np.ndarray:
+        if not isinstance(threshold, tuple):
+            threshold = ((self.rule.variable, self.rule.op, threshold),)
+        mask = np.ones(values[self.rule.variable].shape, dtype=bool)
+        for variable, op, limit in threshold:
+            mask &= OPS[op](values[variable], limit)  # NaN compares False
+        return mask
+
+
+def compile_rule(rule: Rule) -> Evaluator:
+    return Evaluator(rule)
+
+
+def scalar(evaluation: dict) -> dict:
+    """Single-location evaluation -> plain Python values."""
+    return {name: value.item() if isinstance(value, np.ndarray) else value
+            for name, value in evaluation.items()}
+
+
+def first_message(evaluations: list, default: str) -> np.ndarray:
+    """
+    Per element, the message of the most severe triggered level across
+    several rules (ties go to the earlier rule); `default` where none has
+    a message.
+    """
+    ranks, messages = [], []
+    for ev in evaluations:
+        has_message = ev["triggered"] & np.not_equal(ev["message"], None)
+        ranks.append(np.where(has_message, ev["level"], np.iinfo(np.int64).max))
+        messages.append(ev["message"])
+    ranks, messages = np.broadcast_arrays(*ranks), np.broadcast_arrays(*messages)
+    pick = np.argmin(np.stack(ranks), axis=0)  # argmin keeps the first of equal ranks
+    chosen = np.choose(pick, messages) if len(messages) > 1 else messages[0]
+    none = np.min(np.stack(ranks), axis=0) == np.iinfo(np.int64).max
+    return np.where(none, default, chosen)
+
+
+# --- The rule table ---
+
+FLOOD_ALERTS = [
+    "CRITICAL: FLOODING MAY OCCUR IN YOUR AREA. EVACUATE LOW-LYING AREAS.",
+    "WARNING: High flood probability detected. Monitor local river levels.",
+]
+FIRE_ALERTS = [
+    "CRITICAL: Extreme Fire Risk detected. Be ready to evacuate.",
+    "WARNING: High Fire Risk detected. Avoid all outdoor burning.",
+]
+UV_ALERTS = [
+    "HEALTH: Extreme UV Index (11+) forecast. Avoid sun exposure.",
+    "HEALTH: Very High UV Index (8-10) forecast. Stay indoors or seek shade.",
+]
+ALL_CLEAR = "All Clear: No immediate environmental threats detected for your area."
+
+RULES = (
+    # Proactive alerts (processing.generate_proactive_alerts)
+    Rule("flood_alert", "flood_risk", (75, 50),
+         severity=("CRITICAL", "WARNING", None), message=(*FLOOD_ALERTS, None)),
+    Rule("fire_alert", "fire_risk", (75, 50),
+         severity=("CRITICAL", "WARNING", None), message=(*FIRE_ALERTS, None)),
+    Rule("uv_alert", "uv_index", (11, 8), op=">=",
+         severity=("EXTREME", "VERY HIGH", None), message=(*UV_ALERTS, None)),
+
+    # Personal safety score (processing.calculate_safety_score); value = points deducted
+    Rule("safety_fire", "fire_risk", (75, 50, 20),
+         severity=("Extreme Fire Risk", "High Fire Risk", "Moderate Fire Risk", "Low"),
+         value=(70, 40, 15, 0)),
+    # Air quality only becomes the primary risk while the score stays above primary_above
+    Rule("safety_air", "aqi", (150, 100, 50),
+         severity=("Poor Air Quality", "Poor Air Quality", "Moderate Air Quality", None),
+         value=(25, 15, 5, 0),
+         fields={"primary_above": (50, 70, 85, np.inf)}),
+
+    # Bio-Shield (services/bio.py)
+    Rule("bio", "rain_7day",
+         (all_of(("rain_7day", ">", 20), ("temp", ">", 23)),  # Standing water + warmth = breeding
+          80,                                                  # Floods mix sewage with drinking water
+          all_of(("temp", ">", 32))),                          # Heat affects cognitive function
+         severity=("HIGH", "CRITICAL", "MODERATE", "LOW"),
+         message=("Conditions are optimal for mosquito breeding (Warm + Wet).",
+                  "Heavy rainfall may contaminate local wells and taps.",
+                  "Extreme heat affecting physical safety.",
+                  "Biological conditions are stable."),
+         fields={
+             "vector": ("Mosquito-Borne Disease", "Waterborne Contamination", "Heat Stroke", "None"),
+             "prevention": ("Use treated nets tonight. Clear standing water.",
+                            "Boil ALL drinking water. Avoid raw vegetables.",
+                            "Hydrate immediately. Avoid midday sun.",
+                            "Maintain standard hygiene."),
+         }),
+
+    # Vital lines (services/infrastructure.analyze_vital_lines)
+    Rule("vital_power", "wind_speed", (90, 60),
+         severity=("CRITICAL (Line Collapse)", "High Risk (Tree Fall)", "Stable"),
+         message=("URGENT: Power grid failure imminent. Charge devices now.",
+                  "Infrastructure stress detected. Prepare for outages.", None)),
+    Rule("vital_roads", "rain_sum",
+         (all_of(("soil_moisture", ">", 0.35), ("rain_sum", ">", 30)), 50, 15),  # Wet soil floods fast
+         severity=("CRITICAL (Flash Floods)", "High Risk (Hydroplaning)", "Moderate (Slippery)", "Clear"),
+         message=("URGENT: Roads may become impassable. Avoid travel.",
+                  "Infrastructure stress detected. Prepare for outages.", None, None)),
+    Rule("vital_internet", "solar_kp", (7, 5), op=">=",
+         severity=("Blackout (Satellite Loss)", "Degraded (GPS Drift)", "Optimal")),
+
+    # Infra status widget (services/infrastructure.analyze_grid_stress)
+    Rule("grid_power", "wind_max", (all_of(("temp_max", ">", 35)), 50),
+         severity=("GRID STRESS (HEAT)", "GRID STRESS (WIND)", "STABLE")),
+    Rule("grid_roads", "rain_7day", (all_of(("soil_moisture", ">", 0.4)), 50, 20),
+         severity=("MUD HAZARD", "FLOOD RISK", "SLIPPERY", "CLEAR")),
+    Rule("grid_internet", "wind_max", (70,),
+         severity=("DEGRADED", "OPTIMAL")),
+
+    # Space weather tech impact (services/space.py), Kp index 0-9
+    Rule("solar", "kp_index", (8, 6, 4), op=">=",
+         severity=("EXTREME", "High", "Moderate", "Low"),
+         message=("CRITICAL: Major Geomagnetic Storm. Avoid relying on GPS.",
+                  "Warning: Solar storm active. Drone/GPS navigation may drift.",
+                  "Solar activity elevated. Minor tech fluctuations possible.",
+                  "Planetary shield is holding. Systems nominal."),
+         fields={
+             "gps_status": ("Unavailable / Massive Errors", "Degraded (Error ~50m)", "Minor Jitter", "Precision (<3m)"),
+             "radio_status": ("Full Blackout (Days)", "Spotty / Fadeouts", "Minor Interference", "Clear"),
+             "grid_status": ("Collapse Risk / Damage", "Voltage Alarms", "Stable", "Stable"),
+             "satellite_drag": ("Critical (Orbit Loss)", "High", "Moderate", "Nominal"),
+         }),
+)
+
+EVALUATORS = {rule.hazard: compile_rule(rule) for rule in RULES}
+
+
+def evaluate(hazard: str, **inputs) -> dict:
+    """Evaluates one hazard of the table, e.g. evaluate("uv_alert", uv_index=[3, 9, 12])."""
+    return EVALUATORS[hazard].evaluate(inputs)
+
+
+def evaluate_many(hazards, inputs: dict) -> dict:
+    """Evaluates several hazards over the same inputs: {hazard: evaluation}."""
+    return {hazard: EVALUATORS[hazard].evaluate(inputs) for hazard in hazards}
@@ -1,4 +1,7 @@
 import math
+from typing import NamedTuple
+
+import numpy as np
 
 def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     """
@@ -24,4 +27,75 @@ def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> fl
     
     distance = R * c
     
-    return distance
\ No newline at end of file
+    return distance
+
+# --- Vectorized (NumPy) distances ---
+# Same haversine formula as above, over arrays. Convert a point set once with
+# to_radians() and reuse it; every function below also accepts plain degree
+# arrays as (lats, lons).
+
+EARTH_RADIUS_KM = 6371.0
+
+
+class RadianPoints(NamedTuple):
+    """Point set pre-converted for repeated distance queries."""
+    lat: np.ndarray
+    lon: np.ndarray
+    cos_lat: np.ndarray
+
+    def __len__(self):
+        return len(self.lat)
+
+
+def to_radians(lats, lons) -> RadianPoints:
+    lat = np.radians(np.asarray(lats, dtype=np.float64))
+    lon = np.radians(np.asarray(lons, dtype=np.float64))
+    return RadianPoints(lat, lon, np.cos(lat))
+
+
+def _as_points(points) -> RadianPoints:
+    return points if isinstance(points, RadianPoints) else to_radians(*points)
+
+
+def _haversine(lat1, lon1, cos_lat1, lat2, lon2, cos_lat2) -> np.ndarray:
+    a = np.sin((lat2 - lat1) / 2) ** 2 + cos_lat1 * cos_lat2 * np.sin((lon2 - lon1) / 2) ** 2
+    return EARTH_RADIUS_KM * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def haversine_many(lat: float, lon: float, points) -> np.ndarray:
+    """
+    One-to-many: distance (km) from (lat, lon) to every point in `points`
+    (RadianPoints or (lats, lons) in degrees).
+    """
+    points = _as_points(points)
+    lat1, lon1 = math.radians(lat), math.radians(lon)
+    return _haversine(lat1, lon1, math.cos(lat1), points.lat, points.lon, points.cos_lat)
+
+
+def haversine_matrix(points_a, points_b) -> np.ndarray:
+    """
+    Many-to-many: (len(a), len(b)) matrix of distances (km). Memory grows
+    with len(a) * len(b), so chunk `points_a` for very large sets.
+    """
+    a, b = _as_points(points_a), _as_points(points_b)
+    return _haversine(
+        a.lat[:, None], a.lon[:, None], a.cos_lat[:, None],
+        b.lat[None, :], b.lon[None, :], b.cos_lat[None, :]
+    )
+
+
+def k_nearest(lat: float, lon: float, points, k: int = 1) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Indices and distances (km) of the k points closest to (lat, lon),
+    nearest first. Uses a partial sort, so it is O(n) rather than O(n log n).
+    """
+    distances = haversine_many(lat, lon, points)
+    k = min(k, len(distances))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64), np.empty(0)
+    if k == 1:
+        idx = np.array([np.argmin(distances)])  # First of any ties, like a min() loop
+    else:
+        idx = np.argpartition(distances, k - 1)[:k] if k < len(distances) else np.arange(len(distances))
+        idx = idx[np.argsort(distances[idx], kind="stable")]
+    return idx, distances[idx]
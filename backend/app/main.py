@@ -3,14 +3,15 @@ from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 import os
-import json
 
 dotenv_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), '.env')
 load_dotenv(dotenv_path)
 
 from app.services.firebase_auth import initialize_firebase
 from app.services.earth_engine import init_gee 
+from app.services import eonet_store, http_client, open_meteo, quake_store
 from app.models.database import Base, engine
+from app.rivers import load_river_index
 
 # Routers
 from app.api.v1 import general as general_router
@@ -24,6 +25,7 @@ from app.api.v1 import predictions as predictions_router
 from app.api.v1 import satellite as satellite_router
 from app.api.v1 import bio as bio_router
 from app.api.v1 import infra as infra_router # <-- NEW: Vital Lines
+from app.api.v1 import risks as risks_router
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -31,21 +33,30 @@ async def lifespan(app: FastAPI):
     initialize_firebase()
     print("Attempting Google Earth Engine connection...")
     init_gee() 
+    await http_client.startup()
+    open_meteo.start_background_refresh()
+    quake_store.store.start()
+    eonet_store.store.start()
     
     try:
         Base.metadata.create_all(bind=engine)
     except Exception as e:
         print(f"DB Error: {e}")
 
+    # River proximity, fastest source first (raster, binary, GeoJSON)
+    base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
     try:
-        base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-        with open(os.path.join(base_dir, 'data', 'world_rivers.json'), 'r', encoding='utf-8') as f:
-            app.state.rivers_data = json.load(f)
-    except Exception:
-        app.state.rivers_data = None
+        app.state.river_index = load_river_index(base_dir)
+    except Exception as e:
+        print(f"River data Error: {e}")
+        app.state.river_index = None
 
     yield
     print("Shutting down...")
+    await quake_store.store.stop()
+    await eonet_store.store.stop()
+    await open_meteo.stop_background_refresh()
+    await http_client.shutdown()
 
 app = FastAPI(title="EARTH Platform", version="1.4.0", lifespan=lifespan)
 
@@ -69,6 +80,7 @@ app.include_router(predictions_router.router, prefix="/api/v1/predict", tags=["A
 app.include_router(satellite_router.router, prefix="/api/v1/satellite", tags=["Satellite"])
 app.include_router(bio_router.router, prefix="/api/v1/bio", tags=["Bio-Shield"])
 app.include_router(infra_router.router, prefix="/api/v1/infra", tags=["Infrastructure"]) # <-- NEW
+app.include_router(risks_router.router, prefix="/api/v1/risks", tags=["Risks"])
 
 @app.get("/")
 async def read_root():
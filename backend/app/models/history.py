@@ -1,5 +1,6 @@
-from sqlalchemy import Column, Integer, Float, Date, String
+from sqlalchemy import BigInteger, Column, Integer, Float, Date, String, Text, Index, event
 from sqlalchemy.sql import func
+from app import grid
 from .database import Base
 
 class RegionalHistory(Base):
@@ -12,6 +13,11 @@ class RegionalHistory(Base):
     longitude = Column(Float, nullable=False, index=True)
     date = Column(Date, nullable=False, index=True)
 
+    # History grid cell (app.grid.cell_id). Lookups go through (cell_id, date)
+    # instead of float equality on latitude/longitude; NULL on rows written
+    # before the column existed until migrate_history_cells.py backfills them.
+    cell_id = Column(BigInteger, nullable=True)
+
     # --- The Features (Inputs for AI) ---
     avg_temp_c = Column(Float)          # Daily Average Temp
     precipitation_mm = Column(Float)    # Daily Rain Sum
@@ -24,5 +30,54 @@ class RegionalHistory(Base):
     calculated_flood_risk = Column(Float) 
     calculated_fire_risk = Column(Float)
 
+    # One row per location and day; bulk ingestion upserts against this key.
+    # (cell_id, date) serves every read: one range scan per cell, already in date order.
+    __table_args__ = (
+        Index("uq_history_location_date", "latitude", "longitude", "date", unique=True),
+        Index("ix_history_cell_date", "cell_id", "date"),
+    )
+
+    def __repr__(self):
+        return f"<History({self.date} @ {self.latitude},{self.longitude})>"
+
+
+@event.listens_for(RegionalHistory, "before_insert")
+@event.listens_for(RegionalHistory, "before_update")
+def _set_cell_id(mapper, connection, target):
+    # ORM writes derive the cell; Core writers (history_ingest) set it themselves
+    target.cell_id = grid.cell_id(target.latitude, target.longitude)
+
+
+class RegionalTrendStats(Base):
+    """
+    Running least-squares sums per history grid cell, kept in step with
+    regional_history by services/trend_stats.py so trend predictions
+    never rescan the raw rows.
+    """
+    __tablename__ = "regional_trend_stats"
+
+    cell_id = Column(BigInteger, primary_key=True, autoincrement=False)
+
+    # x = days since origin_date (the first day seen for the location)
+    origin_date = Column(Date, nullable=False)
+    last_date = Column(Date, nullable=False)
+    rows = Column(Integer, nullable=False, default=0)
+
+    # All-time sums per target: n, Σx, Σx², Σy, Σxy (days with a value only)
+    flood_n = Column(Integer, nullable=False, default=0)
+    flood_sum_x = Column(Float, nullable=False, default=0.0)
+    flood_sum_xx = Column(Float, nullable=False, default=0.0)
+    flood_sum_y = Column(Float, nullable=False, default=0.0)
+    flood_sum_xy = Column(Float, nullable=False, default=0.0)
+    fire_n = Column(Integer, nullable=False, default=0)
+    fire_sum_x = Column(Float, nullable=False, default=0.0)
+    fire_sum_xx = Column(Float, nullable=False, default=0.0)
+    fire_sum_y = Column(Float, nullable=False, default=0.0)
+    fire_sum_xy = Column(Float, nullable=False, default=0.0)
+
+    # Sliding window: JSON {iso_date: [flood_n, flood_sum, fire_n, fire_sum]}
+    # for the last TREND_WINDOW_DAYS days up to last_date
+    window = Column(Text, nullable=False, default="{}")
+
     def __repr__(self):
-        return f"<History({self.date} @ {self.latitude},{self.longitude})>"
\ No newline at end of file
+        return f"<TrendStats(cell {self.cell_id} n={self.rows})>"
@@ -1,45 +1,141 @@
 import math
 from typing import List
-from .helpers import haversine_distance
+
+import numpy as np
+
+from . import hazard_rules
+from .hazard_rules import ALL_CLEAR
+from .helpers import k_nearest
+from .rivers import RiverIndex
 from .services.usgs import QuakeData # Import the Pydantic model
 
-def calculate_fwi(temp_c: float, humidity_rh: float, wind_kmh: float, rain_mm: float) -> float:
+# --- Batch (array-in / array-out) risk engine ---
+# Each *_batch function scores any number of locations or time steps in
+# one call. The scalar functions below are thin wrappers around them, so
+# both share the exact same thresholds; alert and safety thresholds come
+# from the rule table in hazard_rules. Missing values (None) become NaN,
+# which never crosses a threshold.
+
+def _values(x) -> np.ndarray:
+    return np.array(x, dtype=np.float64)
+
+
+def calculate_fwi_batch(temp_c, humidity_rh, wind_kmh, rain_mm) -> np.ndarray:
     """
-    Calculates a simplified Fire Weather Index (FWI) score (0-100).
-    This is a conceptual model based on FWI inputs, not the full CFFDRS.
+    Vectorized calculate_fwi: simplified Fire Weather Index (0-100)
+    for arrays of inputs (broadcast against each other).
     """
-    
-    # 1. Drought Factor (based on rain)
-    # More rain = less drought.
-    if rain_mm > 10:
-        drought_factor = 0.1 # Very wet
-    elif rain_mm > 5:
-        drought_factor = 0.5
-    elif rain_mm > 1:
-        drought_factor = 0.8
-    else:
-        drought_factor = 1.0 # Very dry
+    temp_c, humidity_rh, wind_kmh, rain_mm = map(_values, (temp_c, humidity_rh, wind_kmh, rain_mm))
 
-    # 2. Temperature Factor
-    # Higher temp = higher risk. Clamp at 0.
-    temp_factor = max(0, temp_c - 10) / 10.0 
-    
-    # 3. Humidity Factor
-    # Lower humidity = higher risk.
-    humidity_factor = max(0, (70 - humidity_rh)) / 20.0
+    # 1. Drought Factor (based on rain). More rain = less drought.
+    drought_factor = np.select(
+        [rain_mm > 10, rain_mm > 5, rain_mm > 1],
+        [0.1, 0.5, 0.8],
+        default=1.0  # Very dry
+    )
+
+    # 2. Temperature Factor. Higher temp = higher risk. Clamp at 0.
+    temp_factor = np.maximum(0, temp_c - 10) / 10.0
+
+    # 3. Humidity Factor. Lower humidity = higher risk.
+    humidity_factor = np.maximum(0, (70 - humidity_rh)) / 20.0
 
-    # 4. Wind Factor
-    # More wind = higher risk.
+    # 4. Wind Factor. More wind = higher risk.
     wind_factor = 1.0 + (wind_kmh / 20.0)
 
-    # Combine factors
-    # This is a conceptual weighted product
+    # Combine factors (conceptual weighted product), normalize and clamp
     raw_score = (temp_factor * 1.5 + humidity_factor * 1.0) * wind_factor * drought_factor * 20
-    
-    # Normalize and clamp the score
-    final_score = max(0, min(100, raw_score))
-    
-    return final_score
+    return np.clip(raw_score, 0, 100)
+
+
+def calculate_safety_score_batch(fire_risk, aqi) -> dict:
+    """
+    Vectorized calculate_safety_score. Returns {"score": int array,
+    "primary_risk": str array}; use None/NaN where AQI is unknown.
+    """
+    # 1. Deduct points for Fire Risk (the biggest penalty), then Air Quality
+    fire = hazard_rules.evaluate("safety_fire", fire_risk=_values(fire_risk))
+    air = hazard_rules.evaluate("safety_air", aqi=_values(aqi))
+    total_score = 100.0 - fire["value"] - air["value"]
+
+    # 2. Air quality only becomes the primary risk if fire isn't worse
+    primary_risk = np.where(
+        air["triggered"] & (total_score > air["primary_above"]),
+        air["severity"], fire["severity"]
+    )
+
+    # Clamp the final score
+    return {
+        "score": np.round(np.clip(total_score, 0, 100)).astype(int),
+        "primary_risk": primary_risk
+    }
+
+
+def calculate_flood_risk_batch(
+    lats,
+    lons,
+    precipitation_forecast_7d,
+    soil_moisture_current,
+    rivers_data  # RiverIndex built at startup (or the raw world_rivers.json)
+) -> np.ndarray:
+    """
+    Vectorized calculate_flood_risk: Flood Probability Scores (0-100)
+    for many locations, with one batched nearest-river lookup.
+    """
+    rain, soil = _values(precipitation_forecast_7d), _values(soil_moisture_current)
+
+    # 1. Rain Factor (Primary Driver)
+    base_risk = np.select([rain > 100, rain > 50, rain > 25], [40.0, 20.0, 10.0], default=0.0)
+
+    # 2. Soil Moisture Factor (Risk Multiplier), in m³/m³ (e.g., 0.1 to 0.5)
+    base_risk = base_risk * np.select([soil > 0.4, soil > 0.3], [2.0, 1.5], default=1.0)
+
+    # 3. Proximity to River Factor (Risk Adder). Distance is to the nearest river segment.
+    river_index = river_index_for(rivers_data)
+    if river_index is not None:
+        min_dist_to_river = np.asarray(river_index.distance_km(_values(lats), _values(lons)))
+    else:
+        min_dist_to_river = np.full(np.shape(_values(lats)), 99999.0)
+
+    base_risk = base_risk + np.select(
+        [min_dist_to_river < 10, min_dist_to_river < 25, min_dist_to_river < 50],
+        [30, 15, 5],  # < 10km from a major river/lake is the Naivasha case
+        default=0
+    )
+
+    # 4. Final clamping (round() and np.round both round half to even)
+    return np.round(np.clip(base_risk, 0, 100)).astype(int)
+
+
+def generate_proactive_alerts_batch(fire_risk, flood_risk, uv_index) -> List[List[str]]:
+    """
+    Vectorized generate_proactive_alerts: one list of alert messages per
+    location. Levels are computed for every location at once; only the
+    final message lists are assembled per location.
+    """
+    fire_risk, flood_risk, uv_index = np.broadcast_arrays(
+        _values(fire_risk), _values(flood_risk), _values(uv_index)
+    )
+    alerts = hazard_rules.evaluate_many(
+        ("flood_alert", "fire_alert", "uv_alert"),
+        {"flood_risk": flood_risk, "fire_risk": fire_risk, "uv_index": uv_index}
+    ).values()
+
+    results = []
+    for i in np.ndindex(fire_risk.shape):
+        messages = [alert["message"][i] for alert in alerts if alert["triggered"][i]]
+        results.append(messages or [ALL_CLEAR])
+    return results
+
+
+# --- Scalar API (one location) ---
+
+def calculate_fwi(temp_c: float, humidity_rh: float, wind_kmh: float, rain_mm: float) -> float:
+    """
+    Calculates a simplified Fire Weather Index (FWI) score (0-100).
+    This is a conceptual model based on FWI inputs, not the full CFFDRS.
+    """
+    return float(calculate_fwi_batch(temp_c, humidity_rh, wind_kmh, rain_mm))
 
 
 def calculate_safety_score(
@@ -52,44 +148,10 @@ def calculate_safety_score(
     
     Score: 100 = Perfectly Safe, 0 = Extreme Danger
     """
-    
-    # Start with a perfect score of 100
-    total_score = 100.0
-    primary_risk = "Low"
-    
-    # 1. Deduct points for Fire Risk
-    # This is the biggest penalty
-    if fire_risk > 75:
-        total_score -= 70
-        primary_risk = "Extreme Fire Risk"
-    elif fire_risk > 50:
-        total_score -= 40
-        primary_risk = "High Fire Risk"
-    elif fire_risk > 20:
-        total_score -= 15
-        primary_risk = "Moderate Fire Risk"
-
-    # 2. Deduct points for Air Quality
-    if aqi is not None:
-        if aqi > 150:
-            total_score -= 25 # Unhealthy
-            if total_score > 50: # Only set if fire isn't worse
-                primary_risk = "Poor Air Quality"
-        elif aqi > 100:
-            total_score -= 15 # Unhealthy for sensitive groups
-            if total_score > 70:
-                primary_risk = "Poor Air Quality"
-        elif aqi > 50:
-            total_score -= 5 # Moderate
-            if total_score > 85:
-                primary_risk = "Moderate Air Quality"
-
-    # Clamp the final score
-    final_score = max(0, min(100, total_score))
-    
+    result = calculate_safety_score_batch(fire_risk, aqi)
     return {
-        "score": round(final_score),
-        "primary_risk": primary_risk
+        "score": int(result["score"]),
+        "primary_risk": str(result["primary_risk"])
     }
 
 
@@ -98,61 +160,32 @@ def calculate_flood_risk(
     user_lon: float,
     precipitation_forecast_7d: float,
     soil_moisture_current: float,
-    rivers_data: dict  # This is the loaded world_rivers.json
+    rivers_data  # RiverIndex built at startup (or the raw world_rivers.json)
 ) -> float:
     """
     Calculates a Flood Probability Score (0-100) by fusing
     rain forecast, soil moisture, and proximity to rivers.
     """
-    base_risk = 0.0
+    return int(calculate_flood_risk_batch(
+        user_lat, user_lon, precipitation_forecast_7d, soil_moisture_current, rivers_data
+    ))
 
-    # 1. Rain Factor (Primary Driver)
-    if precipitation_forecast_7d > 100: # Over 100mm in 7 days
-        base_risk += 40
-    elif precipitation_forecast_7d > 50:
-        base_risk += 20
-    elif precipitation_forecast_7d > 25:
-        base_risk += 10
-        
-    # 2. Soil Moisture Factor (Risk Multiplier)
-    # soil_moisture is in m³/m³ (e.g., 0.1 to 0.5)
-    soil_multiplier = 1.0
-    if soil_moisture_current > 0.4: # Very saturated
-        soil_multiplier = 2.0
-    elif soil_moisture_current > 0.3:
-        soil_multiplier = 1.5
-    
-    # Apply multiplier
-    base_risk = base_risk * soil_multiplier
 
-    # 3. Proximity to River Factor (Risk Adder)
-    # This is your Naivasha logic.
-    min_dist_to_river = 99999 # Start with a huge distance
-    
-    if rivers_data:
-        for feature in rivers_data.get("features", []):
-            try:
-                # A river is a LineString (list of points)
-                for coords in feature.get("geometry", {}).get("coordinates", []):
-                    river_lon, river_lat = coords[0], coords[1] # Take first point
-                    dist = haversine_distance(user_lat, user_lon, river_lat, river_lon)
-                    if dist < min_dist_to_river:
-                        min_dist_to_river = dist
-            except Exception:
-                continue # Skip malformed river data
-
-    # Add risk based on distance
-    if min_dist_to_river < 10: # < 10km from a major river/lake
-        base_risk += 30
-    elif min_dist_to_river < 25:
-        base_risk += 15
-    elif min_dist_to_river < 50:
-        base_risk += 5
-
-    # 4. Final clamping
-    final_score = max(0, min(100, base_risk))
-    
-    return round(final_score)
+_river_indexes = {}  # id(raw geojson) -> (geojson, RiverIndex)
+
+def river_index_for(rivers_data) -> RiverIndex | None:
+    """
+    Accepts anything with distance_km() as-is. A raw GeoJSON dict (scripts,
+    old callers) is indexed once and the index reused for that dict.
+    """
+    if rivers_data is None or hasattr(rivers_data, "distance_km"):
+        return rivers_data
+    cached = _river_indexes.get(id(rivers_data))
+    if cached is None or cached[0] is not rivers_data:
+        cached = (rivers_data, RiverIndex.from_geojson(rivers_data))
+        _river_indexes.clear()
+        _river_indexes[id(rivers_data)] = cached
+    return cached[1]
 
 
 def find_closest_quake(
@@ -163,16 +196,14 @@ def find_closest_quake(
     """
     Finds the closest significant earthquake to the user.
     """
-    closest_quake = None
-    min_distance = float('inf')
-
-    for quake in quake_data.features:
-        distance = haversine_distance(user_lat, user_lon, quake.lat, quake.lon)
-        if distance < min_distance:
-            min_distance = distance
-            closest_quake = quake
-            
-    if closest_quake:
+    quakes = quake_data.features
+    if quakes:
+        idx, distances = k_nearest(
+            user_lat, user_lon,
+            ([q.lat for q in quakes], [q.lon for q in quakes]),
+            k=1
+        )
+        closest_quake, min_distance = quakes[idx[0]], float(distances[0])
         return {
             "mag": closest_quake.mag,
             "place": closest_quake.place,
@@ -193,29 +224,4 @@ def generate_proactive_alerts(
     Checks all risk scores and generates a list of human-readable
     alert messages for the user.
     """
-    alerts = []
-
-    # 1. Check Flood Risk (Your Naivasha example)
-    if flood_risk > 75:
-        alerts.append("CRITICAL: FLOODING MAY OCCUR IN YOUR AREA. EVACUATE LOW-LYING AREAS.")
-    elif flood_risk > 50:
-        alerts.append("WARNING: High flood probability detected. Monitor local river levels.")
-    
-    # 2. Check Fire Risk
-    if fire_risk > 75:
-        alerts.append("CRITICAL: Extreme Fire Risk detected. Be ready to evacuate.")
-    elif fire_risk > 50:
-        alerts.append("WARNING: High Fire Risk detected. Avoid all outdoor burning.")
-
-    # 3. Check UV Index (Your Nairobi example)
-    if uv_index is not None:
-        if uv_index >= 11:
-            alerts.append("HEALTH: Extreme UV Index (11+) forecast. Avoid sun exposure.")
-        elif uv_index >= 8:
-            alerts.append("HEALTH: Very High UV Index (8-10) forecast. Stay indoors or seek shade.")
-
-    # 4. If no risks, return a safe message
-    if not alerts:
-        alerts.append("All Clear: No immediate environmental threats detected for your area.")
-        
-    return alerts
\ No newline at end of file
+    return generate_proactive_alerts_batch(fire_risk, flood_risk, uv_index)[0]
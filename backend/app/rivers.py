@@ -0,0 +1,339 @@
+import json
+import math
+import os
+import time
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+EARTH_RADIUS_KM = 6371.0
+
+# Long river segments are split so no piece is longer than this. That bounds
+# how far any point of a segment can be from its midpoint, which is what lets
+# a KD-tree over midpoints find the nearest *segment*, not just vertex.
+MAX_SEGMENT_KM = 5.0
+
+# Midpoint candidates checked exactly per query before widening the search
+CANDIDATES = 16
+
+# Default grid spacing (degrees) of the precomputed distance raster
+RASTER_RESOLUTION = 0.05
+
+# Arrays RiverIndex.save writes next to the flat lines, as <prefix>.<name>.npy
+SEGMENT_ARRAYS = ("starts", "ends", "mids")
+
+
+def to_unit_vectors(lats, lons) -> np.ndarray:
+    """Degrees -> (n, 3) points on the unit sphere."""
+    lat = np.radians(np.asarray(lats, dtype=np.float64))
+    lon = np.radians(np.asarray(lons, dtype=np.float64))
+    cos_lat = np.cos(lat)
+    return np.stack([cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)], axis=-1)
+
+
+def to_lat_lon(vectors: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Unit-sphere points (..., 3) -> (lats, lons) in degrees."""
+    x, y, z = vectors[..., 0], vectors[..., 1], vectors[..., 2]
+    return np.degrees(np.arctan2(z, np.hypot(x, y))), np.degrees(np.arctan2(y, x))
+
+
+def km_to_chord(distance_km: float) -> float:
+    """Great-circle distance -> straight-line distance between unit vectors."""
+    return 2.0 * math.sin(min(distance_km / EARTH_RADIUS_KM, math.pi) / 2.0)
+
+
+def chord_to_km(chord):
+    """Inverse of km_to_chord, element-wise."""
+    return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.clip(np.asarray(chord) / 2.0, 0.0, 1.0))
+
+
+def _normalize(v: np.ndarray) -> np.ndarray:
+    return v / np.linalg.norm(v, axis=-1, keepdims=True)
+
+
+def _angle(u: np.ndarray, v: np.ndarray) -> np.ndarray:
+    """Great-circle angle (radians) between unit vectors, row-wise."""
+    return np.arctan2(np.linalg.norm(np.cross(u, v), axis=-1), np.einsum("ij,ij->i", u, v))
+
+
+def point_segment_angle(p: np.ndarray, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Angular distance from points p to great-circle segments a-b (all (n, 3)
+    unit vectors, row-wise). If the closest point on the segment's great
+    circle falls between a and b it is the perpendicular distance,
+    otherwise the nearer endpoint.
+    """
+    to_ends = np.minimum(_angle(p, a), _angle(p, b))
+
+    n = np.cross(a, b)
+    n_len = np.linalg.norm(n, axis=-1)
+    valid = n_len > 1e-12  # Zero-length segments (single points) only have endpoints
+    n = np.where(valid[:, None], n / np.where(valid, n_len, 1.0)[:, None], 0.0)
+
+    # Project p onto the great circle and check it lies between a and b
+    pn = np.einsum("ij,ij->i", p, n)
+    c = p - pn[:, None] * n
+    inside = valid & (np.einsum("ij,ij->i", np.cross(a, c), n) >= 0) \
+                   & (np.einsum("ij,ij->i", np.cross(c, b), n) >= 0)
+
+    perpendicular = np.arcsin(np.clip(np.abs(pn), 0.0, 1.0))
+    return np.where(inside, np.minimum(perpendicular, to_ends), to_ends)
+
+
+def flatten_geojson(geojson: dict) -> tuple[np.ndarray, np.ndarray]:
+    """
+    GeoJSON features -> (coords, offsets): a flat (n, 2) float64 array of
+    [lon, lat] vertices and an int64 array where line i spans
+    coords[offsets[i]:offsets[i + 1]]. Malformed geometries are skipped.
+    """
+    lines = []
+    for feature in geojson.get("features", []):
+        try:
+            for line in _lines(feature.get("geometry") or {}):
+                points = np.asarray(line, dtype=np.float64).reshape(len(line), -1)[:, :2]
+                if len(points):
+                    lines.append(points)
+        except Exception:
+            continue  # Skip malformed river data
+
+    offsets = np.zeros(len(lines) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(line) for line in lines])
+    coords = np.concatenate(lines) if lines else np.empty((0, 2))
+    return coords, offsets
+
+
+def load_lines(prefix: str) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Maps the <prefix>.coords.npy / <prefix>.offsets.npy pair written by
+    convert_rivers.py as read-only views of the files. Building an index
+    from them still copies into float64 segment vectors per process, so
+    this saves parse time, not memory; RiverIndex.load shares the segments.
+    """
+    return (np.load(f"{prefix}.coords.npy", mmap_mode="r"),
+            np.load(f"{prefix}.offsets.npy", mmap_mode="r"))
+
+
+def _lines(geometry: dict):
+    """Yields every vertex list of a GeoJSON geometry as [[lon, lat], ...]."""
+    kind = geometry.get("type")
+    coords = geometry.get("coordinates") or []
+    if kind == "LineString":
+        yield coords
+    elif kind in ("MultiLineString", "Polygon"):
+        yield from coords
+    elif kind == "MultiPolygon":
+        for polygon in coords:
+            yield from polygon
+    elif kind == "Point":
+        yield [coords]
+    elif kind == "MultiPoint":
+        for point in coords:
+            yield [point]
+    elif kind == "GeometryCollection":
+        for part in geometry.get("geometries", []):
+            yield from _lines(part)
+
+
+class RiverIndex:
+    """
+    Nearest-river lookups over the river network. Segments are stored as
+    unit-vector endpoints with a KD-tree over their midpoints; a query
+    checks the nearest few midpoints exactly and only widens the search
+    when a closer segment could still be hiding beyond them.
+    """
+
+    def __init__(self, starts: np.ndarray, ends: np.ndarray, mids: np.ndarray | None = None):
+        """
+        starts/ends are segment endpoints as unit vectors. Passing mids
+        means they are already densified (RiverIndex.load): the arrays are
+        used as given, and the KD-tree is built over mids without a copy.
+        """
+        if mids is None:
+            starts, ends = _densify(starts, ends)
+            mids = starts + ends
+            norms = np.linalg.norm(mids, axis=-1, keepdims=True)
+            mids = np.where(norms > 0, mids / np.where(norms > 0, norms, 1.0), starts)
+        self.starts, self.ends, self.mids = starts, ends, mids
+        self.tree = cKDTree(mids, copy_data=False) if len(mids) else None
+
+        # Furthest any segment point can be from its midpoint (chord length)
+        self.max_reach = float(np.max(np.linalg.norm(self.starts - mids, axis=-1))) if len(mids) else 0.0
+
+    def save(self, prefix: str):
+        """Writes the densified segments as <prefix>.starts/.ends/.mids.npy (float64)."""
+        for name in SEGMENT_ARRAYS:
+            np.save(f"{prefix}.{name}.npy", np.ascontiguousarray(getattr(self, name), dtype=np.float64))
+
+    @classmethod
+    def load(cls, prefix: str) -> "RiverIndex":
+        """
+        Maps the segments RiverIndex.save wrote. The vectors are read-only
+        views of the files, so gunicorn workers share them through the OS
+        page cache; only the KD-tree's own index arrays are per process.
+        """
+        return cls(*(np.load(f"{prefix}.{name}.npy", mmap_mode="r") for name in SEGMENT_ARRAYS))
+
+    @classmethod
+    def from_geojson(cls, geojson: dict) -> "RiverIndex":
+        return cls.from_lines(*flatten_geojson(geojson))
+
+    @classmethod
+    def from_lines(cls, coords: np.ndarray, offsets: np.ndarray) -> "RiverIndex":
+        """
+        Builds the index from the flat layout written by convert_rivers.py:
+        coords is (n, 2) [lon, lat] for every vertex of every line, and
+        line i spans coords[offsets[i]:offsets[i + 1]].
+        """
+        offsets = np.asarray(offsets, dtype=np.int64)
+        if len(coords) == 0:
+            return cls(np.empty((0, 3)), np.empty((0, 3)))
+
+        coords = np.asarray(coords, dtype=np.float64)
+        vectors = to_unit_vectors(coords[:, 1], coords[:, 0])
+
+        # A segment joins each vertex to the next one on the same line;
+        # single-vertex lines become zero-length segments (points)
+        line_ends = offsets[1:] - 1
+        has_next = np.ones(len(coords), dtype=bool)
+        has_next[line_ends] = False
+        single = offsets[:-1][offsets[1:] - offsets[:-1] == 1]
+
+        first = np.concatenate([np.nonzero(has_next)[0], single])
+        second = np.concatenate([np.nonzero(has_next)[0] + 1, single])
+        return cls(vectors[first], vectors[second])
+
+    def __len__(self):
+        return len(self.starts)
+
+    def distance_km(self, lats, lons, workers: int = 1):
+        """
+        Great-circle distance (km) from each point to the nearest river
+        segment. Scalars in, float out; arrays (any shape) in, array of
+        the same shape out.
+        """
+        lats, lons = np.broadcast_arrays(np.asarray(lats, dtype=np.float64), np.asarray(lons, dtype=np.float64))
+        shape = lats.shape
+        points = to_unit_vectors(lats.ravel(), lons.ravel())
+
+        if self.tree is None:
+            result = np.full(shape, np.inf)
+            return float(result) if not shape else result
+
+        # Check the k nearest midpoints exactly. A closer segment can only
+        # be missing if its midpoint is within (best chord + max_reach) but
+        # wasn't among the k, so re-query just those points with a larger k.
+        best = np.full(len(points), np.inf)
+        todo = np.arange(len(points))
+        k = CANDIDATES
+        while len(todo):
+            k = min(k, len(self.starts))
+            chord, idx = self.tree.query(points[todo], k=k, workers=workers)
+            chord, idx = chord.reshape(len(todo), k), idx.reshape(len(todo), k)
+
+            rows = np.repeat(todo, k)
+            angles = point_segment_angle(points[rows], self.starts[idx.ravel()], self.ends[idx.ravel()])
+            best[todo] = angles.reshape(len(todo), k).min(axis=1)
+
+            if k == len(self.starts):
+                break
+            bound = 2.0 * np.sin(best[todo] / 2.0) + self.max_reach
+            todo = todo[chord[:, -1] < bound]
+            k *= 4
+
+        result = (best * EARTH_RADIUS_KM).reshape(shape)
+        return float(result) if not shape else result
+
+
+class RiverRaster:
+    """
+    Precomputed distance-to-river grid built offline by
+    build_river_raster.py. Rows are latitudes -90..90 and columns
+    longitudes -180..180 (exclusive, wrapping), both at the grid's
+    resolution, which is derived from the array shape.
+
+    The .npy file is memory-mapped read-only, so every gunicorn worker
+    shares the same pages through the OS page cache. Lookups are O(1):
+    bilinear interpolation between the four surrounding grid nodes.
+    """
+
+    def __init__(self, grid: np.ndarray):
+        rows, cols = grid.shape
+        self.grid = grid
+        self.resolution = 180.0 / (rows - 1)
+        if not math.isclose(cols * self.resolution, 360.0, rel_tol=1e-6):
+            raise ValueError(f"Raster shape {grid.shape} is not a global lat/lon grid.")
+
+    @classmethod
+    def load(cls, path: str) -> "RiverRaster":
+        return cls(np.load(path, mmap_mode="r"))
+
+    def distance_km(self, lats, lons):
+        """Same contract as RiverIndex.distance_km, sampled from the grid."""
+        lats, lons = np.broadcast_arrays(np.asarray(lats, dtype=np.float64), np.asarray(lons, dtype=np.float64))
+        rows, cols = self.grid.shape
+
+        y = (np.clip(lats, -90.0, 90.0) + 90.0) / self.resolution
+        x = ((lons + 180.0) % 360.0) / self.resolution
+        y0 = np.minimum(np.floor(y).astype(np.int64), rows - 2)
+        x0 = np.floor(x).astype(np.int64)
+        fy, fx = y - y0, x - x0
+        x0 %= cols
+        x1 = (x0 + 1) % cols  # Wraps across the antimeridian
+
+        g = self.grid
+        result = (g[y0, x0] * (1 - fx) * (1 - fy) + g[y0, x1] * fx * (1 - fy)
+                  + g[y0 + 1, x0] * (1 - fx) * fy + g[y0 + 1, x1] * fx * fy)
+        return float(result) if not result.shape else result
+
+
+def load_river_index(base_dir: str):
+    """
+    River proximity from the fastest source available under base_dir/data:
+    1. the precomputed distance raster (build_river_raster.py), memory-mapped and shared by all workers
+    2. the prebuilt segments (convert_rivers.py), memory-mapped and shared; only the KD-tree is per worker
+    3. the flat binary lines (convert_rivers.py): no JSON parse, but segments are built per worker
+    4. the raw GeoJSON
+    """
+    raster_path = os.getenv("RIVER_RASTER_PATH", os.path.join(base_dir, 'data', 'river_distance.npy'))
+    rivers_prefix = os.path.join(base_dir, 'data', 'world_rivers')
+    started = time.perf_counter()
+    if os.path.exists(raster_path):
+        index = RiverRaster.load(raster_path)
+        print(f"River distance raster mapped ({index.resolution}° grid).")
+    elif all(os.path.exists(f"{rivers_prefix}.{name}.npy") for name in SEGMENT_ARRAYS):
+        index = RiverIndex.load(rivers_prefix)
+        print(f"River index ready ({len(index)} segments, "
+              f"{time.perf_counter() - started:.2f}s from mapped segments).")
+    elif os.path.exists(f"{rivers_prefix}.coords.npy"):
+        index = RiverIndex.from_lines(*load_lines(rivers_prefix))
+        print(f"River index ready ({len(index)} segments, "
+              f"{time.perf_counter() - started:.2f}s from binary).")
+    else:
+        with open(os.path.join(base_dir, 'data', 'world_rivers.json'), 'r', encoding='utf-8') as f:
+            # Only the index is kept; the raw GeoJSON is dropped after building it
+            index = RiverIndex.from_geojson(json.load(f))
+        print(f"River index ready ({len(index)} segments, "
+              f"{time.perf_counter() - started:.2f}s from GeoJSON).")
+    return index
+
+
+def raster_shape(resolution: float) -> tuple[int, int]:
+    return round(180.0 / resolution) + 1, round(360.0 / resolution)
+
+
+def _densify(starts: np.ndarray, ends: np.ndarray):
+    """Splits segments longer than MAX_SEGMENT_KM along their great circle."""
+    if len(starts) == 0:
+        return starts, ends
+
+    lengths_km = _angle(starts, ends) * EARTH_RADIUS_KM
+    pieces = np.maximum(1, np.ceil(lengths_km / MAX_SEGMENT_KM)).astype(np.int64)
+    if np.all(pieces == 1):
+        return starts, ends
+
+    seg = np.repeat(np.arange(len(starts)), pieces)
+    step = np.arange(len(seg)) - np.repeat(np.cumsum(pieces) - pieces, pieces)
+    t0 = (step / pieces[seg])[:, None]
+    t1 = ((step + 1) / pieces[seg])[:, None]
+    a, b = starts[seg], ends[seg]
+    return _normalize(a * (1 - t0) + b * t0), _normalize(a * (1 - t1) + b * t1)
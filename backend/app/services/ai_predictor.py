@@ -1,18 +1,19 @@
+import itertools
+
 import numpy as np
-import pandas as pd
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from fastapi import HTTPException
 from datetime import date, timedelta
 import random
 
-# --- Scikit-Learn Imports ---
-from sklearn.linear_model import LinearRegression
-
 # --- Pydantic Import (THE FIX) ---
 from pydantic import BaseModel
 
 # --- Import Models ---
 from app.models.history import RegionalHistory
+from app import grid, trend
+from app.services import history_ingest, trend_stats  # trend_stats also keeps the stats in step with history inserts
 
 # --- UPDATED CLASS DEFINITION ---
 class TrendPrediction(BaseModel):
@@ -22,14 +23,25 @@ class TrendPrediction(BaseModel):
     confidence: str     # "High" (lots of data) vs "Low" (little data)
     message: str
 
+# Locations fitted per vectorized pass while streaming batch results
+TREND_BATCH = 256
+
+def not_enough_data() -> TrendPrediction:
+    return TrendPrediction(
+        direction="Unknown", 
+        slope=0.0, 
+        next_week_score=0.0, 
+        confidence="None", 
+        message="Not enough historical data to predict trends."
+    )
+
 def generate_mock_history(db: Session, lat: float, lon: float):
     """
     COLD START HELPER:
     Generates 30 days of synthetic historical data for a location.
     """
-    existing = db.query(RegionalHistory).filter(
-        RegionalHistory.latitude == lat, 
-        RegionalHistory.longitude == lon
+    existing = db.query(RegionalHistory.id).filter(
+        RegionalHistory.cell_id == grid.cell_id(lat, lon)
     ).first()
     
     if existing:
@@ -41,6 +53,10 @@ def generate_mock_history(db: Session, lat: float, lon: float):
     base_soil = 0.2
     base_risk = 10.0
     
+    # Stored at the cell centre, like ingested rows, so both upsert onto the
+    # same (latitude, longitude, date) key and the cell keeps one series
+    cell = grid.snap(lat, lon, "history")
+    rows = []
     for i in range(30, 0, -1):
         day = today - timedelta(days=i)
         
@@ -49,62 +65,50 @@ def generate_mock_history(db: Session, lat: float, lon: float):
         soil_moisture = min(0.5, base_soil + (30 - i) * 0.01)
         daily_risk = min(100, base_risk + (daily_rain * 2) + (soil_moisture * 50))
         
-        record = RegionalHistory(
-            latitude=lat,
-            longitude=lon,
-            date=day,
-            avg_temp_c=25.0 + random.uniform(-2, 2),
-            precipitation_mm=daily_rain,
-            soil_moisture_index=soil_moisture,
-            calculated_flood_risk=daily_risk,
-            calculated_fire_risk=max(0, 80 - daily_risk)
-        )
-        db.add(record)
+        rows.append({
+            "latitude": cell.latitude,
+            "longitude": cell.longitude,
+            "date": day,
+            "avg_temp_c": 25.0 + random.uniform(-2, 2),
+            "precipitation_mm": daily_rain,
+            "soil_moisture_index": soil_moisture,
+            "calculated_flood_risk": daily_risk,
+            "calculated_fire_risk": max(0, 80 - daily_risk)
+        })
     
+    # One bulk upsert instead of 30 ORM inserts (also updates trend_stats)
+    history_ingest.write(db.connection(), rows)
     db.commit()
     print("Mock history generated.")
 
 
-def predict_flood_trend(db: Session, lat: float, lon: float) -> TrendPrediction:
+def predict_flood_trend(db: Session, lat: float, lon: float, window: bool = False) -> TrendPrediction:
     """
-    Uses Linear Regression to analyze the last 30 days of flood risk.
+    Linear trend of the flood risk history of the grid cell around
+    (lat, lon), from the running sums in trend_stats (one row read, no
+    scan of the history). With
+    window=True only the last trend_stats.WINDOW_DAYS days count.
     """
-    # 1. Fetch Data
-    history = db.query(RegionalHistory).filter(
-        RegionalHistory.latitude == lat,
-        RegionalHistory.longitude == lon
-    ).order_by(RegionalHistory.date).all()
-    
-    if len(history) < 5:
-        return TrendPrediction(
-            direction="Unknown", 
-            slope=0.0, 
-            next_week_score=0.0, 
-            confidence="None", 
-            message="Not enough historical data to predict trends."
-        )
-        
-    # 2. Prepare Data
-    df = pd.DataFrame([{
-        "day_index": (r.date - history[0].date).days,
-        "risk": r.calculated_flood_risk
-    } for r in history])
-    
-    X = df[["day_index"]]
-    y = df["risk"]
-    
-    # 3. Train Model
-    model = LinearRegression()
-    model.fit(X, y)
-    
-    slope = model.coef_[0]
-    
-    # 4. Predict Future
-    last_day_index = df["day_index"].max()
-    future_day_index = last_day_index + 7
-    predicted_risk = model.predict([[future_day_index]])[0]
-    
-    # 5. Interpret Results
+    return _predict_from_stats(db, lat, lon, "flood", window)
+
+
+def predict_fire_trend(db: Session, lat: float, lon: float, window: bool = False) -> TrendPrediction:
+    """Same as predict_flood_trend, for the fire risk history."""
+    return _predict_from_stats(db, lat, lon, "fire", window)
+
+
+def _predict_from_stats(db: Session, lat: float, lon: float, target: str, window: bool) -> TrendPrediction:
+    stats = trend_stats.load(db, lat, lon)
+    if stats is None:
+        return not_enough_data()
+    slope, intercept, samples, last_x = trend_stats.line(stats, target, window)
+    if samples < 5:
+        return not_enough_data()
+    return interpret_trend(target.capitalize(), slope, intercept + slope * (last_x + 7), samples)
+
+
+def interpret_trend(hazard: str, slope: float, predicted_risk: float, samples: int) -> TrendPrediction:
+    """5. Interpret Results: slope (points/day) and the 7-day prediction -> TrendPrediction."""
     direction = "Stable"
     if slope > 0.5:
         direction = "Increasing Quickly"
@@ -117,17 +121,80 @@ def predict_flood_trend(db: Session, lat: float, lon: float) -> TrendPrediction:
         
     predicted_risk = max(0, min(100, predicted_risk))
     
-    msg = f"Flood risk is {direction.lower()}. "
+    msg = f"{hazard} risk is {direction.lower()}. "
     if slope > 0:
         msg += f"Based on the last 30 days, risk is trending UP by {round(slope, 2)} points per day."
     else:
         msg += "Conditions are improving."
 
-    # This was the line causing the crash. Now it works because TrendPrediction is a BaseModel.
     return TrendPrediction(
         direction=direction,
         slope=slope,
         next_week_score=round(predicted_risk, 1),
-        confidence="High" if len(history) > 20 else "Medium",
+        confidence="High" if samples > 20 else "Medium",
         message=msg
-    )
\ No newline at end of file
+    )
+
+
+def predict_trends_many(db: Session, locations: list, target: str = "flood", days: int | None = None):
+    """
+    Trend predictions for many (lat, lon) locations from ONE query: the
+    history of all their grid cells in a single scan of the (cell_id, date)
+    index, grouped as rows stream in, and fitted TREND_BATCH cells at a
+    time with trend.fit_many. Yields ((lat, lon), TrendPrediction) as each
+    batch is fitted (locations sharing a cell share its result); locations
+    without history come last. days limits the scan to the most recent days.
+    """
+    column = getattr(RegionalHistory, trend_stats.TARGETS[target])
+    keys = list(dict.fromkeys((float(lat), float(lon)) for lat, lon in locations))
+    by_cell = {}
+    for key, cell in zip(keys, grid.cell_ids([k[0] for k in keys], [k[1] for k in keys]).tolist()):
+        by_cell.setdefault(cell, []).append(key)
+
+    query = select(RegionalHistory.cell_id, RegionalHistory.date, column) \
+        .where(RegionalHistory.cell_id.in_(list(by_cell)))
+    if days is not None:
+        query = query.where(RegionalHistory.date >= date.today() - timedelta(days=days))
+    query = query.order_by(RegionalHistory.cell_id, RegionalHistory.date) \
+        .execution_options(yield_per=2000)
+
+    seen = set()
+    groups = []
+    for cell, rows in itertools.groupby(db.execute(query), key=lambda row: row[0]):
+        rows = list(rows)
+        groups.append((cell, [row[1] for row in rows], [row[2] for row in rows]))
+        seen.add(cell)
+        if len(groups) >= TREND_BATCH:
+            yield from _fit_groups(groups, target.capitalize(), by_cell)
+            groups = []
+    yield from _fit_groups(groups, target.capitalize(), by_cell)
+
+    for cell, cell_keys in by_cell.items():
+        if cell not in seen:
+            for key in cell_keys:
+                yield key, not_enough_data()
+
+
+def _fit_groups(groups: list, hazard: str, by_cell: dict):
+    """Fits a batch of (cell, dates, values) histories in one fit_many pass."""
+    if not groups:
+        return
+    width = max(len(dates) for _, dates, _ in groups)
+    x = np.full((len(groups), width), np.nan)
+    y = np.full((len(groups), width), np.nan)
+    for i, (_, dates, values) in enumerate(groups):
+        day = np.array(dates, dtype="datetime64[D]")
+        x[i, :len(dates)] = (day - day[0]).astype(np.float64)
+        y[i, :len(values)] = np.array(values, dtype=np.float64)
+
+    fitted = trend.fit_many(x, y)
+    last_x = np.nanmax(x, axis=1)
+    predicted = fitted["intercept"] + fitted["slope"] * (last_x + 7)
+
+    for i, (cell, dates, _) in enumerate(groups):
+        if fitted["n"][i] < 5:
+            prediction = not_enough_data()
+        else:
+            prediction = interpret_trend(hazard, float(fitted["slope"][i]), float(predicted[i]), len(dates))
+        for key in by_cell[cell]:
+            yield key, prediction
@@ -1,5 +1,5 @@
-import httpx
 from pydantic import BaseModel
+from app.services import http_client
 
 AIR_API_URL = "https://air-quality-api.open-meteo.com/v1/air-quality"
 
@@ -21,29 +21,28 @@ async def get_pollution_levels(lat: float, lon: float) -> AirData:
         "timezone": "auto"
     }
     
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(AIR_API_URL, params=params)
-            data = response.json()
+    try:
+        response = await http_client.get(AIR_API_URL, params=params)
+        data = response.json()
             
-            current = data.get("current", {})
-            aqi = current.get("european_aqi", 0)
-            co = current.get("carbon_monoxide", 0)
+        current = data.get("current", {})
+        aqi = current.get("european_aqi", 0)
+        co = current.get("carbon_monoxide", 0)
             
-            # Determine Status based on CO (Carbon Monoxide)
-            # CO > 300 µg/m³ usually implies heavy traffic/burning
-            status = "Clean"
-            if aqi > 80: status = "Toxic"
-            elif aqi > 50: status = "Polluted"
-            elif co > 350: status = "High Emissions"
+        # Determine Status based on CO (Carbon Monoxide)
+        # CO > 300 µg/m³ usually implies heavy traffic/burning
+        status = "Clean"
+        if aqi > 80: status = "Toxic"
+        elif aqi > 50: status = "Polluted"
+        elif co > 350: status = "High Emissions"
             
-            return AirData(
-                aqi=aqi,
-                co=co,
-                no2=current.get("nitrogen_dioxide", 0),
-                pm25=current.get("pm2_5", 0),
-                status=status
-            )
-        except Exception as e:
-            print(f"Air Quality Error: {e}")
-            return AirData(aqi=0, co=0, no2=0, pm25=0, status="Unknown")
\ No newline at end of file
+        return AirData(
+            aqi=aqi,
+            co=co,
+            no2=current.get("nitrogen_dioxide", 0),
+            pm25=current.get("pm2_5", 0),
+            status=status
+        )
+    except Exception as e:
+        print(f"Air Quality Error: {e}")
+        return AirData(aqi=0, co=0, no2=0, pm25=0, status="Unknown")
\ No newline at end of file
@@ -1,5 +1,8 @@
+import numpy as np
 from pydantic import BaseModel
 
+from app import hazard_rules
+
 class BioRisk(BaseModel):
     risk_level: str   # Low, Moderate, High, Critical
     vector: str       # Mosquitoes, Bacteria (Cholera), Heat Stress
@@ -10,41 +13,22 @@ async def analyze_biological_risk(temp: float, rain_7day: float):
     """
     The 'Bio-Shield' Logic:
     Correlates weather conditions with disease outbreak probability.
+    Thresholds live in the "bio" rule of hazard_rules:
+    1. Malaria / Dengue: Standing water (Rain > 20mm) + Warmth (> 23°C)
+    2. Cholera / Typhoid: Heavy floods (> 80mm) mix sewage with drinking water
+    3. Heat Stress: Temp > 32°C affects cognitive function
     """
-    # 1. MALARIA / DENGUE (Mosquitoes)
-    # Logic: Standing water (Rain > 20mm) + Warmth (> 23°C) = Breeding
-    if rain_7day > 20 and temp > 23:
-        return BioRisk(
-            risk_level="HIGH",
-            vector="Mosquito-Borne Disease",
-            message="Conditions are optimal for mosquito breeding (Warm + Wet).",
-            prevention="Use treated nets tonight. Clear standing water."
-        )
+    risk = hazard_rules.scalar(analyze_biological_risk_batch(temp, rain_7day))
+    return BioRisk(
+        risk_level=risk["severity"],
+        vector=risk["vector"],
+        message=risk["message"],
+        prevention=risk["prevention"]
+    )
 
-    # 2. CHOLERA / TYPHOID (Waterborne)
-    # Logic: Heavy floods (> 80mm) mix sewage with drinking water.
-    if rain_7day > 80:
-        return BioRisk(
-            risk_level="CRITICAL",
-            vector="Waterborne Contamination",
-            message="Heavy rainfall may contaminate local wells and taps.",
-            prevention="Boil ALL drinking water. Avoid raw vegetables."
-        )
 
-    # 3. HEAT STRESS (Human Biology)
-    # Logic: Temp > 32°C affects cognitive function.
-    if temp > 32:
-        return BioRisk(
-            risk_level="MODERATE",
-            vector="Heat Stroke",
-            message="Extreme heat affecting physical safety.",
-            prevention="Hydrate immediately. Avoid midday sun."
-        )
+def analyze_biological_risk_batch(temp, rain_7day) -> dict:
+    """Vectorized Bio-Shield for arrays of locations or forecast days (None = missing)."""
+    return hazard_rules.evaluate("bio", temp=np.array(temp, dtype=np.float64),
+                                 rain_7day=np.array(rain_7day, dtype=np.float64))
 
-    # 4. DEFAULT (Safe)
-    return BioRisk(
-        risk_level="LOW",
-        vector="None",
-        message="Biological conditions are stable.",
-        prevention="Maintain standard hygiene."
-    )
\ No newline at end of file
@@ -2,6 +2,8 @@ import httpx
 from fastapi import HTTPException
 from pydantic import BaseModel
 from typing import List
+from app import grid
+from app.services import http_client, singleflight
 
 # GBIF Occurrence Search API
 GBIF_API_URL = "https://api.gbif.org/v1/occurrence/search"
@@ -22,9 +24,14 @@ async def check_biodiversity_risk(lat: float, lon: float) -> EcoData:
     Checks if the location is within a 'Biodiversity Hotspot' by searching
     for IUCN Red List 'Critically Endangered' (CR) species within ~5km.
     """
+    # Snapped first, so nearby users share one GBIF call per cell
+    return await _fetch_biodiversity(grid.snap(lat, lon, "biodiversity"))
+
+@singleflight.coalesce("gbif")
+async def _fetch_biodiversity(cell: grid.GridCell) -> EcoData:
     # Create a rough bounding box (~0.05 degrees is approx 5km at equator)
-    min_lat, max_lat = lat - 0.05, lat + 0.05
-    min_lon, max_lon = lon - 0.05, lon + 0.05
+    min_lat, max_lat = round(cell.latitude - 0.05, 6), round(cell.latitude + 0.05, 6)
+    min_lon, max_lon = round(cell.longitude - 0.05, 6), round(cell.longitude + 0.05, 6)
     
     # Query GBIF:
     # - hasCoordinate=true (must have location)
@@ -38,51 +45,50 @@ async def check_biodiversity_risk(lat: float, lon: float) -> EcoData:
         "limit": 5
     }
     
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(GBIF_API_URL, params=params)
+    try:
+        response = await http_client.get(GBIF_API_URL, params=params)
             
-            # GBIF returns 200 even for empty searches, but we check anyway
-            if response.status_code != 200:
-                raise HTTPException(status_code=response.status_code, detail="GBIF API error")
+        # GBIF returns 200 even for empty searches, but we check anyway
+        if response.status_code != 200:
+            raise HTTPException(status_code=response.status_code, detail="GBIF API error")
                 
-            data = response.json()
-            count = data.get("count", 0)
-            results = data.get("results", [])
+        data = response.json()
+        count = data.get("count", 0)
+        results = data.get("results", [])
             
-            species_list = []
-            seen_species = set()
+        species_list = []
+        seen_species = set()
 
-            for record in results:
-                name = record.get("scientificName", "Unknown Species")
-                # Simple deduplication
-                if name not in seen_species:
-                    species_list.append(SpeciesInfo(
-                        scientific_name=name,
-                        kingdom=record.get("kingdom", "Unknown"),
-                        risk_category="Critically Endangered"
-                    ))
-                    seen_species.add(name)
+        for record in results:
+            name = record.get("scientificName", "Unknown Species")
+            # Simple deduplication
+            if name not in seen_species:
+                species_list.append(SpeciesInfo(
+                    scientific_name=name,
+                    kingdom=record.get("kingdom", "Unknown"),
+                    risk_category="Critically Endangered"
+                ))
+                seen_species.add(name)
 
-            is_sensitive = count > 0
+        is_sensitive = count > 0
             
-            msg = "No immediate ecological concerns detected."
-            if is_sensitive:
-                msg = f"Eco-Alert: This area is a habitat for {count} critically endangered species occurrences."
+        msg = "No immediate ecological concerns detected."
+        if is_sensitive:
+            msg = f"Eco-Alert: This area is a habitat for {count} critically endangered species occurrences."
 
-            return EcoData(
-                is_sensitive_area=is_sensitive,
-                endangered_count=count,
-                nearby_species=species_list,
-                message=msg
-            )
+        return EcoData(
+            is_sensitive_area=is_sensitive,
+            endangered_count=count,
+            nearby_species=species_list,
+            message=msg
+        )
 
-        except httpx.RequestError as e:
-            print(f"GBIF Connection Error: {e}")
-            # Fail safe: return clean data rather than crashing the dashboard
-            return EcoData(
-                is_sensitive_area=False, 
-                endangered_count=0, 
-                nearby_species=[], 
-                message="Could not verify biodiversity data."
-            )
\ No newline at end of file
+    except httpx.RequestError as e:
+        print(f"GBIF Connection Error: {e}")
+        # Fail safe: return clean data rather than crashing the dashboard
+        return EcoData(
+            is_sensitive_area=False, 
+            endangered_count=0, 
+            nearby_species=[], 
+            message="Could not verify biodiversity data."
+        )
\ No newline at end of file
@@ -0,0 +1,452 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# In-memory tier defaults (override per cache instance)
+DEFAULT_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", 4096))
+DEFAULT_TTL = 3600
+
+# Stale-while-revalidate: how long past expiry a value may still be served
+# while it refreshes, how many hits make a key "hot", and how close to expiry
+# hot keys are refreshed ahead of time.
+DEFAULT_STALE_TTL = float(os.getenv("CACHE_STALE_TTL", 6 * 3600))
+HOT_KEY_HITS = int(os.getenv("CACHE_HOT_KEY_HITS", 3))
+REFRESH_AHEAD = float(os.getenv("CACHE_REFRESH_AHEAD", 300))
+
+# Keys per SQL statement in the store's batch reads and deletes
+STORE_BATCH = 500
+
+
+def json_encode(value) -> bytes:
+    return json.dumps(value).encode("utf-8")
+
+
+def json_decode(payload: bytes):
+    return json.loads(payload)
+
+
+class SQLiteStore:
+    """
+    Optional persistence tier. One row per key, written incrementally
+    (INSERT OR REPLACE) so a store never rewrites the whole cache.
+    Calls block, so TTLCache makes them from a worker thread.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        # WAL lets several gunicorn workers read while one writes
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, expires_at REAL NOT NULL, payload BLOB NOT NULL)"
+        )
+        self.purge_expired()
+
+    def get(self, key: str):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT expires_at, payload FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+        return row  # (expires_at, payload) or None
+
+    def get_many(self, keys: list) -> dict:
+        """{key: (expires_at, payload)} for the keys that are held."""
+        rows = {}
+        with self._lock:
+            for i in range(0, len(keys), STORE_BATCH):
+                chunk = keys[i:i + STORE_BATCH]
+                rows.update(
+                    (key, (expires_at, payload)) for key, expires_at, payload in self._conn.execute(
+                        f"SELECT key, expires_at, payload FROM cache WHERE key IN ({', '.join('?' * len(chunk))})",
+                        chunk,
+                    )
+                )
+        return rows
+
+    def set(self, key: str, expires_at: float, payload: bytes):
+        self.set_many([(key, expires_at, payload)])
+
+    def set_many(self, rows: list):
+        """rows: [(key, expires_at, payload)] -- one executemany, one transaction."""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO cache (key, expires_at, payload) VALUES (?, ?, ?)", rows
+                )
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def delete(self, key: str):
+        self.delete_many([key])
+
+    def delete_many(self, keys: list):
+        with self._lock:
+            for i in range(0, len(keys), STORE_BATCH):
+                chunk = keys[i:i + STORE_BATCH]
+                self._conn.execute(f"DELETE FROM cache WHERE key IN ({', '.join('?' * len(chunk))})", chunk)
+
+    def purge_expired(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache WHERE expires_at < ?", (time.time(),))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class _Entry:
+    __slots__ = ("value", "expires_at", "hits", "loader", "ttl")
+
+    def __init__(self, value, expires_at, loader=None, ttl=None):
+        self.value = value
+        self.expires_at = expires_at
+        self.hits = 0
+        self.loader = loader  # Zero-arg coroutine function that refetches the value
+        self.ttl = ttl
+
+
+class TTLCache:
+    """
+    Bounded in-process cache with per-key expiry and LRU eviction.
+    If a persistence store is attached, misses fall through to it and
+    sets are written behind: queued, then flushed from a worker thread
+    in one transaction per burst, so the event loop never waits on SQLite.
+
+    get_or_load() adds stale-while-revalidate: expired values are served
+    for up to stale_ttl while one background task refreshes them, and hot
+    keys are refreshed shortly before they expire. Past that window the
+    old value is still returned if the reload fails.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        default_ttl: float = DEFAULT_TTL,
+        store: SQLiteStore | None = None,
+        encode=json_encode,
+        decode=json_decode,
+        stale_ttl: float = DEFAULT_STALE_TTL,
+    ):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.stale_ttl = stale_ttl
+        self.store = store
+        self.encode = encode
+        self.decode = decode
+        self._data: OrderedDict = OrderedDict()  # key -> _Entry
+        self._refreshing: dict = {}  # key -> background refresh task
+        self._refresher = None
+        self._pending: dict = {}  # key -> (expires_at, payload), or None for a delete, not yet in the store
+        self._writing: dict = {}  # The batch a worker thread is writing right now
+        self._flusher = None
+        self._listeners = []  # Called with the key whenever a value is replaced or deleted
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.stale_hits = 0
+        self.last_good_hits = 0
+        self.refreshes = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key):
+        """Returns the value if it is fresh, else None."""
+        entry = self._lookup(key)
+        if entry is None or entry.expires_at <= time.time():
+            self.misses += 1
+            return None
+        entry.hits += 1
+        self.hits += 1
+        return entry.value
+
+    async def get_or_load(self, key, loader, ttl: float | None = None):
+        """
+        Returns the cached value, calling `loader()` (a zero-arg coroutine
+        function) only on a true miss. Stale values are returned at once
+        and refreshed in the background; hot keys are refreshed ahead of
+        expiry.
+        """
+        entry = await self._lookup_async(key)
+        now = time.time()
+
+        if entry is None or entry.expires_at + self.stale_ttl <= now:
+            self.misses += 1
+            try:
+                value = await loader()
+            except Exception as e:
+                if entry is None:
+                    raise
+                # Upstream is failing: fall back to the last known good value
+                print(f"Cache load failed ({key}), serving last known good: {e}")
+                self.last_good_hits += 1
+                return entry.value
+            self.set(key, value, ttl, loader=loader)
+            return value
+
+        entry.loader = entry.loader or loader
+        entry.ttl = entry.ttl if entry.ttl is not None else ttl
+        entry.hits += 1
+
+        if entry.expires_at <= now:
+            self.stale_hits += 1
+            self._refresh_in_background(key, entry)
+        else:
+            self.hits += 1
+            if entry.hits >= HOT_KEY_HITS and entry.expires_at - now < REFRESH_AHEAD:
+                self._refresh_in_background(key, entry)
+
+        return entry.value
+
+    def set(self, key, value, ttl: float | None = None, loader=None):
+        expires_at = time.time() + (ttl if ttl is not None else self.default_ttl)
+        previous = self._data.get(key)
+        if loader is None and previous is not None:
+            loader = previous.loader
+        self._put(key, _Entry(value, expires_at, loader, ttl))
+        self._notify(key)
+
+        if self.store is not None:
+            try:
+                self._write_behind(key, (expires_at, self.encode(value)))
+            except Exception as e:
+                print(f"Cache store write error ({key}): {e}")
+
+    def set_many(self, items: dict, ttl: float | None = None):
+        """set() for every key -> value in items; the store gets them in one transaction."""
+        for key, value in items.items():
+            self.set(key, value, ttl)
+
+    async def get_many(self, keys) -> dict:
+        """
+        {key: value} for the keys with a fresh value. Keys not in memory are
+        read from the store in one query, off the event loop.
+        """
+        entries = {key: self._memory(key) for key in keys}
+        missing = [key for key, entry in entries.items() if entry is None]
+        if missing and self.store is not None:
+            rows = await asyncio.to_thread(self._read_store, missing)
+            entries.update(self._load_rows(missing, rows))
+
+        now = time.time()
+        values = {}
+        for key, entry in entries.items():
+            if entry is None or entry.expires_at <= now:
+                self.misses += 1
+                continue
+            entry.hits += 1
+            self.hits += 1
+            values[key] = entry.value
+        return values
+
+    def delete(self, key) -> bool:
+        """Removes the key; returns whether it was held in memory."""
+        held = self._data.pop(key, None) is not None
+        self._notify(key)
+        if self.store is not None:
+            self._write_behind(key, None)
+        return held
+
+    async def flush(self):
+        """Waits until every queued store write has landed (call at shutdown)."""
+        while self._flusher is not None and not self._flusher.done():
+            await self._flusher
+
+    def add_listener(self, listener):
+        """
+        Registers `listener(key)` to be called after every set() or delete(),
+        so values derived from an entry can be dropped when it changes.
+        """
+        self._listeners.append(listener)
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._data),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "last_good_hits": self.last_good_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "refreshes": self.refreshes,
+            "refreshing": len(self._refreshing),
+        }
+
+    # --- Background refresh ---
+
+    def refresh_hot_keys(self) -> int:
+        """
+        Schedules a refresh for every hot key that is about to expire.
+        Returns how many refreshes were started.
+        """
+        now = time.time()
+        started = 0
+        for key, entry in list(self._data.items()):
+            if (entry.loader is not None and entry.hits >= HOT_KEY_HITS
+                    and entry.expires_at - now < REFRESH_AHEAD):
+                started += self._refresh_in_background(key, entry)
+        return started
+
+    def start_refresher(self, interval: float = 60.0):
+        """Starts the periodic hot-key sweep on the running event loop."""
+        async def sweep():
+            while True:
+                await asyncio.sleep(interval)
+                try:
+                    self.refresh_hot_keys()
+                except Exception as e:
+                    print(f"Cache refresher error: {e}")
+
+        if self._refresher is None or self._refresher.done():
+            self._refresher = asyncio.create_task(sweep())
+        return self._refresher
+
+    async def stop_refresher(self):
+        tasks = list(self._refreshing.values())
+        if self._refresher is not None:
+            tasks.append(self._refresher)
+            self._refresher = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _refresh_in_background(self, key, entry: _Entry) -> bool:
+        if entry.loader is None or key in self._refreshing:
+            return False
+
+        async def refresh():
+            try:
+                value = await entry.loader()
+                self.set(key, value, entry.ttl, loader=entry.loader)
+                self.refreshes += 1
+            except Exception as e:
+                # Keep serving the stale value; the next access retries
+                print(f"Cache refresh failed ({key}): {e}")
+            finally:
+                self._refreshing.pop(key, None)
+
+        self._refreshing[key] = asyncio.create_task(refresh())
+        return True
+
+    # --- Internals ---
+
+    def _notify(self, key):
+        for listener in self._listeners:
+            try:
+                listener(key)
+            except Exception as e:
+                print(f"Cache listener error ({key}): {e}")
+
+    def _lookup(self, key):
+        """
+        Returns the in-memory entry however old it is (expired entries stay
+        until LRU eviction as last-known-good values), else a fresh entry
+        from the persistence tier, else None. Blocks on the store; async
+        callers use _lookup_async.
+        """
+        entry = self._memory(key)
+        if entry is None and self.store is not None:
+            entry = self._load_rows([key], self._read_store([key])).get(key)
+        return entry
+
+    async def _lookup_async(self, key):
+        """_lookup with the store read in a worker thread."""
+        entry = self._memory(key)
+        if entry is None and self.store is not None:
+            rows = await asyncio.to_thread(self._read_store, [key])
+            entry = self._load_rows([key], rows).get(key)
+        return entry
+
+    def _memory(self, key):
+        entry = self._data.get(key)
+        if entry is not None:
+            self._data.move_to_end(key)
+        return entry
+
+    def _read_store(self, keys: list) -> dict:
+        try:
+            return self.store.get_many(keys)
+        except Exception as e:
+            print(f"Cache store read error ({len(keys)} keys): {e}")
+            return {}
+
+    def _load_rows(self, keys: list, rows: dict) -> dict:
+        """
+        Entries for keys from store rows, overlaid with writes still queued
+        and with anything set in memory while the read was running.
+        """
+        now = time.time()
+        entries = {}
+        for key in keys:
+            entry = self._memory(key)
+            if entry is None:
+                row = self._queued(key, rows)
+                if row and row[0] > now:
+                    try:
+                        entry = _Entry(self.decode(row[1]), row[0])
+                    except Exception as e:
+                        print(f"Cache store read error ({key}): {e}")
+                        continue
+                    self._put(key, entry)
+            entries[key] = entry
+        return entries
+
+    def _queued(self, key, rows: dict):
+        """The newest row for key: a queued write, the batch being written, else the store's."""
+        for source in (self._pending, self._writing):
+            if key in source:
+                return source[key]
+        return rows.get(key)
+
+    def _write_behind(self, key, row):
+        self._pending[key] = row
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No event loop (scripts): write through
+            batch, self._pending = self._pending, {}
+            self._write_batch(batch)
+            return
+        if self._flusher is None or self._flusher.done():
+            self._flusher = loop.create_task(self._flush_pending())
+
+    async def _flush_pending(self):
+        # Batches are swapped out on the loop; sets made while one is being
+        # written go out in the next
+        while self._pending:
+            self._writing, self._pending = self._pending, {}
+            try:
+                await asyncio.to_thread(self._write_batch, self._writing)
+            finally:
+                self._writing = {}
+
+    def _write_batch(self, batch: dict):
+        try:
+            sets = [(key, *row) for key, row in batch.items() if row is not None]
+            deletes = [key for key, row in batch.items() if row is None]
+            if sets:
+                self.store.set_many(sets)
+            if deletes:
+                self.store.delete_many(deletes)
+        except Exception as e:
+            print(f"Cache store write error ({len(batch)} keys): {e}")
+
+    def _put(self, key, entry: _Entry):
+        self._data[key] = entry
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            self.evictions += 1
@@ -0,0 +1,146 @@
+import os
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from app.rivers import chord_to_km, km_to_chord, to_lat_lon, to_unit_vectors
+from app.services import nasa_eonet
+from app.services.live_store import LiveStore
+
+# EONET events change slowly (new events, new track points a few times a day)
+REFRESH_SECONDS = float(os.getenv("EONET_REFRESH_SECONDS", 300))
+EVENT_LIMIT = int(os.getenv("EONET_EVENT_LIMIT", 1000))
+EVENT_DAYS = int(os.getenv("EONET_EVENT_DAYS", 30))
+
+
+def locate(event: dict):
+    """
+    One (lat, lon, date) position per event, or None if it has no usable
+    geometry. Tracks (storms, icebergs) use their latest point, and a
+    multi-vertex geometry (LineString, MultiPoint) its last vertex; polygons
+    (fire perimeters) use the centroid of their outer ring.
+    """
+    geometries = [g for g in event.get("geometry") or [] if g.get("coordinates")]
+    if not geometries:
+        return None
+    # ISO timestamps sort chronologically; undated entries count as oldest
+    latest = max(geometries, key=lambda g: g.get("date") or "")
+
+    # Any malformed geometry just skips this event, never the whole refresh
+    try:
+        if latest.get("type") == "Polygon":
+            ring = np.asarray(latest["coordinates"][0], dtype=np.float64)[:, :2]
+            # Average on the sphere so rings crossing the antimeridian work
+            lat, lon = to_lat_lon(to_unit_vectors(ring[:, 1], ring[:, 0]).mean(axis=0))
+        else:
+            coords = np.asarray(latest["coordinates"], dtype=np.float64)
+            lon, lat = coords.reshape(-1, coords.shape[-1])[-1, :2]
+        lat, lon = float(lat), float(lon)
+        if not (np.isfinite(lat) and np.isfinite(lon)):
+            return None
+    except Exception:
+        return None
+    return lat, lon, latest.get("date")
+
+
+class EventIndex:
+    """
+    Immutable snapshot of the open EONET events, each reduced to one
+    position. A KD-tree over unit-sphere positions answers radius queries,
+    a latitude-sorted order answers bounding boxes, and a mask per category
+    id filters both.
+    """
+
+    def __init__(self, events: list):
+        located = []
+        for event in events:
+            position = locate(event)
+            if position is None:
+                print(f"Skipping event {event.get('id')}: no usable geometry.")
+                continue
+            located.append((event, position))
+        located.sort(key=lambda item: item[1][0])  # By latitude, for bbox lookups
+
+        self.events = [event for event, _ in located]
+        self.positions = [position for _, position in located]
+        self.lats = np.array([p[0] for p in self.positions], dtype=np.float64)
+        self.lons = np.array([p[1] for p in self.positions], dtype=np.float64)
+        self.tree = cKDTree(to_unit_vectors(self.lats, self.lons).reshape(-1, 3)) if located else None
+
+        self.categories = {}
+        for i, event in enumerate(self.events):
+            for category in event.get("categories") or []:
+                if category.get("id"):
+                    mask = self.categories.setdefault(category["id"], np.zeros(len(self.events), dtype=bool))
+                    mask[i] = True
+
+    def __len__(self):
+        return len(self.events)
+
+    def _category_mask(self, categories) -> np.ndarray | None:
+        if not categories:
+            return None
+        mask = np.zeros(len(self.events), dtype=bool)
+        for category in categories:
+            if category in self.categories:
+                mask |= self.categories[category]
+        return mask
+
+    def within(self, lat: float, lon: float, radius_km: float, categories=None) -> list:
+        """All (event, position, distance_km) within radius_km, nearest first."""
+        if self.tree is None:
+            return []
+        point = to_unit_vectors(lat, lon)
+        idx = np.asarray(self.tree.query_ball_point(point, km_to_chord(radius_km)), dtype=np.int64)
+        mask = self._category_mask(categories)
+        if mask is not None:
+            idx = idx[mask[idx]]
+        chord = np.linalg.norm(self.tree.data[idx] - point, axis=-1)
+        order = np.argsort(chord, kind="stable")
+        return [(self.events[i], self.positions[i], float(d))
+                for i, d in zip(idx[order], chord_to_km(chord[order]))]
+
+    def in_bbox(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float,
+                categories=None) -> list:
+        """
+        All (event, position) inside the box, south to north. A box with
+        min_lon > max_lon crosses the antimeridian.
+        """
+        idx = np.arange(np.searchsorted(self.lats, min_lat, side="left"),
+                        np.searchsorted(self.lats, max_lat, side="right"))
+        lons = self.lons[idx]
+        if min_lon <= max_lon:
+            idx = idx[(lons >= min_lon) & (lons <= max_lon)]
+        else:
+            idx = idx[(lons >= min_lon) | (lons <= max_lon)]
+        mask = self._category_mask(categories)
+        if mask is not None:
+            idx = idx[mask[idx]]
+        return [(self.events[i], self.positions[i]) for i in idx]
+
+
+class EventStore(LiveStore):
+    async def load(self):
+        return await nasa_eonet.fetch_open_events(limit=EVENT_LIMIT, days=EVENT_DAYS)
+
+    def build(self, data) -> EventIndex:
+        return EventIndex(data.get("events", []))
+
+    def stats(self) -> dict:
+        return {
+            **super().stats(),
+            "events": len(self.current) if self.current else 0,
+            "categories": len(self.current.categories) if self.current else 0,
+        }
+
+
+store = EventStore("eonet", REFRESH_SECONDS)
+
+
+def as_dict(event: dict, position: tuple, distance_km: float | None = None) -> dict:
+    """The EONET event as published, plus the position it was indexed at."""
+    lat, lon, observed = position
+    result = {**event, "position": {"latitude": lat, "longitude": lon, "date": observed}}
+    if distance_km is not None:
+        result["distance_km"] = round(distance_km, 2)
+    return result
@@ -2,6 +2,7 @@ import httpx
 from fastapi import HTTPException
 import os
 from pydantic import BaseModel
+from app.services import http_client
 
 # Get the Google Maps API Key you added to your .env file
 API_KEY = os.getenv("GOOGLE_MAPS_API_KEY")
@@ -24,7 +25,6 @@ async def get_air_quality(lat: float, lon: float) -> AirQualityData | None:
         print("Cannot fetch AQI: GOOGLE_MAPS_API_KEY is missing.")
         return None
 
-    client = httpx.AsyncClient()
     try:
         payload = {
             "location": {
@@ -39,7 +39,7 @@ async def get_air_quality(lat: float, lon: float) -> AirQualityData | None:
             'Content-Type': 'application/json'
         }
 
-        response = await client.post(f"{AIR_QUALITY_URL}?key={API_KEY}", json=payload, headers=headers)
+        response = await http_client.post(f"{AIR_QUALITY_URL}?key={API_KEY}", json=payload, headers=headers)
         
         response.raise_for_status() # Raise for 4xx/5xx errors
         
@@ -63,6 +63,4 @@ async def get_air_quality(lat: float, lon: float) -> AirQualityData | None:
         return None
     except Exception as e:
         print(f"Error processing Google Air Quality data: {e}")
-        return None
-    finally:
-        await client.aclose()
\ No newline at end of file
+        return None
\ No newline at end of file
@@ -0,0 +1,263 @@
+import asyncio
+import json
+import math
+import os
+import time
+from datetime import date, timedelta
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+
+from app import grid, processing
+from app.models.history import RegionalHistory
+from app.services import metrics, trend_stats, weather_archive
+
+# Fills regional_history from the weather archive: daily archive data for
+# many grid cells per request, scored with the batch risk engine, and bulk
+# upserted on (latitude, longitude, date). Rows are written with Core, so
+# trend_stats is fed directly instead of through the ORM hook.
+# Driven by ingest_history.py; progress is checkpointed per chunk of cells.
+
+CELLS_PER_CHUNK = int(os.getenv("HISTORY_INGEST_CELLS", 50))
+UPSERT_ROWS = int(os.getenv("HISTORY_INGEST_UPSERT_ROWS", 1000))
+
+# Flood risk takes a 7-day rain total; in history that's the 7 days up to
+# and including each day, so every run also reads the 6 days before start
+RAIN_WINDOW_DAYS = 7
+
+# Updated when a (latitude, longitude, date) row already exists; cell_id is
+# included so re-ingesting also fills it on rows from before the column
+VALUE_COLUMNS = ("cell_id", "avg_temp_c", "precipitation_mm", "soil_moisture_index",
+                 "calculated_flood_risk", "calculated_fire_risk")
+
+_table = RegionalHistory.__table__
+
+
+# --- Cells ---
+
+def cells_in_bbox(min_lat: float, min_lon: float, max_lat: float, max_lon: float) -> list:
+    """Every history grid cell whose centre lies in the box, south-west first."""
+    res = grid.resolution_for("history")
+    first = grid.snap(min_lat, min_lon, "history")
+    last = grid.snap(max_lat, max_lon, "history")
+    rows = round((last.latitude - first.latitude) / res) + 1
+    cols = round((last.longitude - first.longitude) / res) + 1
+    return [grid.snap(first.latitude + i * res, first.longitude + j * res, "history")
+            for i in range(max(rows, 0)) for j in range(max(cols, 0))]
+
+
+# --- Scoring ---
+
+def score(cells: list, dailies: list, start: date, rivers_data) -> list:
+    """
+    History rows for a chunk of cells. dailies are weather_archive daily
+    blocks aligned with cells, covering RAIN_WINDOW_DAYS - 1 days before
+    start; only days from start on that the archive holds become rows.
+    """
+    if not cells:
+        return []
+    column = lambda name: np.array([d[name] for d in dailies], dtype=np.float64)  # None -> NaN
+    rain = column("precipitation_sum")
+    soil = column("soil_moisture_0_to_7cm_mean")
+    lats = np.array([c.latitude for c in cells], dtype=np.float64)[:, None]
+    lons = np.array([c.longitude for c in cells], dtype=np.float64)[:, None]
+
+    # Trailing 7-day rain per day (missing days count as dry)
+    total = np.cumsum(np.nan_to_num(rain), axis=1)
+    rain_7d = total - np.pad(total, ((0, 0), (RAIN_WINDOW_DAYS, 0)))[:, :-RAIN_WINDOW_DAYS]
+
+    flood = processing.calculate_flood_risk_batch(lats, lons, rain_7d, soil, rivers_data).astype(np.float64)
+    fire = processing.calculate_fwi_batch(
+        column("temperature_2m_max"), column("relative_humidity_2m_min"),
+        column("wind_speed_10m_max"), rain
+    )
+    # No rain figure for the day -> no score
+    flood[np.isnan(rain)] = np.nan
+    fire[np.isnan(rain)] = np.nan
+
+    temp, held = column("temperature_2m_mean"), ~np.isnan(rain)
+    for name in weather_archive.DAILY_VARIABLES:
+        held |= ~np.isnan(column(name))
+
+    rows = []
+    times = [date.fromisoformat(t) for t in dailies[0]["time"]]
+    for i, cell in enumerate(cells):
+        cell_id = grid.cell_id(cell.latitude, cell.longitude)
+        for j, day in enumerate(times):
+            if day < start or not held[i, j]:
+                continue
+            rows.append({
+                "latitude": cell.latitude,
+                "longitude": cell.longitude,
+                "cell_id": cell_id,
+                "date": day,
+                "avg_temp_c": _value(temp[i, j]),
+                "precipitation_mm": _value(rain[i, j]),
+                "soil_moisture_index": _value(soil[i, j]),
+                "calculated_flood_risk": _value(flood[i, j]),
+                "calculated_fire_risk": _value(fire[i, j]),
+            })
+    return rows
+
+
+def _value(x) -> float | None:
+    return None if math.isnan(x) else float(x)
+
+
+# --- Writing ---
+
+def upsert(connection, rows: list):
+    """
+    INSERT ... ON DUPLICATE KEY UPDATE (ON CONFLICT on SQLite/Postgres)
+    keyed on (latitude, longitude, date), UPSERT_ROWS rows per executemany.
+    Rows without a cell_id get one from their coordinates.
+    """
+    for row in rows:
+        if row.get("cell_id") is None:
+            row["cell_id"] = grid.cell_id(row["latitude"], row["longitude"])
+
+    dialect = connection.dialect.name
+    if dialect in ("mysql", "mariadb"):
+        stmt = mysql.insert(_table)
+        stmt = stmt.on_duplicate_key_update({name: stmt.inserted[name] for name in VALUE_COLUMNS})
+    elif dialect in ("sqlite", "postgresql"):
+        stmt = (sqlite if dialect == "sqlite" else postgresql).insert(_table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["latitude", "longitude", "date"],
+            set_={name: stmt.excluded[name] for name in VALUE_COLUMNS}
+        )
+    else:
+        raise ValueError(f"No bulk upsert for dialect {dialect!r}")
+
+    for i in range(0, len(rows), UPSERT_ROWS):
+        connection.execute(stmt, rows[i:i + UPSERT_ROWS])
+
+
+def write(connection, rows: list):
+    """
+    Upserts rows and folds them into trend_stats, in the caller's
+    transaction. Rows being replaced leave the stats before the new
+    values enter.
+    """
+    if not rows:
+        return
+    for row in rows:
+        if row.get("cell_id") is None:
+            row["cell_id"] = grid.cell_id(row["latitude"], row["longitude"])
+    cells = list(dict.fromkeys(row["cell_id"] for row in rows))
+    skip = trend_stats.untracked(connection, cells)
+    incoming = {(row["latitude"], row["longitude"], row["date"]) for row in rows}
+
+    changes = []
+    first, last = min(row["date"] for row in rows), max(row["date"] for row in rows)
+    for i in range(0, len(cells), trend_stats.LOAD_CHUNK):
+        replaced = connection.execute(
+            select(_table.c.cell_id, _table.c.latitude, _table.c.longitude, _table.c.date,
+                   _table.c.calculated_flood_risk, _table.c.calculated_fire_risk)
+            .where(_table.c.cell_id.in_(cells[i:i + trend_stats.LOAD_CHUNK]),
+                   _table.c.date.between(first, last))
+        )
+        changes += [trend_stats.Change(cell, day, flood, fire, sign=-1)
+                    for cell, lat, lon, day, flood, fire in replaced
+                    if (lat, lon, day) in incoming and cell not in skip]
+    changes += [trend_stats.Change(row["cell_id"], row["date"],
+                                   row["calculated_flood_risk"], row["calculated_fire_risk"])
+                for row in rows if row["cell_id"] not in skip]
+
+    upsert(connection, rows)
+    trend_stats.apply(connection, changes)
+
+
+# --- Resumable runs ---
+
+class Checkpoint:
+    """
+    Cells already ingested for one (start, end) range, rewritten after
+    every chunk. A checkpoint for a different range is ignored.
+    """
+
+    def __init__(self, path: str | None, start: date, end: date):
+        self.path = path
+        self.range = [start.isoformat(), end.isoformat()]
+        self.done = set()
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+            if saved.get("range") == self.range:
+                self.done = set(saved.get("done", []))
+
+    def mark(self, cells: list):
+        self.done.update(grid.cell_key("history", cell) for cell in cells)
+        if not self.path:
+            return
+        # Written aside and renamed, so a crash never leaves half a file
+        with open(self.path + ".partial", "w", encoding="utf-8") as f:
+            json.dump({"range": self.range, "done": sorted(self.done)}, f)
+        os.replace(self.path + ".partial", self.path)
+
+    def __contains__(self, cell) -> bool:
+        return grid.cell_key("history", cell) in self.done
+
+
+async def ingest(engine, cells: list, start: date, end: date, rivers_data,
+                 checkpoint_path: str | None = None) -> dict:
+    """
+    Ingests [start, end] for every cell not already in the checkpoint,
+    CELLS_PER_CHUNK cells at a time, one transaction per chunk. The next
+    chunk's archive fetch runs while the current one is scored and written.
+    Cells the archive had nothing for are left out of the checkpoint so a
+    rerun retries them.
+    """
+    checkpoint = Checkpoint(checkpoint_path, start, end)
+    cells = list(dict.fromkeys(cells))
+    todo = [cell for cell in cells if cell not in checkpoint]
+    chunks = [todo[i:i + CELLS_PER_CHUNK] for i in range(0, len(todo), CELLS_PER_CHUNK)]
+    print(f"Ingesting {start}..{end} for {len(todo):,} cells "
+          f"({len(cells) - len(todo):,} already done, {len(chunks)} chunks)")
+
+    fetch_from = start - timedelta(days=RAIN_WINDOW_DAYS - 1)
+    fetch = lambda chunk: asyncio.create_task(weather_archive.get_daily_many(chunk, fetch_from, end))
+
+    started = time.perf_counter()
+    total_rows, empty = 0, 0
+    pending = fetch(chunks[0]) if chunks else None
+    try:
+        for n, chunk in enumerate(chunks, 1):
+            dailies = await pending
+            pending = fetch(chunks[n]) if n < len(chunks) else None
+
+            rows = score(chunk, dailies, start, rivers_data)
+            await asyncio.to_thread(_write_chunk, engine, rows)
+
+            filled = {(row["latitude"], row["longitude"]) for row in rows}
+            ingested = [cell for cell in chunk if (cell.latitude, cell.longitude) in filled]
+            empty += len(chunk) - len(ingested)
+            checkpoint.mark(ingested)
+
+            total_rows += len(rows)
+            metrics.incr("history_rows_ingested", amount=len(rows))
+            elapsed = time.perf_counter() - started
+            print(f"  chunk {n}/{len(chunks)}: {len(rows):,} rows  "
+                  f"(total {total_rows:,}, {total_rows / elapsed:,.0f} rows/s)")
+    finally:
+        # A failed chunk (or cancellation) must not leave the prefetch running unobserved
+        if pending is not None:
+            pending.cancel()
+            if pending.done() and not pending.cancelled():
+                pending.exception()  # Already failed: mark its error as seen
+
+    elapsed = time.perf_counter() - started
+    if empty:
+        print(f"⚠️ {empty} cells had no archive data; rerun to retry them.")
+    return {
+        "cells": len(todo) - empty,
+        "rows": total_rows,
+        "seconds": round(elapsed, 2),
+        "rows_per_sec": round(total_rows / elapsed, 1) if elapsed > 0 else 0.0,
+    }
+
+
+def _write_chunk(engine, rows: list):
+    with engine.begin() as connection:
+        write(connection, rows)
@@ -0,0 +1,176 @@
+import asyncio
+import os
+import time
+from typing import NamedTuple
+
+import httpx
+
+from app.services import metrics, resilience
+
+# HTTP/2 needs the optional 'h2' package (httpx[http2]); fall back to HTTP/1.1 without it
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class HostConfig(NamedTuple):
+    max_connections: int = int(os.getenv("HTTP_MAX_CONNECTIONS", 20))
+    max_keepalive: int = int(os.getenv("HTTP_MAX_KEEPALIVE", 10))
+    keepalive_expiry: float = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", 60.0))
+    max_concurrency: int = int(os.getenv("HTTP_MAX_CONCURRENCY", 32))  # In-flight requests per host
+    http2: bool = True
+    hedge: bool = False  # Fire a second GET once the first is slower than the host's p95
+
+
+# Set HTTP_HEDGING=0 to turn hedged requests off everywhere
+HEDGING_ENABLED = os.getenv("HTTP_HEDGING", "1") != "0"
+
+
+# Every upstream the services talk to. Unknown hosts get the defaults.
+HOSTS = {
+    "api.open-meteo.com": HostConfig(max_concurrency=48, hedge=True),
+    "marine-api.open-meteo.com": HostConfig(hedge=True),
+    "air-quality-api.open-meteo.com": HostConfig(hedge=True),
+    "archive-api.open-meteo.com": HostConfig(max_concurrency=8),
+    "earthquake.usgs.gov": HostConfig(max_concurrency=4, hedge=True),
+    "eonet.gsfc.nasa.gov": HostConfig(max_concurrency=4),
+    "api.nasa.gov": HostConfig(max_concurrency=4),
+    "api.gbif.org": HostConfig(max_concurrency=16),
+    "airquality.googleapis.com": HostConfig(),
+}
+
+_clients: dict[str, httpx.AsyncClient] = {}
+_slots: dict[str, asyncio.Semaphore] = {}
+_in_flight: dict[str, int] = {}
+
+
+def _create_client(host: str) -> httpx.AsyncClient:
+    config = HOSTS.get(host, HostConfig())
+    return httpx.AsyncClient(
+        http2=config.http2 and HTTP2_AVAILABLE,
+        limits=httpx.Limits(
+            max_connections=config.max_connections,
+            max_keepalive_connections=config.max_keepalive,
+            keepalive_expiry=config.keepalive_expiry,
+        ),
+    )
+
+
+def get_client(host: str) -> httpx.AsyncClient:
+    """
+    Returns the pooled client for a host. Clients are normally opened by
+    startup() in the app lifespan, but scripts and background jobs that
+    run outside it get one lazily.
+    """
+    client = _clients.get(host)
+    if client is None or client.is_closed:
+        client = _create_client(host)
+        _clients[host] = client
+        _slots[host] = asyncio.Semaphore(HOSTS.get(host, HostConfig()).max_concurrency)
+    return client
+
+
+async def startup():
+    for host in HOSTS:
+        get_client(host)
+    print(f"HTTP pool ready for {len(_clients)} upstream hosts (HTTP/2: {HTTP2_AVAILABLE}).")
+
+
+async def shutdown():
+    clients = list(_clients.values())
+    _clients.clear()
+    _slots.clear()
+    await asyncio.gather(*(client.aclose() for client in clients), return_exceptions=True)
+
+
+async def request(method: str, url: str, hedge: bool | None = None, **kwargs) -> httpx.Response:
+    """
+    Sends a request through the shared client for the URL's host, waiting
+    for a slot if that host is already at its concurrency cap.
+
+    Each host has a circuit breaker: while it is open the call fails fast
+    with resilience.CircuitOpenError. GETs to hosts configured for hedging
+    (or hedge=True) fire a second attempt after the host's p95 latency and
+    return whichever answers first.
+    """
+    host = httpx.URL(url).host
+    breaker = resilience.breaker_for(host)
+
+    if not breaker.allow():
+        metrics.incr("circuit_rejections", host)
+        raise resilience.CircuitOpenError(f"Circuit open for {host}; failing fast.")
+
+    if hedge is None:
+        hedge = HEDGING_ENABLED and HOSTS.get(host, HostConfig()).hedge
+    delay = breaker.hedge_delay() if hedge and method == "GET" else None
+
+    started = time.monotonic()
+    try:
+        if delay is None:
+            response = await _send(host, method, url, **kwargs)
+        else:
+            response = await _send_hedged(host, delay, method, url, **kwargs)
+    except asyncio.CancelledError:
+        breaker.abandon()
+        raise
+    except Exception:
+        breaker.record_failure()
+        raise
+
+    if response.status_code >= 500:
+        breaker.record_failure()
+    else:
+        breaker.record_success(time.monotonic() - started)
+    return response
+
+
+async def _send(host: str, method: str, url: str, **kwargs) -> httpx.Response:
+    client = get_client(host)
+
+    async with _slots[host]:
+        _in_flight[host] = _in_flight.get(host, 0) + 1
+        try:
+            return await client.request(method, url, **kwargs)
+        finally:
+            _in_flight[host] -= 1
+
+
+async def _send_hedged(host: str, delay: float, method: str, url: str, **kwargs) -> httpx.Response:
+    first = asyncio.ensure_future(_send(host, method, url, **kwargs))
+    pending = {first}
+    try:
+        done, _ = await asyncio.wait(pending, timeout=delay)
+        if not done:
+            metrics.incr("hedged_requests", host)
+            pending.add(asyncio.ensure_future(_send(host, method, url, **kwargs)))
+
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is not first:
+                        metrics.incr("hedge_wins", host)
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def get(url: str, **kwargs) -> httpx.Response:
+    return await request("GET", url, **kwargs)
+
+
+async def post(url: str, **kwargs) -> httpx.Response:
+    return await request("POST", url, **kwargs)
+
+
+metrics.register_source("http_pool", lambda: {
+    "hosts": len(_clients),
+    "http2": HTTP2_AVAILABLE,
+    "in_flight": {host: n for host, n in _in_flight.items() if n},
+})
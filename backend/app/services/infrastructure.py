@@ -1,5 +1,8 @@
+import numpy as np
 from pydantic import BaseModel
 
+from app import hazard_rules
+
 class InfraStatus(BaseModel):
     power_grid_risk: str  # "Stable", "High Risk", "CRITICAL"
     road_network_risk: str
@@ -9,39 +12,49 @@ class InfraStatus(BaseModel):
 async def analyze_vital_lines(wind_speed: float, rain_sum: float, soil_moisture: float, solar_kp: float):
     """
     Predicts infrastructure failure based on environmental stress.
+    Thresholds live in the "vital_*" rules of hazard_rules.
+    """
+    status = hazard_rules.scalar(analyze_vital_lines_batch(wind_speed, rain_sum, soil_moisture, solar_kp))
+    return InfraStatus(**status)
+
+
+def analyze_vital_lines_batch(wind_speed, rain_sum, soil_moisture, solar_kp) -> dict:
+    """
+    Vectorized analyze_vital_lines: arrays of power/road/internet levels
+    plus the summary message, per location or forecast hour.
+    """
+    inputs = {name: np.array(value, dtype=np.float64) for name, value in [
+        ("wind_speed", wind_speed), ("rain_sum", rain_sum),
+        ("soil_moisture", soil_moisture), ("solar_kp", solar_kp)]}
+    # 1. Power grid (wind & trees), 2. Road network (rain + saturated soil), 3. Internet/GPS (solar storms)
+    power, roads, net = hazard_rules.evaluate_many(("vital_power", "vital_roads", "vital_internet"), inputs).values()
+
+    # Summary: the most urgent system message (power before roads on ties)
+    return {
+        "power_grid_risk": power["severity"],
+        "road_network_risk": roads["severity"],
+        "internet_risk": net["severity"],
+        "message": hazard_rules.first_message([power, roads], "All vital systems operational."),
+    }
+
+
+def analyze_grid_stress(wind_max: float, temp_max: float, rain_7day: float, soil_moisture: float) -> dict:
     """
-    # 1. POWER GRID (Vulnerable to High Wind & Trees)
-    power = "Stable"
-    if wind_speed > 90: power = "CRITICAL (Line Collapse)"
-    elif wind_speed > 60: power = "High Risk (Tree Fall)"
-    
-    # 2. ROAD NETWORK (Vulnerable to Rain + Saturated Soil)
-    roads = "Clear"
-    # If soil is wet (>0.35) AND rain is heavy (>30mm), floods happen fast
-    if soil_moisture > 0.35 and rain_sum > 30: 
-        roads = "CRITICAL (Flash Floods)"
-    elif rain_sum > 50: 
-        roads = "High Risk (Hydroplaning)"
-    elif rain_sum > 15: 
-        roads = "Moderate (Slippery)"
-
-    # 3. INTERNET/GPS (Vulnerable to Solar Storms)
-    net = "Optimal"
-    if solar_kp >= 7: net = "Blackout (Satellite Loss)"
-    elif solar_kp >= 5: net = "Degraded (GPS Drift)"
-
-    # Summary Message
-    msg = "All vital systems operational."
-    if "CRITICAL" in power:
-        msg = "URGENT: Power grid failure imminent. Charge devices now."
-    elif "CRITICAL" in roads:
-        msg = "URGENT: Roads may become impassable. Avoid travel."
-    elif "High" in power or "High" in roads:
-        msg = "Infrastructure stress detected. Prepare for outages."
-    
-    return InfraStatus(
-        power_grid_risk=power,
-        road_network_risk=roads,
-        internet_risk=net,
-        message=msg
-    )
\ No newline at end of file
+    Weather-only stress check used by the infra status widget.
+    Thresholds live in the "grid_*" rules of hazard_rules.
+    """
+    return hazard_rules.scalar(analyze_grid_stress_batch(wind_max, temp_max, rain_7day, soil_moisture))
+
+
+def analyze_grid_stress_batch(wind_max, temp_max, rain_7day, soil_moisture) -> dict:
+    """Vectorized analyze_grid_stress; missing values never cross a threshold."""
+    inputs = {name: np.array(value, dtype=np.float64) for name, value in [
+        ("wind_max", wind_max), ("temp_max", temp_max),
+        ("rain_7day", rain_7day), ("soil_moisture", soil_moisture)]}
+    # Power: High Wind (>50km/h) or High Heat (>35C); Roads: Rain (>20mm) or Soil Saturation
+    power, roads, net = hazard_rules.evaluate_many(("grid_power", "grid_roads", "grid_internet"), inputs).values()
+    return {
+        "power_grid_risk": power["severity"],
+        "road_network_risk": roads["severity"],
+        "internet_risk": net["severity"],
+    }
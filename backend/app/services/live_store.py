@@ -0,0 +1,83 @@
+import asyncio
+import time
+
+from app.services import metrics, singleflight
+
+
+class LiveStore:
+    """
+    Process-wide copy of an upstream feed, refreshed on an interval by a
+    background task. Subclasses implement load() (fetch the feed) and
+    build() (turn it into an immutable, indexed snapshot). Each refresh
+    swaps in a whole new snapshot, so readers never see a half-built index.
+    """
+
+    def __init__(self, name: str, interval: float):
+        self.name = name
+        self.interval = interval
+        self.current = None
+        self.updated_at = None
+        self.refreshes = 0
+        self.failures = 0
+        self._task = None
+        metrics.register_source(f"store_{name}", self.stats)
+
+    async def load(self):
+        raise NotImplementedError
+
+    def build(self, data):
+        raise NotImplementedError
+
+    async def refresh(self):
+        data = await self.load()
+        started = time.perf_counter()
+        self.current = self.build(data)
+        self.updated_at = time.time()
+        self.refreshes += 1
+        metrics.set_gauge("store_build_ms", self.name, round((time.perf_counter() - started) * 1000, 2))
+        return self.current
+
+    async def snapshot(self):
+        """
+        Returns the current snapshot. Loads it on first use, and refreshes
+        an outdated one when no background task is keeping it fresh
+        (scripts, tests). Concurrent callers share one load.
+        """
+        running = self._task is not None and not self._task.done()
+        outdated = self.updated_at is None or (not running and time.time() - self.updated_at > self.interval)
+        if outdated:
+            try:
+                await singleflight.do("live_store", self.name, self.refresh)
+            except Exception:
+                if self.current is None:
+                    raise
+        return self.current
+
+    def start(self):
+        """Starts the periodic refresh on the running event loop."""
+        async def loop():
+            while True:
+                try:
+                    await self.refresh()
+                except Exception as e:
+                    self.failures += 1
+                    print(f"{self.name} store refresh failed, keeping previous data: {e}")
+                await asyncio.sleep(self.interval)
+
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(loop())
+        return self._task
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "loaded": self.current is not None,
+            "age_seconds": round(time.time() - self.updated_at, 1) if self.updated_at else None,
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+        }
@@ -0,0 +1,34 @@
+from collections import defaultdict
+
+# Process-local counters and gauges, keyed by metric name then label
+# (usually the upstream provider). Exposed at /api/v1/metrics.
+_counters: dict = defaultdict(lambda: defaultdict(int))
+_gauges: dict = defaultdict(dict)
+
+# Callables that report a dict of live stats (cache sizes, breaker states...)
+_sources: dict = {}
+
+
+def incr(name: str, label: str = "total", amount: int = 1):
+    _counters[name][label] += amount
+
+
+def set_gauge(name: str, label: str, value):
+    _gauges[name][label] = value
+
+
+def register_source(name: str, fn):
+    _sources[name] = fn
+
+
+def snapshot() -> dict:
+    report = {
+        "counters": {name: dict(labels) for name, labels in _counters.items()},
+        "gauges": {name: dict(labels) for name, labels in _gauges.items()},
+    }
+    for name, fn in _sources.items():
+        try:
+            report[name] = fn()
+        except Exception as e:
+            report[name] = {"error": str(e)}
+    return report
@@ -18,7 +18,11 @@ async def run_daily_check_for_user(user_uid: str, db: Session):
     if not prefs or not prefs.fcm_device_token:
         print(f"User {user_uid} has no location or no FCM token. Skipping.")
         return
+    await run_daily_check(prefs)
 
+async def run_daily_check(prefs: UserPreference):
+    """The per-user check on an already loaded preferences row."""
+    user_uid = prefs.user_uid
     lat, lon = prefs.home_latitude, prefs.home_longitude
     token = prefs.fcm_device_token
     
@@ -67,4 +71,30 @@ async def run_daily_check_for_user(user_uid: str, db: Session):
             f"Your Weekly Brief: Expect an average of {round(avg_temp)}°C this week. Have a great one!"
         )
     
-    print(f"Monitor check complete for {user_uid}.")
\ No newline at end of file
+    print(f"Monitor check complete for {user_uid}.")
+
+async def run_daily_check_for_all_users(db: Session):
+    """
+    Sweeps every user with a home location and a device token.
+    Weather for all home locations is prefetched in batched upstream
+    calls first, so the per-user checks are served from the cache.
+    """
+    subscribers = db.query(UserPreference).filter(
+        UserPreference.fcm_device_token.isnot(None),
+        UserPreference.home_latitude.isnot(None),
+        UserPreference.home_longitude.isnot(None)
+    ).all()
+
+    if not subscribers:
+        print("No subscribed users to monitor.")
+        return
+
+    points = [(p.home_latitude, p.home_longitude) for p in subscribers]
+    print(f"Prefetching weather for {len(points)} home locations...")
+    await open_meteo.get_location_snapshots_many(points)
+
+    for prefs in subscribers:
+        try:
+            await run_daily_check(prefs)
+        except Exception as e:
+            print(f"Monitor check failed for {prefs.user_uid}: {e}")
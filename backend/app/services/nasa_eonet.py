@@ -1,35 +1,37 @@
 import httpx
 from fastapi import HTTPException
+from app.services import http_client, singleflight
 
 # EONET API v3 endpoint for events
 EONET_API_URL = "https://eonet.gsfc.nasa.gov/api/v3/events"
 
-async def fetch_open_events():
+@singleflight.coalesce("eonet")
+async def fetch_open_events(limit: int = 20, days: int = 30):
     """
-    Fetches the 20 most recent "open" natural events from NASA EONET.
+    Fetches the most recent "open" natural events from NASA EONET
+    (20 from the last 30 days by default).
     """
     params = {
         "status": "open",
-        "limit": 20,
-        "days": 30  # Look at events from the last 30 days
+        "limit": limit,
+        "days": days
     }
     
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(EONET_API_URL, params=params)
+    try:
+        response = await http_client.get(EONET_API_URL, params=params)
             
-            # Raise an exception for bad status codes (4xx or 5xx)
-            response.raise_for_status()
+        # Raise an exception for bad status codes (4xx or 5xx)
+        response.raise_for_status()
             
-            return response.json()
+        return response.json()
             
-        except httpx.HTTPStatusError as e:
-            raise HTTPException(
-                status_code=e.response.status_code,
-                detail=f"Error fetching data from NASA EONET: {e.response.text}"
-            )
-        except httpx.RequestError as e:
-            raise HTTPException(
-                status_code=503, # Service Unavailable
-                detail=f"Error connecting to NASA EONET: {e}"
-            )
\ No newline at end of file
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(
+            status_code=e.response.status_code,
+            detail=f"Error fetching data from NASA EONET: {e.response.text}"
+        )
+    except httpx.RequestError as e:
+        raise HTTPException(
+            status_code=503, # Service Unavailable
+            detail=f"Error connecting to NASA EONET: {e}"
+        )
\ No newline at end of file
@@ -1,211 +1,307 @@
-import httpx
-import json
+import asyncio
 import os
-import time
-from datetime import datetime, timedelta
+from datetime import date, timedelta
+from functools import partial
 
-CACHE_FILE = "weather_cache.json"
+from app import grid
+from app.services import http_client, metrics, records, singleflight, weather_archive
+from app.services.cache import TTLCache, SQLiteStore
+from app.services.records import WeatherSnapshot, FloodSnapshot
+
+# Persistent tier lives in SQLite; set WEATHER_CACHE_DB="" to keep the cache in memory only
+CACHE_DB = os.getenv("WEATHER_CACHE_DB", "weather_cache.sqlite3")
 CACHE_DURATION = 3600
+CACHE_MAX_ENTRIES = int(os.getenv("WEATHER_CACHE_MAX_ENTRIES", 4096))
+
+FORECAST_URL = "https://api.open-meteo.com/v1/forecast"
+
+# Union of every variable the weather, flood and forecast accessors read,
+# so a single /v1/forecast call serves all three.
+SNAPSHOT_DAILY = ["temperature_2m_max", "temperature_2m_min", "uv_index_max", "precipitation_sum", "wind_speed_10m_max"]
+SNAPSHOT_HOURLY = ["soil_moisture_0_to_7cm"]
+SNAPSHOT_CURRENT = ["temperature_2m", "relative_humidity_2m"]
+
+# Open-Meteo takes comma-separated coordinate lists; keep each URL to a sane size
+BATCH_SIZE = int(os.getenv("OPEN_METEO_BATCH_SIZE", 50))
+
+# Part of every snapshot cache key. Bump it whenever WeatherSnapshot's
+# layout changes, so entries a persistent cache file still holds in the old
+# layout are never read back as the new one.
+SNAPSHOT_CACHE_VERSION = 1
+
+# Daily variables the 7-day forecast exposes to clients
+FORECAST_DAILY = ["time", "temperature_2m_max", "temperature_2m_min", "precipitation_sum"]
+
+# --- 0. LOCATION SNAPSHOT (One upstream call per grid cell) ---
+async def get_location_snapshot(lat: float, lon: float) -> WeatherSnapshot:
+    """
+    Fetches the superset of forecast variables for a grid cell and caches
+    it as a WeatherSnapshot record. The weather, flood and forecast
+    accessors below are projections of this snapshot.
+    """
+    cell = grid.snap(lat, lon, "snapshot")
+    return await load_or_fetch(_snapshot_key(cell), partial(_fetch_snapshot, cell))
+
+def snapshot_key(lat: float, lon: float) -> str:
+    """Cache key of the snapshot covering (lat, lon)."""
+    return _snapshot_key(grid.snap(lat, lon, "snapshot"))
+
+def _snapshot_key(cell: grid.GridCell) -> str:
+    return f"{grid.cell_key('snapshot', cell)}_v{SNAPSHOT_CACHE_VERSION}"
+
+@singleflight.coalesce("open-meteo")
+async def _fetch_snapshot(cell: grid.GridCell) -> WeatherSnapshot:
+    response = await http_client.get(
+        FORECAST_URL,
+        params={
+            "latitude": cell.latitude, "longitude": cell.longitude,
+            "daily": SNAPSHOT_DAILY,
+            "hourly": SNAPSHOT_HOURLY,
+            "current": SNAPSHOT_CURRENT,
+            "timezone": "auto"
+        }, timeout=30.0
+    )
+    response.raise_for_status()
+    return WeatherSnapshot.from_open_meteo(response.json(), cell.as_dict())
+
+# --- 0b. BATCH SNAPSHOTS (Sweeps & Grids) ---
+async def get_location_snapshots_many(points) -> list:
+    """
+    Batch variant of get_location_snapshot for a list of (lat, lon) points.
+    Cached cells are served locally; the rest are fetched BATCH_SIZE cells
+    per upstream request. Returns snapshots aligned with `points`, with
+    None where a chunk could not be fetched.
+    """
+    cells = [grid.snap(lat, lon, "snapshot") for lat, lon in points]
+
+    unique = list(dict.fromkeys(cells))  # Unique cells, in order
+    cached = await load_many_from_cache([_snapshot_key(cell) for cell in unique])
+    snapshots = {}
+    missing = []
+    for cell in unique:
+        if cached.get(_snapshot_key(cell)):
+            snapshots[cell] = cached[_snapshot_key(cell)]
+        else:
+            missing.append(cell)
+
+    chunks = [tuple(missing[i:i + BATCH_SIZE]) for i in range(0, len(missing), BATCH_SIZE)]
+    results = await asyncio.gather(*(_fetch_snapshot_batch(chunk) for chunk in chunks), return_exceptions=True)
+
+    for chunk, result in zip(chunks, results):
+        if isinstance(result, Exception):
+            print(f"Weather batch Error ({len(chunk)} cells): {result}")
+            continue
+        snapshots.update(result)
+
+    return [snapshots.get(cell) for cell in cells]
+
+@singleflight.coalesce("open-meteo")
+async def _fetch_snapshot_batch(cells: tuple) -> dict:
+    response = await http_client.get(
+        FORECAST_URL,
+        params={
+            "latitude": ",".join(str(cell.latitude) for cell in cells),
+            "longitude": ",".join(str(cell.longitude) for cell in cells),
+            "daily": SNAPSHOT_DAILY,
+            "hourly": SNAPSHOT_HOURLY,
+            "current": SNAPSHOT_CURRENT,
+            "timezone": "auto"
+        }, timeout=30.0
+    )
+    response.raise_for_status()
+    data = response.json()
+
+    # A single location comes back as an object, several as a list in request order
+    locations = data if isinstance(data, list) else [data]
+    if len(locations) != len(cells):
+        raise ValueError(f"Expected {len(cells)} locations, got {len(locations)}")
+
+    result = {cell: WeatherSnapshot.from_open_meteo(record, cell.as_dict())
+              for cell, record in zip(cells, locations)}
+    # One store transaction for the whole batch
+    save_many_to_cache({_snapshot_key(cell): snapshot for cell, snapshot in result.items()})
+    return result
 
 # --- 1. WEATHER & UV (Used by Infra & Dashboard) ---
 async def get_raw_weather_data(lat: float, lon: float):
-    cached = load_from_cache(f"raw_{lat}_{lon}")
-    if cached: return cached
-
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(
-                "https://api.open-meteo.com/v1/forecast",
-                params={
-                    "latitude": lat, "longitude": lon,
-                    "daily": ["temperature_2m_max", "uv_index_max", "precipitation_sum", "wind_speed_10m_max"],
-                    "current": ["temperature_2m", "relative_humidity_2m"],
-                    "timezone": "auto"
-                }, timeout=30.0
-            )
-            response.raise_for_status()
-            data = response.json()
-            result = parse_weather_data(data)
-            save_to_cache(f"raw_{lat}_{lon}", result)
-            return result
-        except Exception as e:
-            print(f"Weather API Error: {e}")
-            raise e
+    try:
+        snapshot = await get_location_snapshot(lat, lon)
+    except Exception as e:
+        print(f"Weather API Error: {e}")
+        raise e
+
+    # The snapshot record carries today's values (temp_max, wind_max, ...)
+    return snapshot
+
+async def get_raw_weather_data_many(points) -> list:
+    """
+    Weather for many points in as few upstream calls as possible.
+    Entries are None where no data could be fetched.
+    """
+    return await get_location_snapshots_many(points)
 
 # --- 2. FLOOD DATA (Used by Infra & Bio) ---
 async def get_flood_data(lat: float, lon: float):
-    cached = load_from_cache(f"flood_{lat}_{lon}")
-    if cached: return cached
-
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(
-                "https://api.open-meteo.com/v1/forecast",
-                params={
-                    "latitude": lat, "longitude": lon,
-                    "hourly": ["soil_moisture_0_to_7cm"],
-                    "daily": ["precipitation_sum"],
-                    "timezone": "auto"
-                }, timeout=30.0
-            )
-            data = response.json()
-            
-            soil = data.get("hourly", {}).get("soil_moisture_0_to_7cm", [0])[0]
-            rain = sum(data.get("daily", {}).get("precipitation_sum", []))
-            
-            result = type('obj', (object,), {
-                "precipitation_forecast_7d": rain,
-                "soil_moisture_current": soil,
-                "uv_index_tomorrow": 5
-            })
-            save_to_cache(f"flood_{lat}_{lon}", result)
-            return result
-        except:
-            return type('obj', (object,), {"precipitation_forecast_7d": 0, "soil_moisture_current": 0.2})
+    try:
+        snapshot = await get_location_snapshot(lat, lon)
+    except Exception as e:
+        print(f"Flood data Error: {e}")
+        return _flood_fallback(lat, lon)
+
+    return _flood_from_snapshot(snapshot)
+
+async def get_flood_data_many(points) -> list:
+    """
+    Flood inputs for many points; falls back to the same defaults as
+    get_flood_data where no data could be fetched.
+    """
+    snapshots = await get_location_snapshots_many(points)
+    return [
+        _flood_from_snapshot(s) if s else _flood_fallback(lat, lon)
+        for (lat, lon), s in zip(points, snapshots)
+    ]
+
+def _flood_fallback(lat: float, lon: float) -> FloodSnapshot:
+    return FloodSnapshot.fallback(grid.snap(lat, lon, "snapshot").as_dict())
+
+def _flood_from_snapshot(snapshot: WeatherSnapshot) -> FloodSnapshot:
+    return FloodSnapshot.from_weather(snapshot)
 
 # --- 3. MARINE / OCEAN DATA (New for Math) ---
 async def get_marine_data(lat: float, lon: float):
-    cached = load_from_cache(f"marine_{lat}_{lon}")
-    if cached: return cached
-
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(
-                "https://marine-api.open-meteo.com/v1/marine",
-                params={
-                    "latitude": lat, "longitude": lon,
-                    "current": ["wave_height", "wave_direction", "wave_period"],
-                    "daily": ["wave_height_max"],
-                    "timezone": "auto"
-                }, timeout=30.0
-            )
-            return response.json()
-        except:
-            return {}
+    cell = grid.snap(lat, lon, "marine")
+    key = grid.cell_key("marine", cell)
+    try:
+        return await load_or_fetch(key, partial(_fetch_marine, cell))
+    except:
+        return {}
+
+@singleflight.coalesce("open-meteo-marine")
+async def _fetch_marine(cell: grid.GridCell) -> dict:
+    response = await http_client.get(
+        "https://marine-api.open-meteo.com/v1/marine",
+        params={
+            "latitude": cell.latitude, "longitude": cell.longitude,
+            "current": ["wave_height", "wave_direction", "wave_period"],
+            "daily": ["wave_height_max"],
+            "timezone": "auto"
+        }, timeout=30.0
+    )
+    response.raise_for_status()
+    result = response.json()
+    result["grid_cell"] = cell.as_dict()
+    return result
 
 # --- 4. AIR QUALITY ---
 async def get_air_quality(lat: float, lon: float):
-    cached = load_from_cache(f"air_{lat}_{lon}")
-    if cached: return cached
-
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(
-                "https://air-quality-api.open-meteo.com/v1/air-quality",
-                params={
-                    "latitude": lat, "longitude": lon,
-                    "current": ["us_aqi", "dust"],
-                    "timezone": "auto"
-                }, timeout=30.0
-            )
-            result = response.json()
-            save_to_cache(f"air_{lat}_{lon}", result)
-            return result
-        except:
-            return {"current": {"us_aqi": 42}}
+    cell = grid.snap(lat, lon, "air")
+    key = grid.cell_key("air", cell)
+    try:
+        return await load_or_fetch(key, partial(_fetch_air_quality, cell))
+    except:
+        return {"current": {"us_aqi": 42}}
+
+@singleflight.coalesce("open-meteo-air")
+async def _fetch_air_quality(cell: grid.GridCell) -> dict:
+    response = await http_client.get(
+        "https://air-quality-api.open-meteo.com/v1/air-quality",
+        params={
+            "latitude": cell.latitude, "longitude": cell.longitude,
+            "current": ["us_aqi", "dust"],
+            "timezone": "auto"
+        }, timeout=30.0
+    )
+    response.raise_for_status()
+    result = response.json()
+    result["grid_cell"] = cell.as_dict()
+    return result
 
 # --- 5. FORECAST JSON ---
 async def get_7_day_forecast(lat: float, lon: float):
-    cached = load_from_cache(f"forecast_{lat}_{lon}")
-    if cached: return cached
-
-    async with httpx.AsyncClient() as client:
-        try:
-            res = await client.get(
-                "https://api.open-meteo.com/v1/forecast",
-                params={
-                    "latitude": lat, "longitude": lon,
-                    "daily": ["temperature_2m_max", "temperature_2m_min", "precipitation_sum"],
-                    "timezone": "auto"
-                }, timeout=30.0
-            )
-            data = res.json()
-            save_to_cache(f"forecast_{lat}_{lon}", data)
-            return data
-        except: return {}
+    try:
+        snapshot = await get_location_snapshot(lat, lon)
+    except Exception as e:
+        print(f"Forecast Error: {e}")
+        return {}
+
+    daily = {"time": snapshot.daily_time, **snapshot.daily}
+    units = snapshot.daily_units
+    return {
+        "latitude": snapshot.latitude,
+        "longitude": snapshot.longitude,
+        "timezone": snapshot.timezone,
+        "daily_units": {k: units[k] for k in FORECAST_DAILY if k in units},
+        "daily": {k: records.to_list(daily[k]) for k in FORECAST_DAILY if k in daily},
+        "grid_cell": snapshot.grid_cell
+    }
 
 # --- 6. HISTORY ---
-async def get_historical_weather(lat: float, lon: float, days: int = 10):
-    end_date = datetime.now().strftime("%Y-%m-%d")
-    start_date = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
-    
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get("https://archive-api.open-meteo.com/v1/archive", params={
-                "latitude": lat, "longitude": lon,
-                "start_date": start_date, "end_date": end_date,
-                "daily": ["precipitation_sum"],
-                "timezone": "auto"
-            })
-            return response.json()
-        except:
-            return {}
-
-# --- HELPER FUNCTIONS (SYNTAX FIXED) ---
-
-def save_to_cache(key, data):
-    full_cache = {}
-    if os.path.exists(CACHE_FILE):
-        try:
-            with open(CACHE_FILE, 'r') as f:
-                full_cache = json.load(f)
-        except:
-            pass
-    
-    if hasattr(data, '__dict__'):
-        serialized = data.__dict__
-    elif hasattr(data, 'precipitation_forecast_7d'):
-        serialized = {
-            "precipitation_forecast_7d": data.precipitation_forecast_7d,
-            "soil_moisture_current": data.soil_moisture_current,
-            "uv_index_tomorrow": 5
-        }
-    else:
-        serialized = data
-
-    full_cache[key] = {"timestamp": time.time(), "data": serialized}
-    
+async def get_historical_weather(lat: float, lon: float, days: int = 10, start_date: date = None, end_date: date = None):
+    """
+    Daily history for the last `days` days, or an explicit [start_date,
+    end_date] window. Served from the local archive; only dates it doesn't
+    hold yet are fetched from archive-api.
+    """
+    end_date = end_date or date.today()
+    start_date = start_date or end_date - timedelta(days=days)
+
+    cell = grid.snap(lat, lon, "history")
     try:
-        with open(CACHE_FILE, 'w') as f:
-            json.dump(full_cache, f)
-    except:
-        pass
+        daily = await weather_archive.get_daily(cell, start_date, end_date)
+    except Exception as e:
+        print(f"History Error: {e}")
+        return {}
+
+    return {
+        "latitude": cell.latitude,
+        "longitude": cell.longitude,
+        "daily": daily,
+        "grid_cell": cell.as_dict()
+    }
+
+# --- HELPER FUNCTIONS ---
+
+_cache = TTLCache(
+    max_entries=CACHE_MAX_ENTRIES,
+    default_ttl=CACHE_DURATION,
+    store=SQLiteStore(CACHE_DB) if CACHE_DB else None,
+    encode=records.dumps,
+    decode=records.loads,
+)
+
+metrics.register_source("weather_cache", _cache.stats)
+
+def save_to_cache(key, data, ttl=None):
+    _cache.set(key, data, ttl)
+
+def save_many_to_cache(items: dict, ttl=None):
+    _cache.set_many(items, ttl)
 
 def load_from_cache(key):
-    if not os.path.exists(CACHE_FILE):
-        return None
-    try:
-        with open(CACHE_FILE, 'r') as f:
-            full_cache = json.load(f)
-        
-        if key not in full_cache:
-            return None
-            
-        if time.time() - full_cache[key]["timestamp"] < CACHE_DURATION:
-            data = full_cache[key]["data"]
-            
-            if "temp_max" in data: 
-                class WeatherData:
-                    def __init__(self, d): self.__dict__.update(d)
-                return WeatherData(data)
-            
-            if "soil_moisture_current" in data:
-                return type('obj', (object,), data)
-            
-            return data
-    except:
-        return None
-    return None
-
-def parse_weather_data(data):
-    class WeatherData:
-        def __init__(self, d):
-            daily = d.get("daily", {})
-            current = d.get("current", {})
-            self.temp_max = daily.get("temperature_2m_max", [0])[0]
-            self.temp_min = daily.get("temperature_2m_min", [0])[0]
-            self.precipitation = daily.get("precipitation_sum", [0])[0]
-            self.wind_max = daily.get("wind_speed_10m_max", [0])[0]
-            self.humidity_min = current.get("relative_humidity_2m", 0)
-            self.uv_index = daily.get("uv_index_max", [0])[0]
-    return WeatherData(data)
\ No newline at end of file
+    return _cache.get(key)
+
+async def load_many_from_cache(keys) -> dict:
+    """{key: value} for the fresh keys; the persistent tier is read off the event loop."""
+    return await _cache.get_many(keys)
+
+async def load_or_fetch(key, fetch, ttl=None):
+    """
+    Cache lookup with stale-while-revalidate: an expired entry is returned
+    immediately while `fetch` refreshes it in the background.
+    """
+    return await _cache.get_or_load(key, fetch, ttl)
+
+def on_snapshot_change(listener):
+    """
+    Calls `listener(key)` whenever a cached snapshot is replaced (a fresh
+    fetch or background refresh), keyed by snapshot_key().
+    """
+    _cache.add_listener(lambda key: listener(key) if key.startswith("snapshot") else None)
+
+def start_background_refresh(interval: float = 60.0):
+    """Refreshes hot cache entries shortly before they expire."""
+    return _cache.start_refresher(interval)
+
+async def stop_background_refresh():
+    await _cache.stop_refresher()
+    await _cache.flush()
@@ -0,0 +1,89 @@
+import os
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from app.rivers import chord_to_km, km_to_chord, to_unit_vectors
+from app.services import usgs
+from app.services.live_store import LiveStore
+
+# The USGS summary feeds are regenerated every minute
+REFRESH_SECONDS = float(os.getenv("QUAKE_REFRESH_SECONDS", 60))
+
+
+class QuakeIndex:
+    """Immutable snapshot of the feed with a KD-tree over unit-sphere positions."""
+
+    def __init__(self, features: list):
+        self.features = features
+        self.mags = np.array([q.mag for q in features], dtype=np.float64)
+        vectors = to_unit_vectors([q.lat for q in features], [q.lon for q in features])
+        self.tree = cKDTree(vectors.reshape(-1, 3)) if features else None
+
+    def __len__(self):
+        return len(self.features)
+
+    def nearest(self, lat: float, lon: float, k: int = 1,
+                radius_km: float | None = None, min_mag: float | None = None) -> list:
+        """
+        Up to k (quake, distance_km) pairs, nearest first, optionally limited
+        to radius_km and to magnitude >= min_mag. When the magnitude filter
+        rejects candidates, the tree is re-queried with a larger k.
+        """
+        if self.tree is None or k <= 0:
+            return []
+
+        point = to_unit_vectors(lat, lon)
+        bound = km_to_chord(radius_km) if radius_km is not None else np.inf
+        count = len(self.features)
+        want = k
+        while True:
+            q = min(want, count)
+            chord, idx = self.tree.query(point, k=q, distance_upper_bound=bound)
+            chord, idx = np.atleast_1d(chord), np.atleast_1d(idx)
+            found = idx < count  # Misses beyond the radius come back as idx == count
+            chord, idx = chord[found], idx[found]
+            if min_mag is not None:
+                keep = self.mags[idx] >= min_mag
+                chord, idx = chord[keep], idx[keep]
+            # Done once we have k, or the tree has nothing more to give
+            if len(idx) >= k or q == count or found.sum() < q:
+                break
+            want *= 4
+
+        return [(self.features[i], float(d)) for i, d in zip(idx[:k], chord_to_km(chord[:k]))]
+
+    def within(self, lat: float, lon: float, radius_km: float, min_mag: float | None = None) -> list:
+        """All (quake, distance_km) pairs within radius_km, nearest first."""
+        if self.tree is None:
+            return []
+        idx = np.asarray(self.tree.query_ball_point(to_unit_vectors(lat, lon), km_to_chord(radius_km)), dtype=np.int64)
+        if min_mag is not None:
+            idx = idx[self.mags[idx] >= min_mag]
+        chord = np.linalg.norm(self.tree.data[idx] - to_unit_vectors(lat, lon), axis=-1)
+        order = np.argsort(chord, kind="stable")
+        return [(self.features[i], float(d)) for i, d in zip(idx[order], chord_to_km(chord[order]))]
+
+
+class QuakeStore(LiveStore):
+    async def load(self):
+        return await usgs.get_significant_earthquakes()
+
+    def build(self, data) -> QuakeIndex:
+        return QuakeIndex(data.features)
+
+    def stats(self) -> dict:
+        return {**super().stats(), "quakes": len(self.current) if self.current else 0}
+
+
+store = QuakeStore("earthquakes", REFRESH_SECONDS)
+
+
+def as_dict(quake, distance_km: float) -> dict:
+    return {
+        "mag": quake.mag,
+        "place": quake.place,
+        "time": quake.time,
+        "url": quake.url,
+        "distance_km": round(distance_km, 2)
+    }
@@ -0,0 +1,301 @@
+from __future__ import annotations
+
+import json
+import math
+import struct
+import time
+from dataclasses import dataclass, fields
+
+import numpy as np
+
+# Typed records for upstream payloads. Series are NumPy arrays (NaN where
+# the provider sent null) so a record is a handful of contiguous buffers
+# instead of nested JSON lists, and it round-trips through dumps()/loads()
+# without re-parsing.
+
+MAGIC = b"REC1"
+_HEADER = struct.Struct("<4sI")
+
+RECORD_TYPES = {}
+
+
+def register(cls):
+    RECORD_TYPES[cls.__name__] = cls
+    return cls
+
+
+# --- Conversion helpers ---
+
+def series(values) -> np.ndarray:
+    """Open-Meteo value list (may contain nulls) -> float64 array with NaN gaps."""
+    return np.array([np.nan if v is None else v for v in values or []], dtype=np.float64)
+
+
+def days(values) -> np.ndarray:
+    return np.array(values or [], dtype="datetime64[D]")
+
+
+def hours(values) -> np.ndarray:
+    return np.array(values or [], dtype="datetime64[m]")
+
+
+def value_at(arr: np.ndarray, index: int = 0, default=None):
+    """Element as a plain float, None for a NaN gap, `default` if out of range."""
+    if index >= len(arr):
+        return default
+    value = float(arr[index])
+    return None if math.isnan(value) else value
+
+
+def to_list(arr: np.ndarray) -> list:
+    """Array back to a JSON-friendly list (dates as ISO strings, NaN as None)."""
+    if arr.dtype.kind == "M":
+        return np.datetime_as_string(arr).tolist()
+    return [None if math.isnan(v) else v for v in arr.tolist()]
+
+
+# --- 1. WEATHER (one forecast snapshot per grid cell) ---
+
+@register
+@dataclass(frozen=True, slots=True)
+class WeatherSnapshot:
+    latitude: float | None
+    longitude: float | None
+    timezone: str | None
+    grid_cell: dict
+    fetched_at: float
+    current: dict           # Scalar "current" block, e.g. {"temperature_2m": 21.3}
+    daily_units: dict
+    daily_time: np.ndarray  # datetime64[D]
+    daily: dict             # variable -> float64 array aligned with daily_time
+    hourly_time: np.ndarray # datetime64[m]
+    hourly: dict            # variable -> float64 array aligned with hourly_time
+
+    @classmethod
+    def from_open_meteo(cls, data: dict, grid_cell: dict) -> WeatherSnapshot:
+        daily = data.get("daily", {})
+        hourly = data.get("hourly", {})
+        return cls(
+            latitude=data.get("latitude"),
+            longitude=data.get("longitude"),
+            timezone=data.get("timezone"),
+            grid_cell=grid_cell,
+            fetched_at=time.time(),
+            current={k: v for k, v in data.get("current", {}).items() if k not in ("time", "interval")},
+            daily_units=data.get("daily_units", {}),
+            daily_time=days(daily.get("time")),
+            daily={k: series(v) for k, v in daily.items() if k != "time"},
+            hourly_time=hours(hourly.get("time")),
+            hourly={k: series(v) for k, v in hourly.items() if k != "time"},
+        )
+
+    # Today's values, as read by the risk models
+    @property
+    def temp_max(self):
+        return value_at(self.daily.get("temperature_2m_max", series([0])))
+
+    @property
+    def temp_min(self):
+        return value_at(self.daily.get("temperature_2m_min", series([0])))
+
+    @property
+    def precipitation(self):
+        return value_at(self.daily.get("precipitation_sum", series([0])))
+
+    @property
+    def wind_max(self):
+        return value_at(self.daily.get("wind_speed_10m_max", series([0])))
+
+    @property
+    def uv_index(self):
+        return value_at(self.daily.get("uv_index_max", series([0])))
+
+    @property
+    def humidity_min(self):
+        return self.current.get("relative_humidity_2m", 0)
+
+    def dict(self) -> dict:
+        return {
+            "temp_max": self.temp_max,
+            "temp_min": self.temp_min,
+            "precipitation": self.precipitation,
+            "wind_max": self.wind_max,
+            "humidity_min": self.humidity_min,
+            "uv_index": self.uv_index,
+            "grid_cell": self.grid_cell,
+        }
+
+
+# --- 2. FLOOD (projection of a weather snapshot) ---
+
+@register
+@dataclass(frozen=True, slots=True)
+class FloodSnapshot:
+    grid_cell: dict
+    daily_precipitation: np.ndarray  # mm per day over the forecast window
+    soil_moisture_current: float | None
+    uv_index_tomorrow: float | None
+    fetched_at: float = 0.0
+
+    @classmethod
+    def from_weather(cls, weather: WeatherSnapshot) -> FloodSnapshot:
+        return cls(
+            grid_cell=weather.grid_cell,
+            daily_precipitation=weather.daily.get("precipitation_sum", series([])),
+            soil_moisture_current=value_at(weather.hourly.get("soil_moisture_0_to_7cm", series([0]))),
+            uv_index_tomorrow=value_at(weather.daily.get("uv_index_max", series([])), 1, default=5),
+            fetched_at=weather.fetched_at,
+        )
+
+    @classmethod
+    def fallback(cls, grid_cell: dict) -> FloodSnapshot:
+        """Neutral inputs used when no forecast could be fetched."""
+        return cls(grid_cell=grid_cell, daily_precipitation=series([]),
+                   soil_moisture_current=0.2, uv_index_tomorrow=5)
+
+    @property
+    def precipitation_forecast_7d(self) -> float:
+        return float(np.nansum(self.daily_precipitation))
+
+    def dict(self) -> dict:
+        return {
+            "precipitation_forecast_7d": self.precipitation_forecast_7d,
+            "soil_moisture_current": self.soil_moisture_current,
+            "uv_index_tomorrow": self.uv_index_tomorrow,
+            "grid_cell": self.grid_cell,
+        }
+
+
+# --- 3. MARINE ---
+
+@register
+@dataclass(frozen=True, slots=True)
+class MarineSnapshot:
+    wave_height_max: float          # Max significant wave height (meters)
+    wave_direction_dominant: int    # Dominant wave direction (degrees)
+    hourly_time: np.ndarray
+    sea_surface_temperature: np.ndarray  # °C per hour
+    ocean_current_velocity: np.ndarray   # km/h per hour -- critical for drift predictions
+    fetched_at: float = 0.0
+
+    @classmethod
+    def from_open_meteo(cls, data: dict) -> MarineSnapshot:
+        daily = data.get("daily", {})
+        hourly = data.get("hourly", {})
+        wave_height = value_at(series(daily.get("wave_height_max")))
+        wave_dir = value_at(series(daily.get("wave_direction_dominant")))
+        return cls(
+            wave_height_max=wave_height if wave_height is not None else 0.0,
+            wave_direction_dominant=int(wave_dir) if wave_dir is not None else 0,
+            hourly_time=hours(hourly.get("time")),
+            sea_surface_temperature=series(hourly.get("sea_surface_temperature")),
+            ocean_current_velocity=series(hourly.get("ocean_current_velocity")),
+            fetched_at=time.time(),
+        )
+
+    # "Now" is the first hour of the forecast
+    @property
+    def sea_surface_temp(self) -> float:
+        return value_at(self.sea_surface_temperature) or 0.0
+
+    @property
+    def current_velocity(self) -> float:
+        return value_at(self.ocean_current_velocity) or 0.0
+
+    def dict(self) -> dict:
+        return {
+            "wave_height_max": self.wave_height_max,
+            "wave_direction_dominant": self.wave_direction_dominant,
+            "sea_surface_temp": self.sea_surface_temp,
+            "current_velocity": self.current_velocity,
+        }
+
+
+# --- 4. SOIL ---
+
+@register
+@dataclass(frozen=True, slots=True)
+class SoilSnapshot:
+    hourly_time: np.ndarray
+    soil_moisture_0_to_1cm: np.ndarray  # m³/m³, quick to dry/wet
+    soil_moisture_3_to_9cm: np.ndarray  # m³/m³, stores water, indicates saturation
+    soil_temperature_0cm: np.ndarray    # °C
+    saturation_status: str              # Interpreted status (e.g., "Dry", "Saturated")
+    fetched_at: float = 0.0
+
+    # "Now" is the first hour of the forecast
+    @property
+    def moisture_surface(self) -> float:
+        return value_at(self.soil_moisture_0_to_1cm) or 0.0
+
+    @property
+    def moisture_deep(self) -> float:
+        return value_at(self.soil_moisture_3_to_9cm) or 0.0
+
+    @property
+    def temperature_surface(self) -> float:
+        return value_at(self.soil_temperature_0cm) or 0.0
+
+    def dict(self) -> dict:
+        return {
+            "moisture_surface": self.moisture_surface,
+            "moisture_deep": self.moisture_deep,
+            "temperature_surface": self.temperature_surface,
+            "saturation_status": self.saturation_status,
+        }
+
+
+# --- Cache codec ---
+# Layout: MAGIC | header length | JSON header (scalars + array specs) | raw array buffers.
+# Anything that isn't a registered record is stored as plain JSON.
+
+def dumps(value) -> bytes:
+    if type(value).__name__ not in RECORD_TYPES:
+        return json.dumps(value).encode("utf-8")
+
+    arrays = []
+
+    def pack(item):
+        if isinstance(item, np.ndarray):
+            arrays.append(np.ascontiguousarray(item))
+            return {"__array__": len(arrays) - 1}
+        if isinstance(item, dict):
+            return {k: pack(v) for k, v in item.items()}
+        return item
+
+    header = json.dumps({
+        "type": type(value).__name__,
+        "fields": {f.name: pack(getattr(value, f.name)) for f in fields(value)},
+        "arrays": [[a.dtype.str, list(a.shape)] for a in arrays],
+    }).encode("utf-8")
+    # Pad so every buffer starts 8-byte aligned
+    header += b" " * (-(len(header) + _HEADER.size) % 8)
+
+    return b"".join([_HEADER.pack(MAGIC, len(header)), header, *(a.tobytes() for a in arrays)])
+
+
+def loads(payload: bytes):
+    if not payload.startswith(MAGIC):
+        return json.loads(payload)
+
+    _, header_len = _HEADER.unpack_from(payload)
+    offset = _HEADER.size + header_len
+    header = json.loads(payload[_HEADER.size:offset])
+
+    arrays = []
+    for dtype, shape in header["arrays"]:
+        dtype = np.dtype(dtype)
+        count = math.prod(shape)
+        # Zero-copy, read-only views over the payload
+        arrays.append(np.frombuffer(payload, dtype, count, offset).reshape(shape))
+        offset += count * dtype.itemsize
+
+    def unpack(item):
+        if isinstance(item, dict):
+            if "__array__" in item:
+                return arrays[item["__array__"]]
+            return {k: unpack(v) for k, v in item.items()}
+        return item
+
+    cls = RECORD_TYPES[header["type"]]
+    return cls(**{name: unpack(v) for name, v in header["fields"].items()})
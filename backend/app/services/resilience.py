@@ -0,0 +1,148 @@
+import os
+import time
+from collections import deque
+
+import httpx
+
+from app.services import metrics
+from app.services.cache import TTLCache
+
+# Breaker tuning (shared by every upstream host)
+FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", 5))     # Consecutive failures before opening
+SLOW_CALL_SECONDS = float(os.getenv("BREAKER_SLOW_CALL_SECONDS", 10.0))  # Slower than this counts as a failure
+RESET_TIMEOUT = float(os.getenv("BREAKER_RESET_TIMEOUT", 30.0))         # Seconds open before a trial call
+
+# Hedged requests fire a second attempt once the first is slower than the
+# provider's p95, clamped to this range, and only once enough samples exist.
+HEDGE_MIN_DELAY = 0.05
+HEDGE_MAX_DELAY = 5.0
+HEDGE_MIN_SAMPLES = 20
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitOpenError(httpx.RequestError):
+    """
+    Raised instead of calling a provider whose breaker is open. It is an
+    httpx.RequestError so existing connection-error handlers fall back to
+    cached data without changes.
+    """
+
+
+class LatencyTracker:
+    """Rolling window of recent successful call latencies (seconds)."""
+
+    def __init__(self, size: int = 200):
+        self.samples = deque(maxlen=size)
+
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, pct: float) -> float | None:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+        return ordered[index]
+
+
+class CircuitBreaker:
+    """
+    Per-provider breaker. Opens after FAILURE_THRESHOLD consecutive errors,
+    5xx responses or slow calls, rejects calls for RESET_TIMEOUT, then lets
+    a single trial call through (half-open) to decide whether to close.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+        self.latency = LatencyTracker()
+        self._publish()
+
+    def allow(self) -> bool:
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and time.monotonic() - self.opened_at >= RESET_TIMEOUT:
+            self._transition(HALF_OPEN)
+        if self.state == HALF_OPEN and not self.trial_in_flight:
+            self.trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self, seconds: float):
+        self.latency.record(seconds)
+        if seconds > SLOW_CALL_SECONDS:
+            self.record_failure()
+            return
+        self.failures = 0
+        self.trial_in_flight = False
+        if self.state != CLOSED:
+            self._transition(CLOSED)
+
+    def record_failure(self):
+        self.failures += 1
+        self.trial_in_flight = False
+        if self.state == HALF_OPEN or self.failures >= FAILURE_THRESHOLD:
+            self.opened_at = time.monotonic()
+            if self.state != OPEN:
+                self._transition(OPEN)
+
+    def abandon(self):
+        """The caller went away mid-call; free the half-open trial slot."""
+        self.trial_in_flight = False
+
+    def hedge_delay(self) -> float | None:
+        if len(self.latency.samples) < HEDGE_MIN_SAMPLES:
+            return None
+        p95 = self.latency.percentile(95)
+        return max(HEDGE_MIN_DELAY, min(HEDGE_MAX_DELAY, p95))
+
+    def status(self) -> dict:
+        p95 = self.latency.percentile(95)
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "p95_ms": round(p95 * 1000) if p95 is not None else None,
+        }
+
+    def _transition(self, state: str):
+        print(f"Circuit breaker for {self.name}: {self.state} -> {state}")
+        self.state = state
+        self._publish()
+
+    def _publish(self):
+        metrics.set_gauge("circuit_state", self.name, self.state)
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+
+
+def breaker_for(provider: str) -> CircuitBreaker:
+    breaker = _breakers.get(provider)
+    if breaker is None:
+        breaker = _breakers[provider] = CircuitBreaker(provider)
+    return breaker
+
+
+# --- Last-known-good values, served when a provider is failing ---
+
+_last_good = TTLCache(max_entries=2048, default_ttl=24 * 3600)
+
+
+def remember(provider: str, key, value):
+    _last_good.set(f"{provider}:{key}", value)
+
+
+def last_known_good(provider: str, key):
+    value = _last_good.get(f"{provider}:{key}")
+    if value is not None:
+        metrics.incr("last_known_good_served", provider)
+    return value
+
+
+metrics.register_source("circuit_breakers", lambda: {
+    name: breaker.status() for name, breaker in _breakers.items()
+})
@@ -0,0 +1,146 @@
+import os
+from dataclasses import dataclass, field
+
+from app import processing
+from app.services import bio, infrastructure, metrics, open_meteo
+from app.services.cache import TTLCache
+from app.services.records import FloodSnapshot, WeatherSnapshot
+
+# Risk scores only change when the weather snapshot behind them does, so
+# they are computed once per (grid cell, snapshot epoch) and shared by every
+# endpoint that asks. The epoch is the snapshot's fetched_at; a bundle is
+# dropped as soon as the weather cache replaces that snapshot.
+MEMO_MAX_ENTRIES = int(os.getenv("RISK_MEMO_MAX_ENTRIES", 4096))
+
+# Flood risk also depends on the exact point (river distance). Points are
+# quantized to this many degrees (~100 m) so nearby users share a score.
+FLOOD_QUANTUM = float(os.getenv("RISK_FLOOD_QUANTUM", 0.001))
+
+# A 0.05° cell holds ~2,500 such points, so each bundle keeps only the most
+# recently asked ones (LRU); memory stays under bundles x this many scores.
+FLOOD_POINTS_PER_BUNDLE = int(os.getenv("RISK_FLOOD_POINTS_PER_BUNDLE", 128))
+
+BUNDLE_TTL = 2 * open_meteo.CACHE_DURATION
+
+
+@dataclass
+class RiskBundle:
+    """Every risk derived from one weather snapshot of one grid cell."""
+    epoch: float
+    weather: WeatherSnapshot
+    flood: FloodSnapshot
+    fire: float
+    bio: bio.BioRisk
+    infra: dict
+    # Quantized (lat, lon) -> flood score
+    floods: TTLCache = field(default_factory=lambda: TTLCache(
+        max_entries=FLOOD_POINTS_PER_BUNDLE, default_ttl=BUNDLE_TTL, stale_ttl=0))
+
+    @property
+    def grid_cell(self) -> dict:
+        return self.weather.grid_cell
+
+
+_memo = TTLCache(max_entries=MEMO_MAX_ENTRIES, default_ttl=BUNDLE_TTL, stale_ttl=0)
+_stats = {"builds": 0, "invalidations": 0, "flood_hits": 0, "flood_misses": 0}
+
+
+def invalidate(key: str | None = None):
+    """Drops the bundle for one snapshot key, or every bundle."""
+    if key is None:
+        _memo.clear()
+    elif not _memo.delete(key):
+        return
+    _stats["invalidations"] += 1
+
+
+# New snapshot for a cell -> its bundle is out of date
+open_meteo.on_snapshot_change(invalidate)
+
+
+async def get_bundle(lat: float, lon: float) -> RiskBundle:
+    """
+    The risk bundle for the grid cell around (lat, lon). Raises if no
+    weather snapshot can be fetched.
+    """
+    weather = await open_meteo.get_location_snapshot(lat, lon)
+    key = open_meteo.snapshot_key(lat, lon)
+
+    bundle = _memo.get(key)
+    # The epoch check also catches snapshots another worker refreshed
+    if bundle is not None and bundle.epoch == weather.fetched_at:
+        return bundle
+
+    bundle = await _build(weather)
+    _memo.set(key, bundle)
+    _stats["builds"] += 1
+    return bundle
+
+
+async def _build(weather: WeatherSnapshot) -> RiskBundle:
+    flood = FloodSnapshot.from_weather(weather)
+    fire = processing.calculate_fwi(
+        temp_c=weather.temp_max,
+        humidity_rh=weather.humidity_min,
+        wind_kmh=weather.wind_max,
+        rain_mm=weather.precipitation
+    )
+    # We use 'precipitation_forecast_7d' as a proxy for ground wetness
+    bio_risk = await bio.analyze_biological_risk(
+        temp=weather.temp_max,
+        rain_7day=flood.precipitation_forecast_7d
+    )
+    infra = infrastructure.analyze_grid_stress(
+        wind_max=weather.wind_max,
+        temp_max=weather.temp_max,
+        rain_7day=flood.precipitation_forecast_7d,
+        soil_moisture=flood.soil_moisture_current
+    )
+    return RiskBundle(epoch=weather.fetched_at, weather=weather, flood=flood,
+                      fire=fire, bio=bio_risk, infra=infra)
+
+
+def flood_risk(bundle: RiskBundle, lat: float, lon: float, rivers_data) -> int:
+    """Flood score for a point of the bundle's cell, memoized per quantized point."""
+    point = (round(lat / FLOOD_QUANTUM) * FLOOD_QUANTUM, round(lon / FLOOD_QUANTUM) * FLOOD_QUANTUM)
+    score = bundle.floods.get(point)
+    if score is None:
+        _stats["flood_misses"] += 1
+        score = processing.calculate_flood_risk(
+            user_lat=point[0],
+            user_lon=point[1],
+            precipitation_forecast_7d=bundle.flood.precipitation_forecast_7d,
+            soil_moisture_current=bundle.flood.soil_moisture_current,
+            rivers_data=rivers_data
+        )
+        bundle.floods.set(point, score)
+    else:
+        _stats["flood_hits"] += 1
+    return score
+
+
+async def get_flood(lat: float, lon: float, rivers_data) -> tuple[int, FloodSnapshot]:
+    """
+    (flood score, flood inputs) for a point. Falls back to neutral inputs,
+    uncached, when no forecast can be fetched.
+    """
+    try:
+        bundle = await get_bundle(lat, lon)
+    except Exception as e:
+        print(f"Flood data Error: {e}")
+        flood = await open_meteo.get_flood_data(lat, lon)
+        return processing.calculate_flood_risk(
+            user_lat=lat,
+            user_lon=lon,
+            precipitation_forecast_7d=flood.precipitation_forecast_7d,
+            soil_moisture_current=flood.soil_moisture_current,
+            rivers_data=rivers_data
+        ), flood
+    return flood_risk(bundle, lat, lon, rivers_data), bundle.flood
+
+
+def stats() -> dict:
+    return {"bundles": len(_memo), **_stats}
+
+
+metrics.register_source("risk_memo", stats)
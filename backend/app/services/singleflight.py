@@ -0,0 +1,58 @@
+import asyncio
+from functools import wraps
+
+from app.services import metrics
+
+# (provider, call key) -> the task currently fetching it
+_inflight: dict = {}
+
+
+def _forget(flight_key, task):
+    if _inflight.get(flight_key) is task:
+        del _inflight[flight_key]
+    # Mark the exception as retrieved even if every caller was cancelled
+    if not task.cancelled():
+        task.exception()
+
+
+async def do(provider: str, key, fn, *args, **kwargs):
+    """
+    Runs fn(*args, **kwargs) once per (provider, key) at a time. Callers that
+    arrive while a fetch is in flight await the same task instead of firing
+    their own upstream request.
+    """
+    flight_key = (provider, key)
+    task = _inflight.get(flight_key)
+
+    if task is None:
+        metrics.incr("upstream_fetches", provider)
+        task = asyncio.ensure_future(fn(*args, **kwargs))
+        _inflight[flight_key] = task
+        task.add_done_callback(lambda t: _forget(flight_key, t))
+    else:
+        metrics.incr("coalesced_requests", provider)
+
+    # Shield so one caller disconnecting does not cancel the shared fetch
+    return await asyncio.shield(task)
+
+
+def coalesce(provider: str):
+    """
+    Decorator form of do(). The call key is the function name plus its
+    arguments, so arguments should already be canonical (e.g. a snapped
+    grid cell rather than raw coordinates).
+    """
+    def decorator(fn):
+        @wraps(fn)
+        async def wrapper(*args, **kwargs):
+            key = (fn.__name__, args, tuple(sorted(kwargs.items())))
+            return await do(provider, key, fn, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def in_flight() -> int:
+    return len(_inflight)
+
+
+metrics.register_source("singleflight", lambda: {"in_flight": in_flight()})
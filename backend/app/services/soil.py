@@ -1,20 +1,13 @@
 import httpx
+import time
 from fastapi import HTTPException
-from pydantic import BaseModel
+from app import grid
+from app.services import http_client, resilience
+from app.services.records import SoilSnapshot, hours, series, value_at
 
 # Dedicated Soil API endpoint
 SOIL_API_URL = "https://api.open-meteo.com/v1/forecast"
 
-class SoilData(BaseModel):
-    """
-    Pydantic model for standardized Soil data.
-    Values are typically in m³/m³ (volumetric water content).
-    """
-    moisture_surface: float  # 0-1 cm (Quick to dry/wet)
-    moisture_deep: float     # 3-9 cm (Stores water, indicates saturation)
-    temperature_surface: float # Soil temp at 0cm
-    saturation_status: str   # Interpreted status (e.g., "Dry", "Saturated")
-
 def interpret_saturation(moisture: float) -> str:
     """
     Helper to interpret volumetric soil moisture (m³/m³).
@@ -29,7 +22,7 @@ def interpret_saturation(moisture: float) -> str:
     else:
         return "Dry"
 
-async def get_soil_data(lat: float, lon: float) -> SoilData:
+async def get_soil_data(lat: float, lon: float) -> SoilSnapshot:
     """
     Fetches dynamic soil moisture and temperature data.
     """
@@ -41,40 +34,44 @@ async def get_soil_data(lat: float, lon: float) -> SoilData:
         "timezone": "auto",
         "forecast_days": 1
     }
+    lkg_key = grid.cell_key("soil", grid.snap(lat, lon))
     
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(SOIL_API_URL, params=params)
-            data = response.json()
+    try:
+        response = await http_client.get(SOIL_API_URL, params=params)
+        data = response.json()
 
-            if data.get("error"):
-                raise ValueError(data.get("reason", "Unknown Soil API error"))
+        if data.get("error"):
+            raise ValueError(data.get("reason", "Unknown Soil API error"))
 
-            response.raise_for_status()
+        response.raise_for_status()
             
-            # Take the current hour (index 0)
-            hourly = data.get("hourly", {})
-            
-            m_surface = hourly.get("soil_moisture_0_to_1cm", [0])[0] or 0.0
-            m_deep = hourly.get("soil_moisture_3_to_9cm", [0])[0] or 0.0
-            t_surface = hourly.get("soil_temperature_0cm", [0])[0] or 0.0
-            
-            # Interpret the deep moisture for risk analysis
-            status = interpret_saturation(m_deep)
+        hourly = data.get("hourly", {})
+        m_deep = series(hourly.get("soil_moisture_3_to_9cm"))
+
+        # Interpret the current hour's deep moisture for risk analysis
+        status = interpret_saturation(value_at(m_deep) or 0.0)
 
-            return SoilData(
-                moisture_surface=m_surface,
-                moisture_deep=m_deep,
-                temperature_surface=t_surface,
-                saturation_status=status
-            )
+        result = SoilSnapshot(
+            hourly_time=hours(hourly.get("time")),
+            soil_moisture_0_to_1cm=series(hourly.get("soil_moisture_0_to_1cm")),
+            soil_moisture_3_to_9cm=m_deep,
+            soil_temperature_0cm=series(hourly.get("soil_temperature_0cm")),
+            saturation_status=status,
+            fetched_at=time.time()
+        )
+        resilience.remember("soil", lkg_key, result)
+        return result
 
-        except httpx.HTTPStatusError as e:
-            print(f"Soil API HTTP Error: {e.response.text}")
-            raise HTTPException(
-                status_code=e.response.status_code, 
-                detail=f"Soil data provider error: {e.response.text}"
-            )
-        except (httpx.RequestError, ValueError, KeyError) as e:
-            print(f"Soil data processing error: {e}") 
-            raise HTTPException(status_code=503, detail="Unable to fetch soil data.")
\ No newline at end of file
+    except httpx.HTTPStatusError as e:
+        print(f"Soil API HTTP Error: {e.response.text}")
+        cached = resilience.last_known_good("soil", lkg_key)
+        if cached: return cached
+        raise HTTPException(
+            status_code=e.response.status_code, 
+            detail=f"Soil data provider error: {e.response.text}"
+        )
+    except (httpx.RequestError, ValueError, KeyError) as e:
+        print(f"Soil data processing error: {e}") 
+        cached = resilience.last_known_good("soil", lkg_key)
+        if cached: return cached
+        raise HTTPException(status_code=503, detail="Unable to fetch soil data.")
\ No newline at end of file
@@ -1,9 +1,10 @@
-import httpx
 import os
 from datetime import datetime, timedelta
 from fastapi import HTTPException
 from pydantic import BaseModel
 from typing import List
+from app import hazard_rules
+from app.services import http_client, resilience
 
 NASA_BASE_URL = "https://api.nasa.gov/DONKI"
 API_KEY = os.getenv("NASA_API_KEY")
@@ -37,71 +38,45 @@ async def get_space_weather() -> SpaceWeatherData:
     
     if API_KEY:
         try:
-            async with httpx.AsyncClient() as client:
-                # Get Geomagnetic Storms (GST)
-                end_date = datetime.utcnow().strftime("%Y-%m-%d")
-                start_date = (datetime.utcnow() - timedelta(days=3)).strftime("%Y-%m-%d")
+            # Get Geomagnetic Storms (GST)
+            end_date = datetime.utcnow().strftime("%Y-%m-%d")
+            start_date = (datetime.utcnow() - timedelta(days=3)).strftime("%Y-%m-%d")
                 
-                gst_resp = await client.get(
-                    f"{NASA_BASE_URL}/GST", 
-                    params={"startDate": start_date, "endDate": end_date, "api_key": API_KEY}
-                )
+            gst_resp = await http_client.get(
+                f"{NASA_BASE_URL}/GST", 
+                params={"startDate": start_date, "endDate": end_date, "api_key": API_KEY}
+            )
                 
-                if gst_resp.status_code == 200:
-                    data = gst_resp.json()
-                    # Find highest Kp in recent storms
-                    for storm in data:
-                        for obs in storm.get("allKpIndex", []):
-                            k = obs.get("kpIndex", 0)
-                            if k > kp_index: 
-                                kp_index = k
+            if gst_resp.status_code == 200:
+                data = gst_resp.json()
+                # Find highest Kp in recent storms
+                for storm in data:
+                    for obs in storm.get("allKpIndex", []):
+                        k = obs.get("kpIndex", 0)
+                        if k > kp_index: 
+                            kp_index = k
+                resilience.remember("donki", "kp_index", kp_index)
+            else:
+                kp_index = resilience.last_known_good("donki", "kp_index") or kp_index
                                 
         except Exception as e:
             print(f"NASA API Error: {e}")
+            kp_index = resilience.last_known_good("donki", "kp_index") or kp_index
 
     # --- THE "TECH IMPACT" LOGIC ---
-    # Translate Kp Index (0-9) into Infrastructure Risk
-    
-    gps = "Precision (<3m)"
-    radio = "Clear"
-    grid = "Stable"
-    drag = "Nominal"
-    risk = "Low"
-    msg = "Planetary shield is holding. Systems nominal."
-
-    if kp_index >= 8: # Extreme Storm (G5)
-        risk = "EXTREME"
-        gps = "Unavailable / Massive Errors"
-        radio = "Full Blackout (Days)"
-        grid = "Collapse Risk / Damage"
-        drag = "Critical (Orbit Loss)"
-        msg = "CRITICAL: Major Geomagnetic Storm. Avoid relying on GPS."
-    
-    elif kp_index >= 6: # Moderate-Strong (G2-G3)
-        risk = "High"
-        gps = "Degraded (Error ~50m)"
-        radio = "Spotty / Fadeouts"
-        grid = "Voltage Alarms"
-        drag = "High"
-        msg = "Warning: Solar storm active. Drone/GPS navigation may drift."
-        
-    elif kp_index >= 4: # Unsettled
-        risk = "Moderate"
-        gps = "Minor Jitter"
-        radio = "Minor Interference"
-        grid = "Stable"
-        drag = "Moderate"
-        msg = "Solar activity elevated. Minor tech fluctuations possible."
+    # Translate Kp Index (0-9) into Infrastructure Risk ("solar" rule in hazard_rules:
+    # >= 8 Extreme Storm (G5), >= 6 Moderate-Strong (G2-G3), >= 4 Unsettled)
+    impact = hazard_rules.scalar(hazard_rules.evaluate("solar", kp_index=kp_index))
 
     return SpaceWeatherData(
-        solar_risk_level=risk,
+        solar_risk_level=impact["severity"],
         kp_index=kp_index,
         tech_impact=TechImpact(
-            gps_status=gps,
-            radio_status=radio,
-            grid_status=grid,
-            satellite_drag=drag
+            gps_status=impact["gps_status"],
+            radio_status=impact["radio_status"],
+            grid_status=impact["grid_status"],
+            satellite_drag=impact["satellite_drag"]
         ),
         active_events=events,
-        message=msg
+        message=impact["message"]
     )
\ No newline at end of file
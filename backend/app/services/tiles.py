@@ -0,0 +1,217 @@
+import asyncio
+import math
+import os
+import struct
+import time
+import zlib
+
+import numpy as np
+
+from app import processing
+from app.rivers import RiverRaster
+from app.services import metrics, open_meteo, singleflight
+from app.services.cache import TTLCache
+from app.services.records import FloodSnapshot
+
+# Risk heatmap tiles in the usual web-map z/x/y scheme (Web Mercator).
+HAZARDS = ("fire", "flood")
+FORMATS = ("png", "bin")
+MAX_ZOOM = 18
+DEFAULT_SIZE = 256
+
+# Weather is sampled on a SAMPLES x SAMPLES grid per tile (49 points fits one
+# Open-Meteo batch call) and spread over the pixels; river distance, which
+# varies much faster, is computed per pixel. All per-pixel work (distances,
+# scoring, encoding) runs in a worker thread so a render never blocks the loop.
+SAMPLES = int(os.getenv("TILE_SAMPLES", 7))
+
+# Tiles are cached per data epoch: a new epoch starts whenever the weather
+# cache would have refreshed, so every tile of one epoch shares one dataset.
+EPOCH_SECONDS = open_meteo.CACHE_DURATION
+TILE_CACHE_ENTRIES = int(os.getenv("TILE_CACHE_ENTRIES", 2048))
+
+NO_DATA = 255  # Score value for pixels without data in the binary format
+
+# Colour ramp stops: score -> RGB (green, yellow, orange, red, dark red)
+RAMP_STOPS = [0, 25, 50, 75, 100]
+RAMP_COLOURS = np.array([
+    [46, 204, 113],
+    [241, 196, 15],
+    [230, 126, 34],
+    [231, 76, 60],
+    [142, 22, 0],
+], dtype=np.float64)
+RAMP_ALPHA = 170
+
+_tile_cache = TTLCache(max_entries=TILE_CACHE_ENTRIES, default_ttl=EPOCH_SECONDS, stale_ttl=0)
+
+# River distance per pixel doesn't depend on the weather, so it outlives epochs
+_distance_cache = TTLCache(max_entries=TILE_CACHE_ENTRIES // 4, default_ttl=24 * 3600, stale_ttl=0)
+
+metrics.register_source("tile_cache", _tile_cache.stats)
+
+
+def current_epoch() -> int:
+    return int(time.time() // EPOCH_SECONDS)
+
+
+def epoch_seconds_left() -> int:
+    """Seconds until the current epoch ends (at least 1), for Cache-Control."""
+    return max(1, int(EPOCH_SECONDS - time.time() % EPOCH_SECONDS))
+
+
+def tile_is_valid(z: int, x: int, y: int) -> bool:
+    return 0 <= z <= MAX_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z
+
+
+async def get_tile(hazard: str, z: int, x: int, y: int, size: int = DEFAULT_SIZE,
+                   fmt: str = "png", rivers_data=None) -> tuple[bytes, int, bool]:
+    """
+    Returns (tile bytes, data epoch, complete). Tiles are rendered once per
+    (hazard, tile, size, format, epoch); concurrent requests for the same
+    tile share one render. A tile missing weather for any sample point
+    (an upstream outage) is not cached, so the next request retries it.
+    """
+    epoch = current_epoch()
+    key = f"{hazard}_{z}_{x}_{y}_{size}_{fmt}_{epoch}"
+
+    cached = _tile_cache.get(key)
+    if cached is not None:
+        return cached, epoch, True
+
+    scores, complete = await singleflight.do("tiles", key, render_scores, hazard, z, x, y, size, rivers_data)
+    payload = await asyncio.to_thread(_encode, scores, fmt)
+    if complete:
+        _tile_cache.set(key, payload)
+        metrics.incr("tiles_rendered", hazard)
+    else:
+        metrics.incr("tiles_incomplete", hazard)
+    return payload, epoch, complete
+
+
+async def render_scores(hazard: str, z: int, x: int, y: int, size: int, rivers_data=None) -> tuple[np.ndarray, bool]:
+    """
+    (scores, complete): a (size, size) float array of risk scores, NaN
+    where there is no data, and whether every sample point had weather.
+    """
+    # Weather at the sample points, fetched in one batched call
+    sample_lats, sample_lons = tile_coordinates(z, x, y, SAMPLES)
+    points = list(zip(sample_lats.ravel().tolist(), sample_lons.ravel().tolist()))
+    snapshots = await open_meteo.get_location_snapshots_many(points)
+
+    complete = all(s is not None for s in snapshots)
+
+    if hazard == "fire":
+        return await asyncio.to_thread(_fire_scores, snapshots, size), complete
+    distances = await _tile_distances(rivers_data, z, x, y, size)
+    return await asyncio.to_thread(_flood_scores, snapshots, z, x, y, size, distances), complete
+
+
+def _sample_field(values, size: int) -> np.ndarray:
+    """Spreads SAMPLES x SAMPLES values over the pixels: each takes the sample point it falls under."""
+    nearest = (np.arange(size) * SAMPLES) // size
+    pick = nearest[:, None] * SAMPLES + nearest[None, :]
+    return np.array(values, dtype=np.float64)[pick]
+
+
+def _fire_scores(snapshots: list, size: int) -> np.ndarray:
+    return processing.calculate_fwi_batch(
+        temp_c=_sample_field([s.temp_max if s else None for s in snapshots], size),
+        humidity_rh=_sample_field([s.humidity_min if s else None for s in snapshots], size),
+        wind_kmh=_sample_field([s.wind_max if s else None for s in snapshots], size),
+        rain_mm=_sample_field([s.precipitation if s else None for s in snapshots], size),
+    )
+
+
+def _flood_scores(snapshots: list, z: int, x: int, y: int, size: int, distances) -> np.ndarray:
+    lats, lons = tile_coordinates(z, x, y, size)
+    floods = [FloodSnapshot.from_weather(s) if s else None for s in snapshots]
+    rain = _sample_field([f.precipitation_forecast_7d if f else None for f in floods], size)
+    soil = _sample_field([f.soil_moisture_current if f else None for f in floods], size)
+    scores = processing.calculate_flood_risk_batch(
+        lats, lons, rain, soil, _TileDistances(distances) if distances is not None else None
+    ).astype(np.float64)
+    scores[np.isnan(rain)] = np.nan
+    return scores
+
+
+async def _tile_distances(rivers_data, z: int, x: int, y: int, size: int):
+    """
+    Per-pixel distance to the nearest river, or None without river data.
+    A loaded RiverRaster is sampled directly (O(1) per pixel); an exact
+    RiverIndex is queried once per tile and the result cached, since it
+    doesn't depend on the weather. The cache is only touched on the loop.
+    """
+    rivers = processing.river_index_for(rivers_data)
+    if rivers is None:
+        return None
+    lats, lons = tile_coordinates(z, x, y, size)
+    if isinstance(rivers, RiverRaster):
+        return await asyncio.to_thread(rivers.distance_km, lats, lons)
+
+    key = f"{z}_{x}_{y}_{size}"
+    distances = _distance_cache.get(key)
+    if distances is None:
+        distances = await asyncio.to_thread(rivers.distance_km, lats, lons)
+        _distance_cache.set(key, distances)
+    return distances
+
+
+class _TileDistances:
+    """Precomputed per-pixel distances behind the river-index interface calculate_flood_risk_batch takes."""
+
+    def __init__(self, distances: np.ndarray):
+        self.distances = distances
+
+    def distance_km(self, lats, lons):
+        return self.distances
+
+
+def tile_coordinates(z: int, x: int, y: int, size: int):
+    """Latitude/longitude grids (size x size) of pixel centres in a Web Mercator tile."""
+    n = 2 ** z
+    steps = (np.arange(size) + 0.5) / size
+    lons = (x + steps) / n * 360.0 - 180.0
+    lats = np.degrees(np.arctan(np.sinh(math.pi * (1 - 2 * (y + steps) / n))))
+    return np.broadcast_to(lats[:, None], (size, size)), np.broadcast_to(lons[None, :], (size, size))
+
+
+# --- Encoders ---
+
+def _encode(scores: np.ndarray, fmt: str) -> bytes:
+    return encode_png(colourize(scores)) if fmt == "png" else encode_scores(scores)
+
+
+def colourize(scores: np.ndarray) -> np.ndarray:
+    """Scores (0-100, NaN = no data) -> RGBA uint8 image; no data is transparent."""
+    rgba = np.zeros(scores.shape + (4,), dtype=np.uint8)
+    valid = ~np.isnan(scores)
+    for channel in range(3):
+        rgba[..., channel][valid] = np.interp(scores[valid], RAMP_STOPS, RAMP_COLOURS[:, channel])
+    rgba[..., 3][valid] = RAMP_ALPHA
+    return rgba
+
+
+def encode_png(rgba: np.ndarray) -> bytes:
+    """Minimal RGBA PNG (no filtering, zlib-compressed)."""
+    height, width, _ = rgba.shape
+    # Every scanline starts with filter type 0
+    raw = np.concatenate([np.zeros((height, 1), dtype=np.uint8), rgba.reshape(height, width * 4)], axis=1)
+
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+    return b"".join([
+        b"\x89PNG\r\n\x1a\n",
+        chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)),
+        chunk(b"IDAT", zlib.compress(raw.tobytes(), 6)),
+        chunk(b"IEND", b""),
+    ])
+
+
+def encode_scores(scores: np.ndarray) -> bytes:
+    """Row-major uint8 scores (0-100), NO_DATA where there is no data."""
+    out = np.full(scores.shape, NO_DATA, dtype=np.uint8)
+    valid = ~np.isnan(scores)
+    out[valid] = np.round(scores[valid]).astype(np.uint8)
+    return out.tobytes()
@@ -0,0 +1,312 @@
+import json
+import math
+import os
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import NamedTuple
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app import grid, trend
+from app.models.history import RegionalHistory, RegionalTrendStats
+
+# Per-cell regression sums (n, Σx, Σx², Σy, Σxy) for the flood and fire
+# risk series, keyed by history grid cell id (app.grid.cell_id) and updated
+# in the same transaction as every regional_history insert, delete or edit,
+# so a trend is one primary-key read instead of a scan. Importing this
+# module registers the session hook, so anything that writes history
+# through the ORM should import it (ai_predictor does).
+
+WINDOW_DAYS = int(os.getenv("TREND_WINDOW_DAYS", 30))
+
+TARGETS = {"flood": "calculated_flood_risk", "fire": "calculated_fire_risk"}
+SUMS = ("n", "sum_x", "sum_xx", "sum_y", "sum_xy")
+
+# Rows loaded per SELECT when a flush touches many cells
+LOAD_CHUNK = 500
+
+_table = RegionalTrendStats.__table__
+
+
+class Change(NamedTuple):
+    """One history row entering (sign=1) or leaving (sign=-1) the stats."""
+    cell_id: int
+    day: date
+    flood: float | None
+    fire: float | None
+    sign: int = 1
+
+
+# --- Updating ---
+
+def apply(connection, changes: list):
+    """
+    Folds history changes into the stats rows: one SELECT per LOAD_CHUNK
+    cells, then one UPDATE/INSERT per cell touched.
+    """
+    by_cell = defaultdict(list)
+    for change in changes:
+        by_cell[change.cell_id].append(change)
+    if not by_cell:
+        return
+
+    states = _load(connection, list(by_cell))
+    inserts, updates, deletes = [], [], []
+    for key, items in by_cell.items():
+        existed = key in states
+        state = states.get(key)
+        for change in items:
+            state = _fold(state, change)
+        if state["rows"] <= 0:
+            if existed:
+                deletes.append(key)
+        elif existed:
+            updates.append(state)
+        else:
+            inserts.append(state)
+
+    if inserts:
+        lost = _insert(connection, inserts)
+        if lost:
+            # Another transaction created these cells since _load: fold into its rows
+            won = _load(connection, lost)
+            for key in lost:
+                state = won[key]
+                for change in by_cell[key]:
+                    state = _fold(state, change)
+                if state["rows"] <= 0:
+                    deletes.append(key)
+                else:
+                    updates.append(state)
+    for state in updates:
+        connection.execute(
+            _table.update()
+            .where(_table.c.cell_id == state["cell_id"])
+            .values(**state)
+        )
+    if deletes:
+        connection.execute(_table.delete().where(_table.c.cell_id.in_(deletes)))
+
+
+def _insert(connection, states: list) -> list:
+    """
+    Inserts new stats rows; returns the cell ids another transaction
+    inserted first. _load can't lock rows that don't exist yet, so two
+    writers may both insert one cell. Each attempt runs in a SAVEPOINT so
+    losing the race doesn't abort the caller's transaction. SQLite
+    serializes writers, so it can't race and skips the savepoints.
+    """
+    if connection.dialect.name == "sqlite":
+        connection.execute(_table.insert(), states)
+        return []
+    try:
+        with connection.begin_nested():
+            connection.execute(_table.insert(), states)
+        return []
+    except IntegrityError:
+        pass
+
+    # Someone else got at least one of them: retry one cell at a time
+    lost = []
+    for state in states:
+        try:
+            with connection.begin_nested():
+                connection.execute(_table.insert(), state)
+        except IntegrityError:
+            lost.append(state["cell_id"])
+    return lost
+
+
+def untracked(connection, cell_ids: list) -> set:
+    """
+    Cells among cell_ids that have history but no stats row yet. Bulk
+    writers leave these out of apply(): load() rebuilds them in full on
+    first read, where folding in just the new rows would not.
+    """
+    cell_ids = list(dict.fromkeys(cell_ids))
+    result = set()
+    for i in range(0, len(cell_ids), LOAD_CHUNK):
+        chunk = cell_ids[i:i + LOAD_CHUNK]
+        with_history = connection.execute(
+            select(RegionalHistory.cell_id).distinct().where(RegionalHistory.cell_id.in_(chunk))
+        ).scalars()
+        tracked = connection.execute(select(_table.c.cell_id).where(_table.c.cell_id.in_(chunk))).scalars()
+        result |= set(with_history) - set(tracked)
+    return result
+
+
+def _load(connection, cell_ids: list) -> dict:
+    """cell_id -> state dict for the cells that already have stats."""
+    states = {}
+    for i in range(0, len(cell_ids), LOAD_CHUNK):
+        query = select(_table).where(_table.c.cell_id.in_(cell_ids[i:i + LOAD_CHUNK]))
+        # Lock the rows so concurrent writers for a cell queue up (no-op on SQLite)
+        if connection.dialect.name != "sqlite":
+            query = query.with_for_update()
+        for row in connection.execute(query).mappings():
+            states[row["cell_id"]] = dict(row)
+    return states
+
+
+def _blank(change: Change) -> dict:
+    state = {"cell_id": change.cell_id,
+             "origin_date": change.day, "last_date": change.day, "rows": 0, "window": "{}"}
+    for target in TARGETS:
+        for name in SUMS:
+            state[f"{target}_{name}"] = 0
+    return state
+
+
+def _fold(state: dict | None, change: Change) -> dict:
+    state = dict(state) if state else _blank(change)
+    state["rows"] += change.sign
+
+    x = (change.day - state["origin_date"]).days
+    for target in TARGETS:
+        y = getattr(change, target)
+        if not _present(y):
+            continue
+        s = change.sign
+        state[f"{target}_n"] += s
+        state[f"{target}_sum_x"] += s * x
+        state[f"{target}_sum_xx"] += s * x * x
+        state[f"{target}_sum_y"] += s * y
+        state[f"{target}_sum_xy"] += s * x * y
+
+    # Sliding window, anchored at the newest day seen. Deletes don't move
+    # last_date back (that would need the raw rows).
+    window = json.loads(state["window"] or "{}")
+    if change.sign > 0 and change.day > state["last_date"]:
+        state["last_date"] = change.day
+    start = state["last_date"] - timedelta(days=WINDOW_DAYS - 1)
+    if change.day >= start:
+        entry = window.setdefault(change.day.isoformat(), [0, 0.0, 0, 0.0])
+        for i, target in enumerate(TARGETS):
+            y = getattr(change, target)
+            if _present(y):
+                entry[2 * i] += change.sign
+                entry[2 * i + 1] += change.sign * y
+        if entry[0] <= 0 and entry[2] <= 0:
+            del window[change.day.isoformat()]
+    # Expire days that slid out
+    window = {day: entry for day, entry in window.items() if day >= start.isoformat()}
+    state["window"] = json.dumps(window, separators=(",", ":"), sort_keys=True)
+    return state
+
+
+def _present(value) -> bool:
+    return value is not None and not math.isnan(value)
+
+
+# --- Session hook ---
+
+def _keep_old_value(target, value, oldvalue, initiator):
+    pass
+
+
+# Tracked columns load their old value before being set, even on an expired
+# instance (e.g. right after a commit), so the hook can take it back out
+for _name in ("latitude", "longitude", "date", *TARGETS.values()):
+    event.listen(getattr(RegionalHistory, _name), "set", _keep_old_value, active_history=True)
+
+
+@event.listens_for(Session, "after_flush")
+def _after_flush(session: Session, flush_context):
+    changes = []
+    for obj in session.new:
+        if isinstance(obj, RegionalHistory):
+            changes.append(_change(obj))
+    for obj in session.deleted:
+        if isinstance(obj, RegionalHistory):
+            changes.append(_change(obj, committed=True, sign=-1))
+    for obj in session.dirty:
+        if isinstance(obj, RegionalHistory) and session.is_modified(obj):
+            attrs = inspect(obj).attrs
+            tracked = ("latitude", "longitude", "cell_id", "date", *TARGETS.values())
+            if any(attrs[name].history.has_changes() for name in tracked):
+                changes.append(_change(obj, committed=True, sign=-1))
+                changes.append(_change(obj))
+    if changes:
+        apply(session.connection(), changes)
+
+
+def _change(obj: RegionalHistory, committed: bool = False, sign: int = 1) -> Change:
+    """The row as it is now, or (committed=True) as it was before this flush."""
+    if committed:
+        attrs = inspect(obj).attrs
+
+        def value(name):
+            history = attrs[name].history
+            return (history.deleted or history.unchanged or history.added or [None])[0]
+    else:
+        def value(name):
+            return getattr(obj, name)
+
+    cell = value("cell_id")
+    if cell is None:
+        cell = grid.cell_id(value("latitude"), value("longitude"))
+    return Change(cell, value("date"), value(TARGETS["flood"]), value(TARGETS["fire"]), sign)
+
+
+# --- Reading ---
+
+def load(db: Session, lat: float, lon: float) -> dict | None:
+    """
+    The stats row for the history cell around (lat, lon). Cells whose
+    history predates the stats table are rebuilt from their raw rows
+    once, on first read.
+    """
+    cell = grid.cell_id(lat, lon)
+    row = db.execute(select(_table).where(_table.c.cell_id == cell)).mappings().first()
+    if row is not None:
+        return dict(row)
+    if not rebuild(db, cell):
+        return None
+    row = db.execute(select(_table).where(_table.c.cell_id == cell)).mappings().first()
+    return dict(row) if row else None
+
+
+def rebuild(db: Session, cell_id: int) -> bool:
+    """Recomputes one cell's stats from regional_history; False if it has none."""
+    history = db.query(
+        RegionalHistory.date, RegionalHistory.calculated_flood_risk, RegionalHistory.calculated_fire_risk
+    ).filter(
+        RegionalHistory.cell_id == cell_id
+    ).order_by(RegionalHistory.date).all()
+    if not history:
+        return False
+
+    try:
+        connection = db.connection()
+        connection.execute(_table.delete().where(_table.c.cell_id == cell_id))
+        apply(connection, [Change(cell_id, day, flood, fire) for day, flood, fire in history])
+        db.commit()
+    except IntegrityError:
+        db.rollback()  # Another worker rebuilt it first
+    return True
+
+
+def line(stats: dict, target: str, window: bool = False) -> tuple:
+    """
+    (slope, intercept, n, last_x) for one target: all-time from the running
+    sums, or over the sliding window (at most WINDOW_DAYS entries).
+    """
+    last_x = (stats["last_date"] - stats["origin_date"]).days
+    if window:
+        sums = dict.fromkeys(SUMS, 0.0)
+        i = list(TARGETS).index(target)
+        for day, entry in json.loads(stats["window"] or "{}").items():
+            n, total = entry[2 * i], entry[2 * i + 1]
+            x = (date.fromisoformat(day) - stats["origin_date"]).days
+            sums["n"] += n
+            sums["sum_x"] += n * x
+            sums["sum_xx"] += n * x * x
+            sums["sum_y"] += total
+            sums["sum_xy"] += x * total
+    else:
+        sums = {name: stats[f"{target}_{name}"] for name in SUMS}
+
+    fitted = trend.from_sums(sums["n"], sums["sum_x"], sums["sum_y"], sums["sum_xy"], sums["sum_xx"])
+    return float(fitted["slope"]), float(fitted["intercept"]), int(fitted["n"]), last_x
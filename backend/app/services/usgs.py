@@ -2,6 +2,7 @@ import httpx
 from fastapi import HTTPException
 from pydantic import BaseModel
 from typing import List, Optional
+from app.services import http_client, resilience, singleflight
 
 # USGS API endpoint for significant earthquakes in the past 24 hours
 USGS_API_URL = "https://earthquake.usgs.gov/earthquakes/feed/v1.0/summary/significant_hour.geojson"
@@ -22,48 +23,54 @@ class QuakeData(BaseModel):
     """A Pydantic model for the full API response."""
     features: List[QuakeFeature]
 
+@singleflight.coalesce("usgs")
 async def get_significant_earthquakes() -> QuakeData:
     """
     Fetches all earthquakes with a magnitude of 2.5+ in the last 24 hours.
     """
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(USGS_API_URL_ALL)
-            response.raise_for_status() # Raise for 4xx/5xx errors
+    try:
+        response = await http_client.get(USGS_API_URL_ALL)
+        response.raise_for_status() # Raise for 4xx/5xx errors
             
-            data = response.json()
+        data = response.json()
             
-            # Parse the features
-            features_list = []
-            for item in data.get("features", []):
-                properties = item.get("properties", {})
-                geometry = item.get("geometry", {}).get("coordinates", [])
+        # Parse the features
+        features_list = []
+        for item in data.get("features", []):
+            properties = item.get("properties", {})
+            geometry = item.get("geometry", {}).get("coordinates", [])
                 
-                if not properties or len(geometry) < 2:
-                    continue
+            if not properties or len(geometry) < 2:
+                continue
 
-                features_list.append(
-                    QuakeFeature(
-                        mag=properties.get("mag", 0.0),
-                        place=properties.get("place", "Unknown location"),
-                        time=properties.get("time", 0),
-                        url=properties.get("url", ""),
-                        lon=geometry[0], # Lon is first in GeoJSON
-                        lat=geometry[1]
-                    )
+            features_list.append(
+                QuakeFeature(
+                    mag=properties.get("mag", 0.0),
+                    place=properties.get("place", "Unknown location"),
+                    time=properties.get("time", 0),
+                    url=properties.get("url", ""),
+                    lon=geometry[0], # Lon is first in GeoJSON
+                    lat=geometry[1]
                 )
+            )
             
-            return QuakeData(features=features_list)
+        result = QuakeData(features=features_list)
+        resilience.remember("usgs", "feed", result)
+        return result
 
-        except httpx.HTTPStatusError as e:
-            print(f"USGS HTTP Error: {e.response.text}")
-            raise HTTPException(
-                status_code=e.response.status_code,
-                detail=f"Error fetching data from USGS: {e.response.text}"
-            )
-        except (httpx.RequestError, ValueError, KeyError) as e:
-            print(f"USGS processing error: {e}") 
-            raise HTTPException(
-                status_code=503,
-                detail=f"Earthquake data processing error: {e}"
-            )
\ No newline at end of file
+    except httpx.HTTPStatusError as e:
+        print(f"USGS HTTP Error: {e.response.text}")
+        cached = resilience.last_known_good("usgs", "feed")
+        if cached: return cached
+        raise HTTPException(
+            status_code=e.response.status_code,
+            detail=f"Error fetching data from USGS: {e.response.text}"
+        )
+    except (httpx.RequestError, ValueError, KeyError) as e:
+        print(f"USGS processing error: {e}") 
+        cached = resilience.last_known_good("usgs", "feed")
+        if cached: return cached
+        raise HTTPException(
+            status_code=503,
+            detail=f"Earthquake data processing error: {e}"
+        )
\ No newline at end of file
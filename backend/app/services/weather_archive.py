@@ -0,0 +1,267 @@
+import asyncio
+import os
+import sqlite3
+import threading
+from datetime import date, timedelta
+
+from app import grid
+from app.services import http_client, metrics, singleflight
+from app.services.cache import TTLCache
+
+# Past days never change, so the archive keeps one row per (grid cell, day)
+# and only asks archive-api for dates it doesn't hold yet.
+# Set WEATHER_ARCHIVE_DB="" to keep the archive in memory only.
+ARCHIVE_DB = os.getenv("WEATHER_ARCHIVE_DB", "weather_archive.sqlite3")
+ARCHIVE_URL = "https://archive-api.open-meteo.com/v1/archive"
+
+DAILY_VARIABLES = [
+    "precipitation_sum",
+    "temperature_2m_max",
+    "temperature_2m_min",
+    "temperature_2m_mean",
+    "relative_humidity_2m_min",
+    "wind_speed_10m_max",
+    "soil_moisture_0_to_7cm_mean",
+]
+
+# The newest few days come back as nulls until the reanalysis catches up.
+# Those days aren't stored, and are retried at most this often (seconds).
+RETRY_AFTER = float(os.getenv("WEATHER_ARCHIVE_RETRY_AFTER", 3600))
+
+# Cells per multi-location archive request (get_daily_many)
+BATCH_SIZE = int(os.getenv("WEATHER_ARCHIVE_BATCH_SIZE", 50))
+
+# Cells per SQL statement in the store's batch reads
+STORE_BATCH = 500
+
+
+class ArchiveStore:
+    """
+    SQLite table of daily values keyed by (cell key, ISO date). Calls
+    block, so the async readers below make them from a worker thread.
+    """
+
+    def __init__(self, path: str):
+        self.path = path or ":memory:"
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        if self.path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        columns = ", ".join(f"{name} REAL" for name in DAILY_VARIABLES)
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS daily (cell TEXT NOT NULL, date TEXT NOT NULL, {columns}, "
+            "PRIMARY KEY (cell, date)) WITHOUT ROWID"
+        )
+
+    def held_dates(self, cell: str, start: date, end: date) -> set:
+        return self.held_dates_many([cell], start, end)[cell]
+
+    def held_dates_many(self, cells: list, start: date, end: date) -> dict:
+        """{cell: set of ISO dates held in the range}."""
+        held = {cell: set() for cell in cells}
+        for cell, day in self._select("date", cells, start, end):
+            held[cell].add(day)
+        return held
+
+    def read(self, cell: str, start: date, end: date) -> dict:
+        """Returns {iso_date: (values in DAILY_VARIABLES order)} for the range."""
+        return self.read_many([cell], start, end)[cell]
+
+    def read_many(self, cells: list, start: date, end: date) -> dict:
+        """read() for many cells: {cell: {iso_date: values}}."""
+        held = {cell: {} for cell in cells}
+        for cell, day, *values in self._select(f"date, {', '.join(DAILY_VARIABLES)}", cells, start, end):
+            held[cell][day] = tuple(values)
+        return held
+
+    def write(self, cell: str, rows: list):
+        """rows: [(iso_date, *values)] -- one executemany, one transaction."""
+        self.write_many({cell: rows})
+
+    def write_many(self, rows_by_cell: dict):
+        """{cell: [(iso_date, *values)]} -- one executemany, one transaction."""
+        placeholders = ", ".join("?" * (len(DAILY_VARIABLES) + 2))
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    f"INSERT OR REPLACE INTO daily (cell, date, {', '.join(DAILY_VARIABLES)}) "
+                    f"VALUES ({placeholders})",
+                    [(cell, *row) for cell, rows in rows_by_cell.items() for row in rows],
+                )
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def _select(self, columns: str, cells: list, start: date, end: date) -> list:
+        rows = []
+        with self._lock:
+            for i in range(0, len(cells), STORE_BATCH):
+                chunk = cells[i:i + STORE_BATCH]
+                rows += self._conn.execute(
+                    f"SELECT cell, {columns} FROM daily WHERE cell IN ({', '.join('?' * len(chunk))}) "
+                    "AND date BETWEEN ? AND ? ORDER BY cell, date",
+                    (*chunk, start.isoformat(), end.isoformat()),
+                ).fetchall()
+        return rows
+
+    def stats(self) -> dict:
+        with self._lock:
+            cells, days = self._conn.execute("SELECT COUNT(DISTINCT cell), COUNT(*) FROM daily").fetchone()
+        return {"cells": cells, "days": days}
+
+
+_store = ArchiveStore(ARCHIVE_DB)
+_recently_tried = TTLCache(max_entries=16384, default_ttl=RETRY_AFTER)
+
+metrics.register_source("weather_archive", _store.stats)
+
+
+async def get_daily(cell: grid.GridCell, start: date, end: date) -> dict:
+    """
+    Daily history for a grid cell over [start, end], inclusive. Dates the
+    archive already holds are answered locally; only the missing runs
+    (usually just the newest tail) are fetched. Days that still can't be
+    fetched come back as None.
+    """
+    key = grid.cell_key("history", cell)
+
+    held = await asyncio.to_thread(_store.held_dates, key, start, end)
+    runs = _missing_runs(key, held, start, end)
+    if runs:
+        metrics.incr("archive_fetches", amount=len(runs))
+        results = await asyncio.gather(
+            *(_fetch_range(cell, a.isoformat(), b.isoformat()) for a, b in runs),
+            return_exceptions=True,
+        )
+        fetched = []
+        for (a, b), result in zip(runs, results):
+            if isinstance(result, Exception):
+                print(f"Weather archive Error ({key} {a}..{b}): {result}")
+                continue
+            fetched += result
+            for day in _dates(a, b):
+                _recently_tried.set(f"{key}_{day.isoformat()}", True)
+        if fetched:
+            await asyncio.to_thread(_store.write, key, fetched)
+    else:
+        metrics.incr("archive_local_hits")
+
+    return _daily(await asyncio.to_thread(_store.read, key, start, end), start, end)
+
+
+async def get_daily_many(cells: list, start: date, end: date) -> list:
+    """
+    get_daily for many grid cells, aligned with `cells`. Cells missing
+    days are fetched BATCH_SIZE per archive-api request (comma-separated
+    coordinates), each over the span of its missing days; cells with the
+    same span share a request.
+    """
+    cells = list(cells)
+    keys = {cell: grid.cell_key("history", cell) for cell in cells}
+    held = await asyncio.to_thread(_store.held_dates_many, list(keys.values()), start, end)
+
+    spans = {}
+    for cell in dict.fromkeys(cells):
+        runs = _missing_runs(keys[cell], held[keys[cell]], start, end)
+        if runs:
+            spans.setdefault((runs[0][0], runs[-1][1]), []).append(cell)
+    fetching = sum(len(group) for group in spans.values())
+    if len(keys) > fetching:
+        metrics.incr("archive_local_hits", amount=len(keys) - fetching)
+
+    jobs = [(a, b, tuple(group[i:i + BATCH_SIZE]))
+            for (a, b), group in spans.items() for i in range(0, len(group), BATCH_SIZE)]
+    metrics.incr("archive_fetches", amount=len(jobs))
+    results = await asyncio.gather(
+        *(_fetch_range_many(chunk, a.isoformat(), b.isoformat()) for a, b, chunk in jobs),
+        return_exceptions=True,
+    )
+    fetched = {}
+    for (a, b, chunk), result in zip(jobs, results):
+        if isinstance(result, Exception):
+            print(f"Weather archive Error ({len(chunk)} cells {a}..{b}): {result}")
+            continue
+        for cell, rows in zip(chunk, result):
+            fetched[keys[cell]] = rows
+            for day in _dates(a, b):
+                _recently_tried.set(f"{keys[cell]}_{day.isoformat()}", True)
+    if fetched:
+        await asyncio.to_thread(_store.write_many, fetched)  # One transaction for the whole batch
+
+    stored = await asyncio.to_thread(_store.read_many, list(keys.values()), start, end)
+    return [_daily(stored[keys[cell]], start, end) for cell in cells]
+
+
+def _daily(held: dict, start: date, end: date) -> dict:
+    """Stored {iso_date: values} -> an archive-api style daily block over [start, end]."""
+    times = [day.isoformat() for day in _dates(start, end)]
+    daily = {"time": times}
+    for i, name in enumerate(DAILY_VARIABLES):
+        daily[name] = [held[t][i] if t in held else None for t in times]
+    return daily
+
+
+def _dates(start: date, end: date):
+    return (start + timedelta(days=i) for i in range((end - start).days + 1))
+
+
+def _missing_runs(key: str, held: set, start: date, end: date) -> list:
+    """Contiguous (first, last) date runs not held and not tried recently."""
+    runs = []
+    for day in _dates(start, end):
+        iso = day.isoformat()
+        if iso in held or _recently_tried.get(f"{key}_{iso}"):
+            continue
+        if runs and runs[-1][1] == day - timedelta(days=1):
+            runs[-1][1] = day
+        else:
+            runs.append([day, day])
+    return [tuple(run) for run in runs]
+
+
+@singleflight.coalesce("open-meteo-archive")
+async def _fetch_range(cell: grid.GridCell, start_date: str, end_date: str) -> list:
+    response = await http_client.get(ARCHIVE_URL, params={
+        "latitude": cell.latitude, "longitude": cell.longitude,
+        "start_date": start_date, "end_date": end_date,
+        "daily": DAILY_VARIABLES,
+        "timezone": "auto"
+    }, timeout=60.0)
+    response.raise_for_status()
+    return _rows(response.json().get("daily", {}))
+
+
+@singleflight.coalesce("open-meteo-archive")
+async def _fetch_range_many(cells: tuple, start_date: str, end_date: str) -> list:
+    """One archive request for several cells; rows per cell, in order."""
+    response = await http_client.get(ARCHIVE_URL, params={
+        "latitude": ",".join(str(cell.latitude) for cell in cells),
+        "longitude": ",".join(str(cell.longitude) for cell in cells),
+        "start_date": start_date, "end_date": end_date,
+        "daily": DAILY_VARIABLES,
+        "timezone": "auto"
+    }, timeout=120.0)
+    response.raise_for_status()
+    data = response.json()
+
+    # A single location comes back as an object, several as a list in request order
+    locations = data if isinstance(data, list) else [data]
+    if len(locations) != len(cells):
+        raise ValueError(f"Expected {len(cells)} locations, got {len(locations)}")
+    return [_rows(record.get("daily", {})) for record in locations]
+
+
+def _rows(daily: dict) -> list:
+    """Archive-api daily block -> [(iso_date, *values)], skipping unpublished days."""
+    columns = [daily.get(name) or [] for name in DAILY_VARIABLES]
+    rows = []
+    for i, day in enumerate(daily.get("time", [])):
+        values = [column[i] if i < len(column) else None for column in columns]
+        # Not published yet -- leave the day missing so it's fetched again later
+        if all(v is None for v in values):
+            continue
+        rows.append((day, *values))
+    return rows
@@ -0,0 +1,117 @@
+from typing import NamedTuple
+
+import numpy as np
+
+# --- Closed-form trend lines ---
+# Least-squares slope/intercept straight from the normal equations (centred,
+# so large day indexes don't lose precision). Same answer as an intercept-fit
+# sklearn LinearRegression, without building a DataFrame or a model object.
+# Every function has a *_many form that fits one row per location of an
+# (m, n) array in one pass; NaN marks a missing day and is left out.
+
+
+class Trend(NamedTuple):
+    slope: float
+    intercept: float
+    n: int  # Points used in the fit
+
+    def predict(self, x):
+        return self.intercept + self.slope * np.asarray(x, dtype=np.float64)
+
+
+def _rows(x, y, weights=None):
+    """Broadcasts to (m, n) float arrays and folds missing values into the weights."""
+    y = np.atleast_2d(np.asarray(y, dtype=np.float64))
+    x = np.broadcast_to(np.asarray(x, dtype=np.float64), y.shape)
+    w = np.ones(y.shape) if weights is None else np.broadcast_to(np.asarray(weights, dtype=np.float64), y.shape)
+    valid = ~(np.isnan(x) | np.isnan(y) | np.isnan(w))
+    return np.where(valid, x, 0.0), np.where(valid, y, 0.0), np.where(valid, w, 0.0), valid
+
+
+def fit_many(x, y, weights=None) -> dict:
+    """
+    (Weighted) least-squares line per row. x is (n,) or (m, n), y is
+    (m, n); weights (optional) broadcast against y. Returns {"slope",
+    "intercept", "n"} arrays of length m. Rows with fewer than two distinct
+    x values get slope 0 and the (weighted) mean as intercept; empty rows
+    get NaN.
+    """
+    x, y, w, valid = _rows(x, y, weights)
+    total = w.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        x_mean = (w * x).sum(axis=1) / total
+        y_mean = (w * y).sum(axis=1) / total
+        dx = np.where(valid, x - x_mean[:, None], 0.0)
+        dy = np.where(valid, y - y_mean[:, None], 0.0)
+        sxx = (w * dx * dx).sum(axis=1)
+        sxy = (w * dx * dy).sum(axis=1)
+        slope = np.where(sxx > 0, sxy / np.where(sxx > 0, sxx, 1.0), 0.0)
+    slope = np.where(total > 0, slope, np.nan)
+    return {"slope": slope, "intercept": y_mean - slope * x_mean, "n": valid.sum(axis=1)}
+
+
+def fit(x, y, weights=None) -> Trend:
+    """Single-series fit_many."""
+    result = fit_many(x, y, weights)
+    return Trend(float(result["slope"][0]), float(result["intercept"][0]), int(result["n"][0]))
+
+
+def from_sums(n, sum_x, sum_y, sum_xy, sum_xx) -> dict:
+    """
+    Least-squares line from running sums (n, Σx, Σy, Σxy, Σx²), e.g. kept
+    up to date as rows arrive. Scalars or arrays; same degenerate-case
+    rules as fit_many.
+    """
+    n, sum_x, sum_y, sum_xy, sum_xx = (np.asarray(v, dtype=np.float64) for v in (n, sum_x, sum_y, sum_xy, sum_xx))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        x_mean, y_mean = sum_x / n, sum_y / n
+        sxx = sum_xx - sum_x * x_mean
+        sxy = sum_xy - sum_x * y_mean
+        # Identical x values leave only rounding noise in sxx
+        spread = sxx > 1e-12 * np.maximum(sum_xx, 1.0)
+        slope = np.where(spread, sxy / np.where(spread, sxx, 1.0), 0.0)
+    slope = np.where(n > 0, slope, np.nan)
+    return {"slope": slope, "intercept": y_mean - slope * x_mean, "n": n.astype(np.int64)}
+
+
+def recency_weights(n: int, half_life: float) -> np.ndarray:
+    """Weights for n consecutive points (oldest first) that halve every half_life points."""
+    return 0.5 ** ((n - 1 - np.arange(n)) / half_life)
+
+
+def theil_sen_many(x, y) -> dict:
+    """
+    Theil-Sen estimator per row: the median of all pairwise slopes, with
+    intercept median(y - slope * x). A few outlier days (sensor glitches,
+    one-off storms) barely move it. O(n^2) pairs per row, fine for the
+    30-90 day windows used here.
+    """
+    x, y, _, valid = _rows(x, y)
+    i, j = np.triu_indices(y.shape[1], k=1)
+    dx = x[:, j] - x[:, i]
+    usable = valid[:, i] & valid[:, j] & (dx != 0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        pair_slopes = np.where(usable, (y[:, j] - y[:, i]) / np.where(usable, dx, 1.0), np.nan)
+    slope = _nanmedian(pair_slopes)
+    # No usable pair (fewer than two distinct x values): flat line through the median
+    slope = np.where(np.isnan(slope) & valid.any(axis=1), 0.0, slope)
+    residuals = np.where(valid, y - slope[:, None] * x, np.nan)
+    return {"slope": slope, "intercept": _nanmedian(residuals), "n": valid.sum(axis=1)}
+
+
+def theil_sen(x, y) -> Trend:
+    """Single-series theil_sen_many."""
+    result = theil_sen_many(x, y)
+    return Trend(float(result["slope"][0]), float(result["intercept"][0]), int(result["n"][0]))
+
+
+def _nanmedian(a: np.ndarray) -> np.ndarray:
+    """Row-wise nanmedian that returns NaN for all-NaN rows without warning."""
+    if a.shape[1] == 0:
+        return np.full(a.shape[0], np.nan)
+    with np.errstate(invalid="ignore"):
+        empty = np.isnan(a).all(axis=1)
+        out = np.full(a.shape[0], np.nan)
+        if (~empty).any():
+            out[~empty] = np.nanmedian(a[~empty], axis=1)
+    return out
@@ -0,0 +1,66 @@
+import time
+
+import numpy as np
+
+from app.helpers import haversine_distance, haversine_many, haversine_matrix, k_nearest, to_radians
+
+# Compares the scalar haversine loop against the vectorized helpers.
+# Run from backend/:  python bench_haversine.py
+
+USER_LAT, USER_LON = -1.2921, 36.8219
+
+
+def timed(fn, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench(n: int):
+    rng = np.random.default_rng(42)
+    lats = rng.uniform(-90, 90, n)
+    lons = rng.uniform(-180, 180, n)
+    lat_list, lon_list = lats.tolist(), lons.tolist()
+    points = to_radians(lats, lons)
+
+    def scalar_nearest():
+        best = float("inf")
+        for lat, lon in zip(lat_list, lon_list):
+            d = haversine_distance(USER_LAT, USER_LON, lat, lon)
+            if d < best:
+                best = d
+        return best
+
+    loop = timed(scalar_nearest, repeat=1 if n > 100_000 else 3)
+    one_to_many = timed(lambda: haversine_many(USER_LAT, USER_LON, points))
+    nearest = timed(lambda: k_nearest(USER_LAT, USER_LON, points, k=10))
+    convert = timed(lambda: to_radians(lats, lons))
+
+    # Sanity check: same nearest distance as the scalar loop
+    _, distances = k_nearest(USER_LAT, USER_LON, points, k=1)
+    assert abs(distances[0] - scalar_nearest()) < 1e-6
+
+    print(f"\n--- {n:,} points ---")
+    print(f"Scalar loop (nearest):        {loop * 1000:10.2f} ms")
+    print(f"haversine_many (pre-radians): {one_to_many * 1000:10.2f} ms   ({loop / one_to_many:,.0f}x)")
+    print(f"k_nearest k=10:               {nearest * 1000:10.2f} ms   ({loop / nearest:,.0f}x)")
+    print(f"to_radians (one-off):         {convert * 1000:10.2f} ms")
+
+
+def bench_matrix(n: int, m: int):
+    rng = np.random.default_rng(7)
+    a = to_radians(rng.uniform(-90, 90, n), rng.uniform(-180, 180, n))
+    b = to_radians(rng.uniform(-90, 90, m), rng.uniform(-180, 180, m))
+    elapsed = timed(lambda: haversine_matrix(a, b))
+    print(f"\n--- {n:,} x {m:,} matrix ---")
+    print(f"haversine_matrix:             {elapsed * 1000:10.2f} ms   ({n * m / elapsed / 1e6:,.0f}M pairs/s)")
+
+
+if __name__ == "__main__":
+    print("--- HAVERSINE BENCHMARK ---")
+    bench(10_000)
+    bench(1_000_000)
+    bench_matrix(1_000, 1_000)
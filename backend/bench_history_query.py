@@ -0,0 +1,174 @@
+import argparse
+import os
+import tempfile
+import time
+from datetime import date, timedelta
+
+import numpy as np
+from sqlalchemy import Column, Date, Float, Integer, MetaData, Table, create_engine, func, select, tuple_
+from sqlalchemy.schema import CreateTable
+
+# History lookup cost before and after grid-cell keys, on one SQLite file:
+#   legacy   -- the original table: separate latitude / longitude / date indexes,
+#               queried by float equality on latitude and longitude
+#   location -- today's table queried the old way (uses the (lat, lon, date) unique key)
+#   cell     -- today's table queried by cell_id (one (cell_id, date) range scan)
+# The file is kept and reused when it already holds --rows rows.
+# Run from backend/:  python bench_history_query.py [--rows 10000000]
+
+os.environ.setdefault("TIDB_CONNECTION_STRING", "mysql+mysqlconnector://bench@localhost/bench")  # Never connected
+
+from app import grid
+from app.models.history import RegionalHistory
+
+history = RegionalHistory.__table__
+
+legacy = Table(
+    "regional_history_legacy", MetaData(),
+    Column("id", Integer, primary_key=True, index=True),
+    Column("latitude", Float, nullable=False, index=True),
+    Column("longitude", Float, nullable=False, index=True),
+    Column("date", Date, nullable=False, index=True),
+    Column("calculated_flood_risk", Float),
+)
+
+LOAD_ROWS = 200_000
+
+
+def seed(engine, rows: int, days: int) -> list:
+    """Cells x days of history in both tables; returns the cell centres."""
+    res = grid.resolution_for("history")
+    cells = max(1, rows // days)
+    side = int(np.ceil(np.sqrt(cells)))
+    points = [grid.snap(-20.0 + (i // side + 0.5) * res, 10.0 + (i % side + 0.5) * res, "history") for i in range(cells)]
+
+    with engine.connect() as connection:
+        held = [connection.execute(select(func.count()).select_from(t)).scalar()
+                for t in (history, legacy)] if engine.dialect.has_table(connection, legacy.name) else []
+    if held == [cells * days] * 2:
+        print(f"Reusing {cells * days:,} rows ({cells:,} cells x {days} days)")
+        return points
+
+    print(f"Seeding {cells * days:,} rows ({cells:,} cells x {days} days)...")
+    started = time.perf_counter()
+    with engine.begin() as connection:
+        for table in (history, legacy):
+            table.drop(connection, checkfirst=True)
+            connection.execute(CreateTable(table))  # Indexes after the load, which is much faster
+
+    rng = np.random.default_rng(1)
+    first = date(2025, 1, 1)
+    dates = [(first + timedelta(days=d)).isoformat() for d in range(days)]
+    ids = grid.cell_ids([p.latitude for p in points], [p.longitude for p in points]).tolist()
+    per_batch = max(1, LOAD_ROWS // days)
+    with engine.begin() as connection:
+        for start in range(0, cells, per_batch):
+            batch = range(start, min(start + per_batch, cells))
+            risks = rng.uniform(0, 100, (len(batch), days)).round(1).tolist()
+            new, old = [], []
+            for k, i in enumerate(batch):
+                lat, lon = points[i].latitude, points[i].longitude
+                for d, day in enumerate(dates):
+                    new.append((lat, lon, ids[i], day, risks[k][d]))
+                    old.append((lat, lon, day, risks[k][d]))
+            connection.exec_driver_sql(
+                f"INSERT INTO {history.name} (latitude, longitude, cell_id, date, calculated_flood_risk) "
+                "VALUES (?, ?, ?, ?, ?)", new)
+            connection.exec_driver_sql(
+                f"INSERT INTO {legacy.name} (latitude, longitude, date, calculated_flood_risk) "
+                "VALUES (?, ?, ?, ?)", old)
+        print(f"  loaded in {time.perf_counter() - started:.0f}s, indexing...")
+        for table in (history, legacy):
+            for index in table.indexes:
+                index.create(connection)
+        connection.exec_driver_sql("ANALYZE")
+    print(f"Seeded in {time.perf_counter() - started:.0f}s")
+    return points
+
+
+def queries(point) -> dict:
+    """The single-location query each way."""
+    lat, lon = point.latitude, point.longitude
+    return {
+        "legacy": select(legacy.c.date, legacy.c.calculated_flood_risk)
+        .where(legacy.c.latitude == lat, legacy.c.longitude == lon).order_by(legacy.c.date),
+        "location": select(history.c.date, history.c.calculated_flood_risk)
+        .where(history.c.latitude == lat, history.c.longitude == lon).order_by(history.c.date),
+        "cell": select(history.c.date, history.c.calculated_flood_risk)
+        .where(history.c.cell_id == grid.cell_id(lat, lon)).order_by(history.c.date),
+    }
+
+
+def batch_queries(points) -> dict:
+    """The many-locations query each way (predict_trends_many)."""
+    keys = [(p.latitude, p.longitude) for p in points]
+    cells = grid.cell_ids([k[0] for k in keys], [k[1] for k in keys]).tolist()
+    return {
+        "legacy": select(legacy.c.latitude, legacy.c.longitude, legacy.c.date, legacy.c.calculated_flood_risk)
+        .where(tuple_(legacy.c.latitude, legacy.c.longitude).in_(keys))
+        .order_by(legacy.c.latitude, legacy.c.longitude, legacy.c.date),
+        "location": select(history.c.latitude, history.c.longitude, history.c.date, history.c.calculated_flood_risk)
+        .where(tuple_(history.c.latitude, history.c.longitude).in_(keys))
+        .order_by(history.c.latitude, history.c.longitude, history.c.date),
+        "cell": select(history.c.cell_id, history.c.date, history.c.calculated_flood_risk)
+        .where(history.c.cell_id.in_(cells))
+        .order_by(history.c.cell_id, history.c.date),
+    }
+
+
+def plan(connection, query) -> str:
+    compiled = query.compile(connection, compile_kwargs={"literal_binds": True})
+    rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}").all()
+    return "; ".join(row[-1] for row in rows)
+
+
+def bench(path: str, rows: int, days: int, samples: int, batch: int):
+    engine = create_engine(f"sqlite:///{path}")
+    points = seed(engine, rows, days)
+    rng = np.random.default_rng(7)
+    picks = [points[i] for i in rng.choice(len(points), size=min(samples, len(points)), replace=False)]
+    group = [points[i] for i in rng.choice(len(points), size=min(batch, len(points)), replace=False)]
+
+    with engine.connect() as connection:
+        print("\n--- Query plans ---")
+        for name, query in queries(picks[0]).items():
+            print(f"{name:9} {plan(connection, query)}")
+        for name, query in batch_queries(group[:3]).items():
+            print(f"{name:9} (batch) {plan(connection, query)}")
+
+        print(f"\n--- One location ({days} rows), mean of {len(picks)} ---")
+        timings = {}
+        for name in ("legacy", "location", "cell"):
+            started = time.perf_counter()
+            for point in picks:
+                got = connection.execute(queries(point)[name]).all()
+                assert len(got) == days, (name, len(got))
+            timings[name] = (time.perf_counter() - started) / len(picks)
+        for name, seconds in timings.items():
+            print(f"{name:9} {seconds * 1000:8.3f} ms   ({timings['legacy'] / seconds:,.1f}x vs legacy)")
+
+        print(f"\n--- {len(group)} locations in one query ---")
+        timings = {}
+        for name, query in batch_queries(group).items():
+            best = float("inf")
+            for _ in range(3):
+                started = time.perf_counter()
+                got = connection.execute(query).all()
+                best = min(best, time.perf_counter() - started)
+            assert len(got) == len(group) * days, (name, len(got))
+            timings[name] = best
+        for name, seconds in timings.items():
+            print(f"{name:9} {seconds * 1000:8.1f} ms   ({timings['legacy'] / seconds:,.1f}x vs legacy)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark regional_history lookups by location vs grid cell.")
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--days", type=int, default=365, help="History days per cell")
+    parser.add_argument("--samples", type=int, default=200, help="Single-location queries timed")
+    parser.add_argument("--batch", type=int, default=500, help="Locations in the batch query")
+    parser.add_argument("--db", default=os.path.join(tempfile.gettempdir(), "bench_history_query.sqlite3"))
+    args = parser.parse_args()
+
+    print("--- HISTORY QUERY BENCHMARK ---")
+    bench(args.db, args.rows, args.days, args.samples, args.batch)
@@ -0,0 +1,146 @@
+import os
+import time
+import warnings
+from datetime import date, timedelta
+
+import numpy as np
+from dotenv import load_dotenv
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+# Per-request latency of the flood trend prediction: the old pandas +
+# scikit-learn path (scan + fit) against the running sums kept by
+# services/trend_stats.py, on identical data, plus batch throughput of
+# app/trend.py.
+# Run from backend/:  python bench_trend.py   (pandas/sklearn optional)
+
+load_dotenv()
+os.environ.setdefault("TIDB_CONNECTION_STRING", "mysql+mysqlconnector://bench@localhost/bench")  # Never connected
+
+from app import trend
+from app.models.history import RegionalHistory, RegionalTrendStats
+from app.services import ai_predictor
+
+try:
+    import pandas as pd
+    from sklearn.linear_model import LinearRegression
+except ImportError:
+    pd = LinearRegression = None
+
+# The old path predicts from a plain list after fitting on a DataFrame
+warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+
+def legacy_predict_flood_trend(db: Session, lat: float, lon: float):
+    """The previous implementation (ORM rows -> DataFrame -> LinearRegression)."""
+    history = db.query(RegionalHistory).filter(
+        RegionalHistory.latitude == lat,
+        RegionalHistory.longitude == lon
+    ).order_by(RegionalHistory.date).all()
+    if len(history) < 5:
+        return None
+    df = pd.DataFrame([{
+        "day_index": (r.date - history[0].date).days,
+        "risk": r.calculated_flood_risk
+    } for r in history])
+    model = LinearRegression()
+    model.fit(df[["day_index"]], df["risk"])
+    slope = model.coef_[0]
+    predicted_risk = model.predict([[df["day_index"].max() + 7]])[0]
+    return ai_predictor.interpret_trend("Flood", slope, predicted_risk, len(history))
+
+
+def fit_flood_trend(dates: list, risks: list):
+    """Fit-only baseline: the closed-form trend refitted from one location's rows (no query)."""
+    risk = np.array(risks, dtype=np.float64)  # Missing scores (None) become NaN and are skipped
+    if np.count_nonzero(~np.isnan(risk)) < 5:
+        return ai_predictor.not_enough_data()
+    day_index = (np.array(dates, dtype="datetime64[D]") - np.datetime64(dates[0], "D")).astype(np.float64)
+    line = trend.fit(day_index, risk)
+    return ai_predictor.interpret_trend("Flood", line.slope, float(line.predict(day_index.max() + 7)), len(dates))
+
+
+def timed(fn, repeat: int = 200) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def seed(db: Session, locations: int, days: int, rng) -> list:
+    points = []
+    today = date.today()
+    for k in range(locations):
+        lat, lon = round(-1.05 - k * 0.1, 2), 36.85  # One history cell each
+        points.append((lat, lon))
+        for i in range(days, 0, -1):
+            if rng.random() < 0.1:
+                continue  # Gaps, like a real ingest
+            db.add(RegionalHistory(latitude=lat, longitude=lon, date=today - timedelta(days=i),
+                                   calculated_flood_risk=float(rng.uniform(0, 100))))
+    db.commit()
+    return points
+
+
+def bench_requests():
+    engine = create_engine("sqlite://")
+    RegionalHistory.__table__.create(engine)
+    RegionalTrendStats.__table__.create(engine)
+    rng = np.random.default_rng(1)
+    with Session(engine) as db:
+        points = seed(db, 50, 30, rng)
+
+        if LinearRegression is not None:
+            worst = 0.0
+            for lat, lon in points:
+                old = legacy_predict_flood_trend(db, lat, lon)
+                new = ai_predictor.predict_flood_trend(db, lat, lon)
+                worst = max(worst, abs(old.slope - new.slope))
+                assert (old.direction, old.next_week_score, old.confidence, old.message) == \
+                       (new.direction, new.next_week_score, new.confidence, new.message)
+            print(f"Identical outputs on {len(points)} locations (max slope difference {worst:.1e})")
+
+        lat, lon = points[0]
+        new = timed(lambda: ai_predictor.predict_flood_trend(db, lat, lon))
+        print("\n--- Per request (30 days, SQLite in memory) ---")
+        window = timed(lambda: ai_predictor.predict_flood_trend(db, lat, lon, window=True))
+        if LinearRegression is not None:
+            old = timed(lambda: legacy_predict_flood_trend(db, lat, lon))
+            print(f"pandas + sklearn:     {old * 1000:8.3f} ms")
+            print(f"running sums:         {new * 1000:8.3f} ms   ({old / new:,.1f}x)")
+        else:
+            print(f"running sums:         {new * 1000:8.3f} ms   (install pandas + scikit-learn to compare)")
+        print(f"running sums, window: {window * 1000:8.3f} ms")
+
+        rows = db.query(RegionalHistory.date, RegionalHistory.calculated_flood_risk).filter(
+            RegionalHistory.latitude == lat, RegionalHistory.longitude == lon
+        ).order_by(RegionalHistory.date).all()
+        dates, risks = [r[0] for r in rows], [r[1] for r in rows]
+        fit_only = timed(lambda: fit_flood_trend(dates, risks))
+        print(f"refit from rows:      {fit_only * 1000:8.3f} ms   (query excluded)")
+
+
+def bench_batch(m: int, n: int):
+    rng = np.random.default_rng(7)
+    x = np.arange(n, dtype=np.float64)
+    y = rng.uniform(0, 100, (m, n)) + rng.uniform(-1, 1, (m, 1)) * x
+    y[rng.random((m, n)) < 0.05] = np.nan  # Missing days
+
+    loop = timed(lambda: [trend.fit(x, row) for row in y[:1000]], repeat=3) * (m / 1000)
+    many = timed(lambda: trend.fit_many(x, y), repeat=5)
+    weighted = timed(lambda: trend.fit_many(x, y, trend.recency_weights(n, 7)), repeat=5)
+    robust = timed(lambda: trend.theil_sen_many(x, y), repeat=3)
+
+    print(f"\n--- {m:,} locations x {n} days ---")
+    print(f"fit() per location:   {loop * 1000:8.1f} ms")
+    print(f"fit_many:             {many * 1000:8.1f} ms   ({loop / many:,.0f}x)")
+    print(f"fit_many (weighted):  {weighted * 1000:8.1f} ms")
+    print(f"theil_sen_many:       {robust * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    print("--- TREND BENCHMARK ---")
+    bench_requests()
+    bench_batch(10_000, 30)
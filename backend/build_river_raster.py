@@ -0,0 +1,58 @@
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from app.rivers import RASTER_RESOLUTION, RiverIndex, raster_shape
+
+# Offline build step: rasterizes great-circle distance-to-nearest-river from
+# data/world_rivers.json onto a global grid and saves it as a .npy file that
+# the API memory-maps at startup (see app.rivers.RiverRaster).
+# Run from backend/:  python build_river_raster.py [--resolution 0.05]
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_SOURCE = os.path.join(BASE_DIR, "data", "world_rivers.json")
+DEFAULT_OUTPUT = os.path.join(BASE_DIR, "data", "river_distance.npy")
+
+ROWS_PER_CHUNK = 50
+
+
+def build(source: str, output: str, resolution: float):
+    print("--- RIVER DISTANCE RASTER BUILD ---")
+    started = time.perf_counter()
+    with open(source, "r", encoding="utf-8") as f:
+        index = RiverIndex.from_geojson(json.load(f))
+    print(f"Indexed {len(index):,} river segments in {time.perf_counter() - started:.1f}s")
+
+    rows, cols = raster_shape(resolution)
+    lats = -90.0 + np.arange(rows) * resolution
+    lons = -180.0 + np.arange(cols) * resolution
+    print(f"Grid: {rows:,} x {cols:,} at {resolution}° ({rows * cols * 4 / 1e6:,.0f} MB float32)")
+
+    # Written straight into a .npy memmap, then renamed into place so the API
+    # never maps a half-written file
+    partial = output + ".partial"
+    grid = np.lib.format.open_memmap(partial, mode="w+", dtype=np.float32, shape=(rows, cols))
+
+    started = time.perf_counter()
+    for first in range(0, rows, ROWS_PER_CHUNK):
+        last = min(first + ROWS_PER_CHUNK, rows)
+        grid[first:last] = index.distance_km(lats[first:last, None], lons[None, :], workers=-1)
+        elapsed = time.perf_counter() - started
+        print(f"  rows {last:,}/{rows:,}  ({elapsed:.0f}s, ~{elapsed / last * (rows - last):.0f}s left)")
+
+    grid.flush()
+    del grid
+    os.replace(partial, output)
+    print(f"✅ Saved {output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the distance-to-river raster.")
+    parser.add_argument("--source", default=DEFAULT_SOURCE)
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--resolution", type=float, default=RASTER_RESOLUTION, help="Grid spacing in degrees")
+    args = parser.parse_args()
+    build(args.source, args.output, args.resolution)
@@ -0,0 +1,89 @@
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import time
+
+import numpy as np
+
+from app.rivers import SEGMENT_ARRAYS, RiverIndex, flatten_geojson, load_lines
+
+# Converts data/world_rivers.json into binary files the API memory-maps at
+# startup (see app.rivers.load_river_index):
+#   world_rivers.coords.npy   float32 (n, 2) [lon, lat] of every vertex
+#   world_rivers.offsets.npy  int64 (lines + 1,) -- line i is coords[offsets[i]:offsets[i + 1]]
+#   world_rivers.{starts,ends,mids}.npy  float64 (segments, 3) densified segment
+#       unit vectors (RiverIndex.save). Mapped read-only, so workers share them
+#       and only build their own KD-tree index.
+# Run from backend/:  python convert_rivers.py [--compare]
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_SOURCE = os.path.join(BASE_DIR, "data", "world_rivers.json")
+DEFAULT_PREFIX = os.path.join(BASE_DIR, "data", "world_rivers")
+
+
+def convert(source: str, prefix: str):
+    print("--- RIVERS CONVERTER ---")
+    with open(source, "r", encoding="utf-8") as f:
+        coords, offsets = flatten_geojson(json.load(f))
+
+    # float32 keeps vertices to ~2 m, plenty for km-scale flood thresholds
+    np.save(f"{prefix}.coords.npy", coords.astype(np.float32))
+    np.save(f"{prefix}.offsets.npy", offsets)
+
+    size = os.path.getsize(f"{prefix}.coords.npy") + os.path.getsize(f"{prefix}.offsets.npy")
+    print(f"✅ {len(offsets) - 1:,} lines, {len(coords):,} vertices -> {size / 1e6:.1f} MB "
+          f"(GeoJSON was {os.path.getsize(source) / 1e6:.1f} MB)")
+
+    # Segments from the float32 vertices, exactly as the API would build them
+    index = RiverIndex.from_lines(*load_lines(prefix))
+    index.save(prefix)
+    size = sum(os.path.getsize(f"{prefix}.{name}.npy") for name in SEGMENT_ARRAYS)
+    print(f"✅ {len(index):,} segments -> {size / 1e6:.1f} MB")
+
+
+# --- Startup comparison (each path measured in a fresh process) ---
+
+def _load(mode: str, path: str, queue):
+    started = time.perf_counter()
+    if mode == "geojson":
+        with open(path, "r", encoding="utf-8") as f:
+            index = RiverIndex.from_geojson(json.load(f))
+    elif mode == "lines":
+        index = RiverIndex.from_lines(*load_lines(path))
+    else:
+        index = RiverIndex.load(path)
+    elapsed = time.perf_counter() - started
+    # ru_maxrss is KiB on Linux
+    queue.put((elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, len(index)))
+
+
+def measure(mode: str, path: str):
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    process = ctx.Process(target=_load, args=(mode, path, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def compare(source: str, prefix: str):
+    print("\n--- STARTUP: GeoJSON vs binary ---")
+    # Peak RSS counts mapped pages too; for "mmap segments" those are shared between workers
+    for label, mode, path in (("json.load + index", "geojson", source), ("mmap lines + index", "lines", prefix),
+                              ("mmap segments", "segments", prefix)):
+        elapsed, rss_mb, segments = measure(mode, path)
+        print(f"{label:20s} {elapsed:7.2f}s   peak RSS {rss_mb:8.1f} MB   ({segments:,} segments)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert world_rivers.json to the flat binary layout.")
+    parser.add_argument("--source", default=DEFAULT_SOURCE)
+    parser.add_argument("--prefix", default=DEFAULT_PREFIX, help="Output path prefix")
+    parser.add_argument("--compare", action="store_true", help="Report startup time and RSS of both formats")
+    args = parser.parse_args()
+    convert(args.source, args.prefix)
+    if args.compare:
+        compare(args.source, args.prefix)
@@ -0,0 +1,91 @@
+import argparse
+import asyncio
+import os
+from datetime import date, timedelta
+
+from dotenv import load_dotenv
+from sqlalchemy import inspect
+from sqlalchemy.exc import SQLAlchemyError
+
+# Bulk-loads regional_history from the Open-Meteo archive for a box of grid
+# cells and/or single points (see app/services/history_ingest.py). Safe to
+# stop and rerun: finished cells are checkpointed and rows are upserted.
+# Run from backend/:
+#   python ingest_history.py --bbox -1.5 36.6 -1.1 37.0 --days 90
+#   python ingest_history.py --point -1.2921,36.8219 --start 2025-01-01 --end 2025-12-31
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CHECKPOINT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ingest_history.checkpoint.json")
+
+load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env"))
+
+from app import grid
+from app.models.database import engine
+from app.models.history import RegionalHistory, RegionalTrendStats
+from app.rivers import load_river_index
+from app.services import history_ingest, http_client
+
+
+def prepare_tables():
+    RegionalHistory.__table__.create(engine, checkfirst=True)
+    if "cell_id" not in {c["name"] for c in inspect(engine).get_columns(RegionalHistory.__tablename__)}:
+        print("❌ regional_history has no cell_id column yet: run migrate_history_cells.py first.")
+        raise SystemExit(1)
+    RegionalTrendStats.__table__.create(engine, checkfirst=True)
+    # Tables created before the unique key existed don't get it from create()
+    for index in RegionalHistory.__table__.indexes:
+        try:
+            index.create(engine, checkfirst=True)
+        except SQLAlchemyError as e:
+            print(f"❌ Could not create {index.name} (duplicate history rows?): {e}")
+            raise SystemExit(1)
+
+
+async def run(args):
+    cells = []
+    if args.bbox:
+        cells += history_ingest.cells_in_bbox(*args.bbox)
+    for point in args.point:
+        lat, lon = (float(v) for v in point.split(","))
+        cells.append(grid.snap(lat, lon, "history"))
+    if not cells:
+        raise SystemExit("Nothing to ingest: pass --bbox and/or --point.")
+
+    end = args.end or date.today() - timedelta(days=1)
+    start = args.start or end - timedelta(days=args.days - 1)
+
+    try:
+        rivers = load_river_index(BASE_DIR)
+    except Exception as e:
+        print(f"⚠️ River data Error: {e} (flood scores will ignore river proximity)")
+        rivers = None
+
+    checkpoint = None if args.no_checkpoint else args.checkpoint
+    if checkpoint and args.fresh and os.path.exists(checkpoint):
+        os.remove(checkpoint)
+
+    await http_client.startup()
+    try:
+        summary = await history_ingest.ingest(engine, cells, start, end, rivers, checkpoint_path=checkpoint)
+    finally:
+        await http_client.shutdown()
+
+    print(f"✅ {summary['rows']:,} rows for {summary['cells']:,} cells in {summary['seconds']}s "
+          f"({summary['rows_per_sec']:,.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest daily regional history from the weather archive.")
+    parser.add_argument("--bbox", type=float, nargs=4, metavar=("MIN_LAT", "MIN_LON", "MAX_LAT", "MAX_LON"))
+    parser.add_argument("--point", action="append", default=[], metavar="LAT,LON", help="Repeatable")
+    parser.add_argument("--start", type=date.fromisoformat, help="First day (default: --days before --end)")
+    parser.add_argument("--end", type=date.fromisoformat, help="Last day (default: yesterday)")
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT)
+    parser.add_argument("--fresh", action="store_true", help="Ignore the checkpoint and start over")
+    parser.add_argument("--no-checkpoint", action="store_true")
+    args = parser.parse_args()
+
+    print("--- REGIONAL HISTORY INGEST ---")
+    prepare_tables()
+    asyncio.run(run(args))
@@ -0,0 +1,108 @@
+import argparse
+import os
+import time
+
+import numpy as np
+from dotenv import load_dotenv
+from sqlalchemy import bindparam, inspect, select, text, update
+from sqlalchemy.exc import SQLAlchemyError
+
+# Moves regional_history onto grid-cell keys:
+# 1. adds the cell_id column if the table predates it
+# 2. backfills cell_id in id order, BATCH rows per transaction (safe to stop and rerun)
+# 3. creates the (cell_id, date) index once the column is filled
+# 4. empties regional_trend_stats (keyed by cell now) if any ids changed; it is rebuilt lazily per cell
+# Run from backend/:  python migrate_history_cells.py [--recompute]
+
+load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env"))
+
+from app import grid
+from app.models.database import engine
+from app.models.history import RegionalHistory, RegionalTrendStats
+
+history = RegionalHistory.__table__
+stats = RegionalTrendStats.__table__
+
+
+def add_column():
+    columns = {c["name"] for c in inspect(engine).get_columns(history.name)}
+    if "cell_id" in columns:
+        print("✅ cell_id column already present.")
+        return
+    print("Adding cell_id column...")
+    with engine.begin() as connection:
+        connection.execute(text(f"ALTER TABLE {history.name} ADD COLUMN cell_id BIGINT NULL"))
+    print("✅ Column added.")
+
+
+def backfill(batch: int, recompute: bool) -> int:
+    """Sets cell_id on every row that lacks one (every row with recompute). Returns rows updated."""
+    print(f"Backfilling cell_id ({'all rows' if recompute else 'missing only'}, "
+          f"{grid.resolution_for('history')}° cells)...")
+    set_cell = update(history).where(history.c.id == bindparam("row_id")).values(cell_id=bindparam("cell"))
+
+    last_id, done = 0, 0
+    started = time.perf_counter()
+    while True:
+        query = select(history.c.id, history.c.latitude, history.c.longitude).where(history.c.id > last_id)
+        if not recompute:
+            query = query.where(history.c.cell_id.is_(None))
+        with engine.begin() as connection:
+            rows = connection.execute(query.order_by(history.c.id).limit(batch)).all()
+            if not rows:
+                break
+            ids, lats, lons = (np.array(column) for column in zip(*rows))
+            cells = grid.cell_ids(lats.astype(np.float64), lons.astype(np.float64))
+            connection.execute(set_cell, [{"row_id": int(i), "cell": int(c)} for i, c in zip(ids, cells)])
+
+        last_id = int(ids[-1])
+        done += len(rows)
+        elapsed = time.perf_counter() - started
+        print(f"  {done:,} rows (id {last_id:,}, {done / elapsed:,.0f} rows/s)")
+    return done
+
+
+def create_indexes():
+    for index in history.indexes:
+        try:
+            index.create(engine, checkfirst=True)
+        except SQLAlchemyError as e:
+            print(f"❌ Could not create {index.name}: {e}")
+            raise SystemExit(1)
+    print("✅ Indexes in place.")
+
+
+def reset_stats(clear: bool):
+    """
+    Replaces a stats table from before cell keys, and (clear=True) empties
+    it after ids changed; load() rebuilds each cell on demand.
+    """
+    tables = inspect(engine).get_table_names()
+    if stats.name in tables and "cell_id" not in {c["name"] for c in inspect(engine).get_columns(stats.name)}:
+        print("Replacing the old per-location trend stats table...")
+        stats.drop(engine)
+    stats.create(engine, checkfirst=True)
+    if clear:
+        with engine.begin() as connection:
+            connection.execute(stats.delete())
+        print("✅ Trend stats cleared (rebuilt per cell on first read).")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Add and backfill regional_history.cell_id.")
+    parser.add_argument("--batch", type=int, default=5000, help="Rows per transaction")
+    parser.add_argument("--recompute", action="store_true",
+                        help="Recompute every row, e.g. after changing GRID_RES_HISTORY")
+    args = parser.parse_args()
+
+    print("--- REGIONAL HISTORY CELL MIGRATION ---")
+    if not os.getenv("TIDB_CONNECTION_STRING"):
+        print("❌ CRITICAL ERROR: Could not find TIDB_CONNECTION_STRING in .env")
+        raise SystemExit(1)
+
+    history.create(engine, checkfirst=True)
+    add_column()
+    updated = backfill(args.batch, args.recompute)
+    create_indexes()
+    reset_stats(clear=bool(updated))
+    print("✅ Migration complete.")
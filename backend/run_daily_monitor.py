@@ -0,0 +1,34 @@
+import asyncio
+import os
+
+from dotenv import load_dotenv
+
+# Daily alert sweep: runs the monitor checks for every user with a home
+# location and a device token (app/services/monitor.py). Meant for cron, e.g.
+#   0 7 * * *  cd /path/to/backend && python run_daily_monitor.py
+
+load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env"))
+
+from app.models.database import SessionLocal
+from app.services import http_client, monitor
+from app.services.firebase_auth import initialize_firebase
+
+
+async def run():
+    await http_client.startup()
+    db = SessionLocal()
+    try:
+        await monitor.run_daily_check_for_all_users(db)
+    finally:
+        db.close()
+        await http_client.shutdown()
+
+
+if __name__ == "__main__":
+    print("--- DAILY MONITOR ---")
+    if not os.getenv("TIDB_CONNECTION_STRING"):
+        print("❌ CRITICAL ERROR: Could not find TIDB_CONNECTION_STRING in .env")
+        raise SystemExit(1)
+    initialize_firebase()
+    asyncio.run(run())
+    print("✅ Daily monitor complete.")